@@ -1,13 +1,12 @@
 import sqlalchemy.exc
 from sqlalchemy.orm import registry
-import sqlglot
-from sqlglot import exp, TokenError
 from sqlalchemy import PrimaryKeyConstraint, text
 from sqlalchemy import inspect
 import sqlite3
 from collections import defaultdict
 from schema_generator import SQLValidator
 from graph.singletons.db_spec_singleton import db_spec
+import statement_ir
 
 import logging
 
@@ -17,20 +16,27 @@ mapper_registry = registry()
 
 classes = {}
 failed_classes = []
-canonical_mapper = {}
-for table in SQLValidator.metadata.tables.values():
+
+
+def mapped_class(table_name):
+    """ ORM class for a table. Tables are mapped the first time a mod uses them rather than all at import """
+    cls = classes.get(table_name)
+    if cls is not None:
+        return cls
+    table = SQLValidator.metadata.tables[table_name]
     clsname = "".join(part.capitalize() for part in table.name.split("_"))
     cls = type(clsname, (), {})
     if not table.primary_key:
         table.append_constraint(PrimaryKeyConstraint(*table.c))
 
     mapper_registry.map_imperatively(cls, table)
-    tbl_name = table.name
-    classes[tbl_name] = cls
-    canonical_mapper[tbl_name.lower()] = tbl_name
+    classes[table_name] = cls
+    return cls
 
 
 def create_instances_from_sql(sql_text, age):
+    import sqlglot
+    from sqlglot import exp
     cleaned_sql = clean_sql(sql_text)
     if 'PRAGMA foreign_keys' in cleaned_sql:
         return ([], []), [sql_text], 'pragma_discard'
@@ -56,8 +62,8 @@ def create_instances_from_sql(sql_text, age):
     table_name = table_nodes[0].name
 
     try:
-        proper_tbl = canonical_mapper[table_name.lower()]
-        TargetClass = classes[proper_tbl]
+        proper_tbl = SQLValidator.canonicalise_tables[table_name.lower()]
+        TargetClass = mapped_class(proper_tbl)
     except KeyError:
         raise ValueError(f"Table '{table_name}' found in SQL but not in the database schema.")
 
@@ -87,6 +93,44 @@ def create_instances_from_sql(sql_text, age):
     return instance_list, bad_instances, 'insert'
 
 
+def create_instances_from_statement(stmt, age):
+    """ create_instances_from_sql for the statement dicts parsed from xml, which already know their table, columns
+    and values so dont need sqlglot """
+    if stmt['op'] not in statement_ir.INSERT_OPS:
+        table, set_cols = stmt['table'], stmt.get('columns', [])
+        where_params = stmt['params'][len(set_cols):]
+        where_clause = " AND ".join(f"{col} = {statement_ir.literal(val)}"
+                                    for col, val in zip(stmt['where'], where_params))
+        sql_text = statement_ir.render(stmt)
+        try:
+            changed_entries = update_delete_transform(sql_text, age=age, parts=(table, where_clause, set_cols))
+        except (TypeError, KeyError, sqlite3.Warning, ValueError) as e:
+            changed_entries = []
+        return (sql_text, changed_entries), [], 'update_delete'
+
+    if 'rows' in stmt:                  # coalesced rows, one instance each
+        instance_list, bad_instances = [], []
+        for row_stmt in statement_ir.split_rows(stmt):
+            instances, bad, _ = create_instances_from_statement(row_stmt, age)
+            instance_list.extend(instances)
+            bad_instances.extend(bad)
+        return instance_list, bad_instances, 'insert'
+
+    try:
+        proper_tbl = SQLValidator.canonicalise_tables[stmt['table'].lower()]
+        TargetClass = mapped_class(proper_tbl)
+    except KeyError:
+        raise ValueError(f"Table '{stmt['table']}' found in SQL but not in the database schema.")
+    colmap = {c.key.lower(): c.key for c in TargetClass.__table__.columns}
+    missed_cols = [k for k in stmt['columns'] if colmap.get(k.lower()) is None]
+    if missed_cols:
+        col_dict = dict(zip(stmt['columns'], stmt['params']))
+        log.error(f"when translating mod, found bad values {missed_cols} on entry: {col_dict}")
+        return [], [{'missed_cols': missed_cols, 'entry': col_dict}], 'insert'
+    kwargs = {colmap[k.lower()]: v for k, v in zip(stmt['columns'], stmt['params'])}
+    return [TargetClass(**kwargs)], [], 'insert'
+
+
 def clean_sql(sql_text):
     cleaned_sql = sql_text.replace('\xa0', ' ')
     cleaned_sql = cleaned_sql.replace('“', "'").replace('”', "'")
@@ -177,6 +221,8 @@ def mapped_attr(obj, table, col_name):
 
 
 def _parse_update(sql: str, parsed=None):
+    import sqlglot
+    from sqlglot import exp, TokenError
     if parsed is None:
         try:
             parsed = sqlglot.parse_one(sql.strip(), dialect="sqlite")           # sanity check that it wont crash
@@ -214,8 +260,8 @@ def _parse_update(sql: str, parsed=None):
     return table, where_clause, set_cols
 
 
-def update_delete_transform(update_sql: str, parsed=None, age='AGE_ANTIQUITY'):
-    table_name, where_clause, set_cols = _parse_update(update_sql, parsed)
+def update_delete_transform(update_sql: str, parsed=None, age='AGE_ANTIQUITY', parts=None):
+    table_name, where_clause, set_cols = parts if parts is not None else _parse_update(update_sql, parsed)
     try:
         canon_table_name = SQLValidator.canonicalise_tables[table_name.lower()]
     except KeyError:
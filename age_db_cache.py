@@ -0,0 +1,92 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+
+from graph.singletons.filepaths import LocalFilePaths
+
+log = logging.getLogger(__name__)
+
+CACHE_VERSION = 1               # bump when the way a gameplay database is built changes
+MAX_SNAPSHOTS = 6               # two generations per age
+
+
+class AgeDatabaseCache:
+    """ Content addressed store of built gameplay-base databases. A snapshot is keyed on the ordered input files
+    of an age and their contents, plus the schema scripts and prebuilt data, so only ages whose inputs actually
+    changed are rebuilt after a patch. Least recently used snapshots are evicted. """
+
+    @property
+    def cache_dir(self):
+        folder = LocalFilePaths.app_data_path_form('age_cache')
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def snapshot_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.sqlite')
+
+    @staticmethod
+    def key_for(input_files, build_files):
+        digest = hashlib.sha1(f'age-db-v{CACHE_VERSION}'.encode())
+        for group_name, file_list in (('build', build_files), ('inputs', input_files)):
+            digest.update(group_name.encode())
+            for file_path in file_list:
+                digest.update(file_path.encode('utf-8', errors='replace'))
+                try:
+                    with open(file_path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(1 << 20), b''):
+                            digest.update(chunk)
+                except OSError:
+                    digest.update(b'<missing>')
+        return digest.hexdigest()
+
+    def restore(self, age, key, target_path):
+        """ Puts the snapshot for key at target_path. Returns False if it has to be built. """
+        current = self._read_current()
+        snapshot = self.snapshot_path(key)
+        if current.get(age) == key and os.path.exists(target_path):
+            self._touch(snapshot)
+            return True
+        if not os.path.exists(snapshot):
+            return False
+        shutil.copyfile(snapshot, target_path)
+        self._touch(snapshot)
+        current[age] = key
+        self._write_current(current)
+        return True
+
+    def store(self, age, key, built_path):
+        shutil.copyfile(built_path, self.snapshot_path(key))
+        current = self._read_current()
+        current[age] = key
+        self._write_current(current)
+        self._evict(keep=set(current.values()))
+
+    def _evict(self, keep):
+        snapshots = [os.path.join(self.cache_dir, i) for i in os.listdir(self.cache_dir) if i.endswith('.sqlite')]
+        snapshots.sort(key=os.path.getmtime, reverse=True)
+        for snapshot in snapshots[MAX_SNAPSHOTS:]:
+            if os.path.basename(snapshot)[:-len('.sqlite')] in keep:
+                continue
+            log.info(f'evicting old gameplay database snapshot {snapshot}')
+            os.remove(snapshot)
+
+    @staticmethod
+    def _touch(snapshot):
+        if os.path.exists(snapshot):
+            os.utime(snapshot)
+
+    def _read_current(self):
+        current_path = os.path.join(self.cache_dir, 'current.json')
+        if not os.path.exists(current_path):
+            return {}
+        with open(current_path, 'r') as f:
+            return json.load(f)
+
+    def _write_current(self, current):
+        with open(os.path.join(self.cache_dir, 'current.json'), 'w') as f:
+            json.dump(current, f, separators=(',', ':'), sort_keys=True)
+
+
+age_db_cache = AgeDatabaseCache()
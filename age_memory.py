@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import logging
+from threading import Lock
+from contextlib import closing
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from connection_factory import connect, apply_profile
+
+log = logging.getLogger(__name__)
+
+
+class AgeMemoryDatabases:
+    """ Each gameplay-base age database loaded into memory once with the backup API, so a lint works on its own
+    throwaway clone instead of a rolled back transaction on the disk file. Clones never touch disk or each other,
+    so lints (one per age say) can run at the same time. A clone is a deserialize of the serialized age database
+    where sqlite supports it, otherwise a memory to memory backup. Reloaded when the disk file changes. """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._loaded = {}           # path -> (size, mtime, master connection or None, serialized image or None)
+
+    def _source(self, db_path):
+        stat_result = os.stat(db_path)
+        with self._lock:
+            loaded = self._loaded.get(db_path)
+            if loaded is not None and loaded[:2] == (stat_result.st_size, stat_result.st_mtime):
+                return loaded[2], loaded[3]
+            if loaded is not None and loaded[2] is not None:
+                loaded[2].close()
+            master = sqlite3.connect(':memory:', check_same_thread=False)
+            with closing(connect(db_path, 'read')) as disk:
+                disk.backup(master)
+            image = None
+            if hasattr(master, 'serialize'):            # python 3.11+, clones become a single copy of this
+                image = master.serialize()
+                master.close()
+                master = None
+            log.info(f'loaded {os.path.basename(db_path)} into memory for linting')
+            self._loaded[db_path] = (stat_result.st_size, stat_result.st_mtime, master, image)
+            return master, image
+
+    def preload(self, db_path):
+        """ loads the database now, so the first clone doesnt pay for it """
+        self._source(db_path)
+
+    def clone(self, db_path):
+        """ private in memory copy of the database at db_path, free to change and throw away """
+        master, image = self._source(db_path)
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        if image is not None:
+            conn.deserialize(image)
+        else:
+            with self._lock:                            # backup reads the master, one clone at a time
+                master.backup(conn)
+        return apply_profile(conn)
+
+    def engine(self, db_path):
+        """ engine over a fresh clone, dispose of it once done """
+        conn = self.clone(db_path)
+        return create_engine('sqlite://', creator=lambda: conn, poolclass=StaticPool)
+
+    def release(self, db_path=None):
+        with self._lock:
+            for path in [db_path] if db_path is not None else list(self._loaded):
+                loaded = self._loaded.pop(path, None)
+                if loaded is not None and loaded[2] is not None:
+                    loaded[2].close()
+
+
+age_memory = AgeMemoryDatabases()
@@ -0,0 +1,133 @@
+import os
+import json
+import pickle
+import sqlite3
+import hashlib
+import logging
+from contextlib import closing
+
+from connection_factory import connect
+from schema_generator import copy_database
+from graph.singletons.filepaths import LocalFilePaths
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 2          # bump when the way the config test database is built changes
+MAX_CHECKPOINTS = 16            # per age, each is a full copy of the age database
+
+
+class ConfigCheckpoints:
+    """ Snapshots of the config test database taken along the load order: one after the base (age database plus
+    any dlc it is missing) and one after each mod. Each position is keyed on the key before it plus the name and
+    file stats of what it applied, so a key only matches when everything up to that point is unchanged. A re-run
+    after editing one mod restores the checkpoint just before it and only replays it and the mods after. The lint
+    reports of the steps a checkpoint covers are kept beside it, so a restored run still reports every step. """
+
+    @property
+    def cache_dir(self):
+        folder = LocalFilePaths.app_data_path_form('config_checkpoints')
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def checkpoint_path(self, age, position):
+        return os.path.join(self.cache_dir, f'{age}_{position}.sqlite')
+
+    def reports_path(self, age, position):
+        return os.path.join(self.cache_dir, f'{age}_{position}.reports.pickle')
+
+    @staticmethod
+    def chain_keys(steps):
+        """ key per position for steps of (name, files). Files are keyed on size and mtime, cheap enough to check
+        every run, and any save of an edited file changes them """
+        keys, key = [], f'config-v{CHECKPOINT_VERSION}'
+        for name, files in steps:
+            digest = hashlib.sha1(key.encode())
+            digest.update(str(name).encode('utf-8', errors='replace'))
+            for file_path in files:
+                digest.update(file_path.encode('utf-8', errors='replace'))
+                try:
+                    stat_result = os.stat(file_path)
+                    digest.update(f'{stat_result.st_size}:{stat_result.st_mtime_ns}'.encode())
+                except OSError:
+                    digest.update(b'<missing>')
+            key = digest.hexdigest()
+            keys.append(key)
+        return keys
+
+    @staticmethod
+    def should_checkpoint(position, total):
+        """ every position up to MAX_CHECKPOINTS, spread out past that. The last is always kept """
+        stride = -(-total // MAX_CHECKPOINTS)
+        return position % stride == 0 or position == total - 1
+
+    def restore(self, age, keys, target_path):
+        """ Puts the deepest checkpoint matching keys, with the reports of every step up to it, at target_path.
+        Returns how many steps it covers and their lint reports in step order, (0, []) when nothing matched and
+        the database has to be built from the base. """
+        manifest = self._read_manifest(age)
+        for position in range(len(keys) - 1, -1, -1):
+            checkpoint = self.checkpoint_path(age, position)
+            if manifest.get(str(position)) != keys[position] or not os.path.exists(checkpoint):
+                continue
+            reports = self._load_reports(age, manifest, keys, position)
+            if reports is None:
+                continue
+            copy_database(checkpoint, target_path)
+            return position + 1, reports
+        return 0, []
+
+    def _load_reports(self, age, manifest, keys, position):
+        """ reports of steps 0 to position, gathered from the checkpoints up to it. None when any are missing """
+        reports = {}
+        for stored in range(position + 1):
+            if manifest.get(str(stored)) != keys[stored]:
+                continue
+            try:
+                with open(self.reports_path(age, stored), 'rb') as f:
+                    reports.update(pickle.load(f))
+            except (OSError, pickle.UnpicklingError, EOFError):
+                return None
+        if set(reports) != set(range(position + 1)):
+            return None
+        return [reports[step] for step in range(position + 1)]
+
+    def store(self, age, position, key, db_path, reports):
+        """ checkpoints db_path, whose open connections have all committed, along with reports, the lint info of
+        each step since the previous checkpoint by position. Later positions are stale now """
+        checkpoint = self.checkpoint_path(age, position)
+        tmp_path = f'{checkpoint}.{os.getpid()}.tmp'
+        with closing(connect(db_path, 'read')) as source, closing(sqlite3.connect(tmp_path)) as target:
+            source.backup(target)
+        os.replace(tmp_path, checkpoint)
+        reports_path = self.reports_path(age, position)
+        with open(f'{reports_path}.{os.getpid()}.tmp', 'wb') as f:
+            pickle.dump(reports, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{reports_path}.{os.getpid()}.tmp', reports_path)
+        manifest = {k: v for k, v in self._read_manifest(age).items() if int(k) < position}
+        manifest[str(position)] = key
+        self._write_manifest(age, manifest)
+        self.prune(age, position + 1)
+
+    def prune(self, age, keep):
+        """ drops the checkpoints and their reports from position keep on """
+        prefix = f'{age}_'
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.startswith(prefix) or not file_name.endswith(('.sqlite', '.reports.pickle')):
+                continue
+            position = file_name[len(prefix):].split('.')[0]
+            if position.isdigit() and int(position) >= keep:
+                os.remove(os.path.join(self.cache_dir, file_name))
+
+    def _read_manifest(self, age):
+        manifest_path = os.path.join(self.cache_dir, f'{age}.json')
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+
+    def _write_manifest(self, age, manifest):
+        with open(os.path.join(self.cache_dir, f'{age}.json'), 'w') as f:
+            json.dump(manifest, f, separators=(',', ':'), sort_keys=True)
+
+
+config_checkpoints = ConfigCheckpoints()
@@ -0,0 +1,35 @@
+import sqlite3
+import logging
+
+log = logging.getLogger(__name__)
+
+# Every database here is either built from scratch, linted and rolled back, or only read, and all of them can be
+# rebuilt from the game files. So none of them need durable writes. The rollback journal is kept in memory
+# rather than turned off, because lint bisection depends on ROLLBACK TO.
+PROFILES = {
+    'default': {},
+    'build': {'journal_mode': 'MEMORY', 'synchronous': 'OFF', 'cache_size': -262144, 'temp_store': 'MEMORY'},
+    'scratch': {'journal_mode': 'MEMORY', 'synchronous': 'OFF', 'temp_store': 'MEMORY', 'mmap_size': 268435456},
+    'read': {'query_only': 'ON', 'mmap_size': 268435456, 'temp_store': 'MEMORY'},
+}
+
+
+def apply_profile(conn, profile='default'):
+    """ sets the pragmas of a profile on a sqlite3 connection and registers Make_Hash, which firaxis sql uses """
+    from model import make_hash
+    for pragma, value in PROFILES[profile].items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
+    conn.create_function("Make_Hash", 1, make_hash)
+    return conn
+
+
+def connect(db_path, profile='default', **kwargs):
+    return apply_profile(sqlite3.connect(db_path, **kwargs), profile)
+
+
+def make_engine(db_path, profile='default'):
+    """ sqlalchemy engine whose every new connection gets the profile """
+    from sqlalchemy import create_engine, event
+    engine = create_engine(f"sqlite:///{db_path}")
+    event.listen(engine, 'connect', lambda dbapi_conn, connection_record: apply_profile(dbapi_conn, profile))
+    return engine
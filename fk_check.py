@@ -0,0 +1,119 @@
+import sqlite3
+import logging
+
+log = logging.getLogger(__name__)
+
+_inserts = (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_CREATE_TABLE)
+_changes = (sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE, sqlite3.SQLITE_DROP_TABLE)
+
+
+class WriteTracker:
+    """ Records the tables a lint batch writes to, through the sqlite authorizer, and the highest rowid of every
+    table before the batch. Foreign keys can then be checked on just the rows the batch could have broken. The
+    authorizer runs when a statement is prepared, not per row, so executemany batches cost nothing extra. """
+
+    def __init__(self, db):
+        self.db = db
+        self.inserted, self.changed = set(), set()
+        self.watermarks = {}
+        for (table,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                   "AND name NOT LIKE 'sqlite_%'").fetchall():
+            try:
+                self.watermarks[table] = db.execute(f'SELECT max(rowid) FROM "{table}"').fetchone()[0] or 0
+            except sqlite3.OperationalError:
+                pass                            # WITHOUT ROWID, checked whole if written to
+
+    def __enter__(self):
+        self.db.set_authorizer(self._authorize)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.db.set_authorizer(None)
+
+    def take(self):
+        """ (inserted, changed) tables written since the last take, for callers tracking several batches apart """
+        written = self.inserted, self.changed
+        self.inserted, self.changed = set(), set()
+        return written
+
+    def _authorize(self, action, arg1, arg2, db_name, source):
+        if db_name == 'main' and arg1 is not None and not arg1.startswith('sqlite_'):
+            if action in _inserts:
+                self.inserted.add(arg1)
+            elif action in _changes:
+                self.changed.add(arg1)
+        return sqlite3.SQLITE_OK
+
+
+def foreign_key_errors(db, tracker):
+    """ rows shaped like PRAGMA foreign_key_check (table, rowid, parent, fkid), for only what the tracked batch
+    wrote. Inserts into a rowid table are checked from its watermark up. A table that had rows updated or
+    deleted is checked whole, along with every table referencing it, as a parent side change can orphan children.
+    Tables whose rowid is their INTEGER PRIMARY KEY are checked whole too, as a REPLACE keeps the old rowid. """
+    full = set(tracker.changed)
+    if tracker.changed:
+        for table in _table_names(db):
+            if any(fk['parent'] in tracker.changed for fk in _foreign_keys(db, table)):
+                full.add(table)
+    errors = []
+    for table in sorted(full):
+        if _exists(db, table):
+            errors.extend(db.execute(f'PRAGMA foreign_key_check("{table}")').fetchall())
+    for table in sorted(tracker.inserted - full):
+        if not _exists(db, table):
+            continue
+        if _without_rowid(db, table) or (table in tracker.watermarks and _rowid_alias(db, table)):
+            errors.extend(db.execute(f'PRAGMA foreign_key_check("{table}")').fetchall())
+            continue
+        watermark = tracker.watermarks.get(table, 0)           # no watermark, the batch created it
+        for fk in _foreign_keys(db, table):
+            errors.extend((table, rowid, fk['parent'], fk['id'])
+                          for (rowid,) in db.execute(_violation_sql(db, table, fk), (watermark,)))
+    return errors
+
+
+def _table_names(db):
+    return [name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                           "AND name NOT LIKE 'sqlite_%'")]
+
+
+def _exists(db, table):
+    return db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def _without_rowid(db, table):
+    try:
+        db.execute(f'SELECT rowid FROM "{table}" LIMIT 0')
+        return False
+    except sqlite3.OperationalError:
+        return True
+
+
+def _rowid_alias(db, table):
+    pk = [(col_type or '').upper() for _, _, col_type, _, _, pk_idx in db.execute(f'PRAGMA table_info("{table}")')
+          if pk_idx > 0]
+    return pk == ['INTEGER']
+
+
+def _foreign_keys(db, table):
+    """ foreign keys of a table as {'id', 'parent', 'from', 'to'}, composite keys holding several columns """
+    fks = {}
+    for fk_id, _, parent, from_col, to_col, *_ in db.execute(f'PRAGMA foreign_key_list("{table}")'):
+        fk = fks.setdefault(fk_id, {'id': fk_id, 'parent': parent, 'from': [], 'to': []})
+        fk['from'].append(from_col)
+        fk['to'].append(to_col)
+    return list(fks.values())
+
+
+def _violation_sql(db, table, fk):
+    """ rows past the watermark whose non null key has no parent row, as foreign_key_check would report them """
+    to_cols = fk['to']
+    if any(col is None for col in to_cols):                 # references the parent primary key
+        to_cols = [name for _, name, _, _, _, pk_idx in sorted(db.execute(f'PRAGMA table_info("{fk["parent"]}")'),
+                                                                key=lambda col: col[5]) if pk_idx > 0] or ['rowid']
+    not_null = ' AND '.join(f'c."{col}" IS NOT NULL' for col in fk['from'])
+    sql = f'SELECT c.rowid FROM "{table}" AS c WHERE c.rowid > ? AND {not_null}'
+    if not _exists(db, fk['parent']):
+        return sql                                          # no parent table, every keyed row is missing one
+    match = ' AND '.join(f'p."{to_col}" = c."{from_col}"' for from_col, to_col in zip(fk['from'], to_cols))
+    return f'{sql} AND NOT EXISTS (SELECT 1 FROM "{fk["parent"]}" AS p WHERE {match})'
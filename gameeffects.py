@@ -1,11 +1,13 @@
+import statement_ir
+
+
 def game_effects(sql_statements, sql_commands_dict, xml_file, skips):
     collection_ = sql_commands_dict.get('@collection', 'COLLECTION_OWNER')
-    sql_statements.append({"type": "INSERT", "table": 'DynamicModifiers',
-                           "columns": ['ModifierType', 'CollectionType', 'EffectType'],
-                           "values": [f"{sql_commands_dict['@id']}_TYPE", collection_,
-                                      sql_commands_dict['@effect']]})
-    sql_statements.append({"type": "INSERT", "table": 'Types', "columns": ['Type', 'Kind'],
-                           "values": [f"{sql_commands_dict['@id']}_TYPE", 'KIND_MODIFIER']})
+    sql_statements.append(statement_ir.insert('DynamicModifiers', ['ModifierType', 'CollectionType', 'EffectType'],
+                                              [f"{sql_commands_dict['@id']}_TYPE", collection_,
+                                               sql_commands_dict['@effect']]))
+    sql_statements.append(statement_ir.insert('Types', ['Type', 'Kind'],
+                                              [f"{sql_commands_dict['@id']}_TYPE", 'KIND_MODIFIER']))
     columns, values, errors = [], [], []
     modifier_id, subject_req_set, owner_req_set, subject_req_args, owner_req_args, mod_args = None, None, None, None, None, None
     for col, val in sql_commands_dict.items():
@@ -44,7 +46,7 @@ def game_effects(sql_statements, sql_commands_dict, xml_file, skips):
     columns = col_replacer(columns, {'@id': 'ModifierId', '@permanent': 'Permanent',
                                           '@run-once': 'RunOnce', '@subject-stack-limit': 'SubjectStackLimit',
                                           '@owner-stack-limit': 'OwnerStackLimit', '@new-only': 'NewOnly'})
-    sql_statements.append({"type": "INSERT", "table": 'Modifiers', "columns": columns, "values": values})
+    sql_statements.append(statement_ir.insert('Modifiers', columns, values))
 
     if '{GameEffects}Argument' in sql_commands_dict:
         if isinstance(sql_commands_dict['{GameEffects}Argument'], dict):
@@ -56,7 +58,7 @@ def game_effects(sql_statements, sql_commands_dict, xml_file, skips):
                                                '@type': 'Type'})
 
             sql_statements.append(
-                {"type": "INSERT", "table": 'ModifierArguments', "columns": arg_cols, "values": arg_vals})
+                statement_ir.insert('ModifierArguments', arg_cols, arg_vals))
 
     # if '{GameEffects}String???' in sql_commands_dict:
 
@@ -79,8 +81,8 @@ def game_effects(sql_statements, sql_commands_dict, xml_file, skips):
 
 def req_set_build(sql_statements, sql_commands_dict, reqsetID):
     sql_statements.append(
-        {"type": "INSERT", "table": 'RequirementSets', "columns": ['RequirementSetId', 'RequirementSetType'],
-         "values": [reqsetID, 'REQUIREMENTSET_TEST_ALL']})
+        statement_ir.insert('RequirementSets', ['RequirementSetId', 'RequirementSetType'],
+                            [reqsetID, 'REQUIREMENTSET_TEST_ALL']))
     requirement_list = sql_commands_dict['{GameEffects}Requirement']
     if isinstance(requirement_list, dict):
         requirement_list = [requirement_list]
@@ -88,9 +90,8 @@ def req_set_build(sql_statements, sql_commands_dict, reqsetID):
         req_id = f'{reqsetID}_{idx + 1}'
         sql_statements, req_id = req_build(sql_statements, require_info, req_id)
         sql_statements.append(
-            {"type": "INSERT", "table": 'RequirementSetRequirements',
-             "columns": ['RequirementSetId', 'RequirementId'],
-             "values": [reqsetID, req_id]})
+            statement_ir.insert('RequirementSetRequirements', ['RequirementSetId', 'RequirementId'],
+                                [reqsetID, req_id]))
     return sql_statements
 
 
@@ -117,21 +118,20 @@ def req_build(sql_statements, sql_commands_dict, reqId):
                                       [reqId] + [i for i in filtered_commands.values()])
                 req_cols = col_replacer(req_cols, {'@type': 'RequirementType', '@inverse': 'Inverse'})
                 sql_statements.append(
-                    {"type": "INSERT", "table": 'Requirements', "columns": req_cols, "values": req_vals})
+                    statement_ir.insert('Requirements', req_cols, req_vals))
 
                 for req_arg in val:
                     cols, vals = (['RequirementId'] + [i for i in req_arg], [reqId] +
                                   [j for j in req_arg.values()])
                     cols = col_replacer(cols, {'@name': 'Name', '#text': 'Value'})
                     sql_statements.append(
-                        {"type": "INSERT", "table": 'RequirementArguments', "columns": cols,
-                         "values": vals})
+                        statement_ir.insert('RequirementArguments', cols, vals))
             else:
                 req_cols, req_vals = (['RequirementId'] + [i for i in val if 'GameEffects' not in i],
                                       [reqId] + [val_ for key_, val_ in val.items() if 'GameEffects' not in key_])
                 req_cols = col_replacer(req_cols, {'@type': 'RequirementType', '@inverse': 'Inverse'})
                 sql_statements.append(
-                    {"type": "INSERT", "table": 'Requirements', "columns": req_cols, "values": req_vals})
+                    statement_ir.insert('Requirements', req_cols, req_vals))
 
                 if '{GameEffects}Argument' in val:
                     req_args = val['{GameEffects}Argument']
@@ -141,16 +141,15 @@ def req_build(sql_statements, sql_commands_dict, reqId):
                         cols, vals = (['RequirementId'] + [i for i in req_arg], [reqId] + [j for j in req_arg.values()])
                         cols = col_replacer(cols, {'@name': 'Name', '#text': 'Value'})
                         sql_statements.append(
-                            {"type": "INSERT", "table": 'RequirementArguments', "columns": cols,
-                             "values": vals})
+                            statement_ir.insert('RequirementArguments', cols, vals))
     else:
         if '@xref' in sql_commands_dict:
             new_req_id = sql_commands_dict['@xref']
         else:
             # a simple requirement no args, TODO doesnt handle inverse, is that handled elsewhere
             sql_statements.append(
-                {"type": "INSERT", "table": 'Requirements', "columns": ['RequirementId', 'RequirementType'],
-                 "values": [reqId, sql_commands_dict['@type']]})
+                statement_ir.insert('Requirements', ['RequirementId', 'RequirementType'],
+                                    [reqId, sql_commands_dict['@type']]))
 
     return sql_statements, new_req_id
 
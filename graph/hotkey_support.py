@@ -1,9 +1,13 @@
 from PyQt5 import QtCore
 import logging
 import time
-import json
+from itertools import groupby
+from operator import itemgetter
 from model import query_mod_db, organise_entries, load_files
-from schema_generator import SQLValidator, lint_database
+from schema_generator import (SQLValidator, lint_database, copy_database, ensure_template_db, format_timings,
+                              merge_lint_info)
+from connection_factory import make_engine
+from config_checkpoints import config_checkpoints
 from graph.singletons.filepaths import LocalFilePaths
 from graph.singletons.db_spec_singleton import db_spec
 from graph.mod_conversion import extract_state_test
@@ -15,67 +19,99 @@ log = logging.getLogger(__name__)
 
 class ConfigTestWorker(QtCore.QObject):
     """
-    Worker class to run the configuration test in a separate thread.
+    Worker class to run the configuration test in a separate thread. Sets up the age database first, which on a
+    cold cache is a full build, so it stays off the UI thread.
     """
     finished = QtCore.pyqtSignal()
     log_updated = QtCore.pyqtSignal(str)
     results_ready = QtCore.pyqtSignal(object)
 
-    def __init__(self, age, extra_sql):
+    def __init__(self, age, extra_sql, level=None):
         super().__init__()
         self.age = age
         self.extra_sql = extra_sql
+        self.level = level or SQLValidator.validation_level
 
     def run(self):
         try:
             self.log_updated.emit(f"Running current mod setup when civ last launched in {self.age}...")
             start_time = time.time()
+            SQLValidator.state_validation_setup(self.age, db_spec)         # age database, built if need be
 
-            engine = SQLValidator.make_base_db(f"{LocalFilePaths.app_data_path_form('current.sqlite')}",
-                                               SQLValidator.prebuilt)
-
+            db_path = LocalFilePaths.app_data_path_form('current.sqlite')
             database_entries = query_mod_db(age=self.age)
             modded_short, modded, dlc, dlc_files = organise_entries(database_entries)
 
-            with open(LocalFilePaths.app_data_path_form('cached_base_game_sql.json')) as f:
-                preloaded_sql = json.load(f)
-
-            not_preloaded_dlc = [i for i in dlc_files if i not in preloaded_sql]
-            preloaded_sql_statements_dlc = {k: v for k, v in preloaded_sql.items() if k in dlc_files}
-
-            sql_statements_dlc, _, missed_dlc = load_files(not_preloaded_dlc, 'DLC')
-            sql_statements_dlc.update(preloaded_sql_statements_dlc)
-
-            self.log_updated.emit(
-                f"Loaded dlc files: {len(sql_statements_dlc)}. Excluded empty files: {len(not_preloaded_dlc)}"
-            )
-
-            sql_statements_mods, _, missed_mods = load_files(modded, 'Mod')
-            self.log_updated.emit(f"Loaded mod files: {len(sql_statements_mods)}. Missed: {len(missed_mods)}")
-
-            sql_statements_dlc = {k: [{'sql': i} for i in v] for k, v in sql_statements_dlc.items()}
-            self.log_updated.emit("Running SQL on Vanilla civ files...")
-            dlc_status_info = lint_database(engine, sql_statements_dlc, keep_changes=True, database_spec=db_spec)
-
-            self.results_ready.emit(dlc_status_info)
-
-            sql_statements_mods = {k: [{'sql': i} for i in v] for k, v in sql_statements_mods.items()}
-            self.log_updated.emit("Running SQL on Modded files...")
-            mod_status_info = lint_database(engine, sql_statements_mods, keep_changes=True, database_spec=db_spec)
-
-            self.results_ready.emit(mod_status_info)
+            # start from the age database when it only holds dlc files, otherwise from the schema template
+            snapshot_files = SQLValidator.age_files(self.age)
+            if snapshot_files is not None and set(snapshot_files) <= set(dlc_files):
+                base_path = SQLValidator.age_db_path(self.age)
+                snapshot_files = set(snapshot_files)
+                base_files = [i for i in dlc_files if i not in snapshot_files]
+            else:
+                base_path = ensure_template_db(SQLValidator.prebuilt)
+                base_files = dlc_files
+            modded_set = set(modded)
+            mod_steps = [(mod_id, [i['full_path'] for i in entries]) for mod_id, entries in
+                         groupby([i for i in database_entries if i['full_path'] in modded_set], itemgetter('ModId'))]
+            steps = [('base', [base_path] + base_files)] + mod_steps
+            keys = config_checkpoints.chain_keys(steps)
+
+            restored, reports = config_checkpoints.restore(self.age, keys, db_path)    # lint info per step
+            if restored > 0:
+                self.log_updated.emit(f"Restored checkpoint after {restored - 1} of {len(mod_steps)} mods, "
+                                      f"reporting their earlier results")
+            else:
+                copy_database(base_path, db_path)
+            engine = make_engine(db_path, 'build')
+
+            if restored == 0:
+                sql_statements_dlc, _, missed_dlc = load_files(base_files, 'DLC')    # statement cache hits after first run
+                self.log_updated.emit(f"Running SQL on Vanilla civ files not in the {self.age} database: "
+                                      f"{len(sql_statements_dlc)}. Excluded empty files: {len(missed_dlc)}")
+                dlc_status_info = lint_database(engine, sql_statements_dlc, keep_changes=True, database_spec=db_spec,
+                                                trusted=True, level=self.level)
+                reports.append(dlc_status_info)
+                config_checkpoints.store(self.age, 0, keys[0], db_path, {0: dlc_status_info})
+            self.results_ready.emit(reports[0])
+
+            unstored = {}                               # reports since the last checkpoint
+            for position in range(max(restored, 1), len(steps)):
+                mod_id, mod_files = steps[position]
+                sql_statements_mod, _, missed_mod = load_files(mod_files, 'Mod')
+                self.log_updated.emit(f"Running SQL on {mod_id}: {len(sql_statements_mod)} files. "
+                                      f"Missed: {len(missed_mod)}")
+                status_info = lint_database(engine, sql_statements_mod, keep_changes=True, database_spec=db_spec,
+                                            level=self.level)
+                self.log_updated.emit(f"{mod_id} {self.level} validation: {format_timings(status_info['timings'])}")
+                reports.append(status_info)
+                unstored[position] = status_info
+                if config_checkpoints.should_checkpoint(position, len(steps)):
+                    config_checkpoints.store(self.age, position, keys[position], db_path, unstored)
+                    unstored = {}
+
+            if len(reports) > 1:                        # one report for every mod, replayed or restored
+                mod_status_info = merge_lint_info(reports[1:])
+                results_path = LocalFilePaths.app_data_path_form(f'lint_results_{self.age}.sqlite')
+                mod_status_info['results'].to_sqlite(results_path)         # every statement, for large modlists
+                counts = mod_status_info['results'].counts()
+                self.log_updated.emit(f"{counts['failed']} of {counts['statements']} mod statements failed, "
+                                      f"full results in {results_path}")
+                self.results_ready.emit(mod_status_info)
             self.log_updated.emit("Finished running Modded Files")
 
             if self.extra_sql:
                 with open(LocalFilePaths.app_data_path_form('main.sql'), 'r') as f:
                     graph_sql = f.readlines()
-                extra_statements = {'graph_main.sql': graph_sql}
-                mod_gui_status_info = lint_database(engine, extra_statements, keep_changes=False, database_spec=db_spec)
+                extra_statements = {'graph_main.sql': [{'sql': i} for i in graph_sql]}
+                mod_gui_status_info = lint_database(engine, extra_statements, keep_changes=False, database_spec=db_spec,
+                                                    level=self.level)
 
                 self.results_ready.emit(mod_gui_status_info)
                 self.log_updated.emit("Finished running Graph mod")
 
             self.log_updated.emit(f"model_run finished in {time.time() - start_time:.1f}s")
+            engine.dispose()            # current.sqlite gets replaced on the next run
 
         except Exception as e:
             self.log_updated.emit(f"Error during threaded execution: {e}")
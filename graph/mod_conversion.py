@@ -1,20 +1,18 @@
-import glob
-import re
-import sqlparse
-from sqlglot.errors import ParseError
 import itertools
 from itertools import product
 from collections import defaultdict, deque
 
 from graph.singletons.filepaths import LocalFilePaths
-from xml_handler import read_xml
 import xml.etree.ElementTree as ET
-from model import convert_xml_to_sql
-from ORM import create_instances_from_sql, get_table_and_key_vals, build_fk_index
+from model import parse_db_file
+from schema_generator import format_timings
+from mod_catalogue import mod_catalogue
+from ORM import create_instances_from_sql, create_instances_from_statement, get_table_and_key_vals, build_fk_index
 from graph.windows import get_combo_value
 from graph.singletons.db_spec_singleton import db_spec
 from constants import modifier_system_tables, ages
 from graph.utils import LogPusher
+import statement_ir
 
 import logging
 
@@ -25,11 +23,11 @@ log = logging.getLogger(__name__)
 
 
 def build_imported_mod(mod_folder_path, graph):
-    modinfo_list = [f for f in glob.glob(f'{mod_folder_path}/*.modinfo*')]
+    modinfo_list = mod_catalogue.mods_in_folder(mod_folder_path)
     if len(modinfo_list) != 1:
         return False
 
-    modinfo_dict, mod_id = parse_modinfo(modinfo_list[0], mod_folder_path)
+    modinfo_dict, mod_id = mod_catalogue.mod_info(modinfo_list[0]['path'])
     sql_info_dict = modinfo_into_jobs(modinfo_dict)
     user_knobs = extract_user_controls(modinfo_dict)
     # make a decision on which ORM to build
@@ -162,93 +160,6 @@ def resolve_files(data, active_switches, active_configs):
     return sorted(list(loaded_files))
 
 
-def parse_modinfo(modinfo_path, mod_folder_path):
-    xml_ = read_xml(modinfo_path)
-    xml_ = xml_['{ModInfo}Mod']
-    mod_id = xml_['@id']
-    criterias = xml_['{ModInfo}ActionCriteria']['{ModInfo}Criteria']
-    criteria_dict = {}
-    criterias = xml_ensure_list_of_dicts(criterias)
-    for criteria_info in criterias:
-        criteria_dict[criteria_info['@id']] = {}
-        specific_criteria = criteria_dict[criteria_info['@id']]
-        any_check = '@any' in criteria_info and criteria_info['@any'] == 'true'
-        for key, val in criteria_info.items():
-            if key == '@id':
-                continue
-            if 'ModInUse' in key:
-                if isinstance(val, dict):
-                    if val.get('@inverse') == '1':
-                        specific_criteria.setdefault('ModsOff', []).append(val['#text'])
-                    else:
-                        specific_criteria.setdefault('ModsOn', []).append(val['#text'])
-                elif isinstance(val, list):
-                    specific_criteria.setdefault('ModsOn', []).extend(val)
-                elif isinstance(val, str):
-                    specific_criteria.setdefault('ModsOn', []).append(val)
-                else:
-                    raise Exception(f'Unknown type for xml handler {val} for mod {mod_id}')
-
-            elif 'AgeInUse' in key:
-                if isinstance(val, dict):
-                    log.warning('skipping xml dict while parsing criteria as Age in Use but is dict')
-                elif isinstance(val, str):
-                    specific_criteria.setdefault('AgeOn', []).append(val)
-                elif isinstance(val, list):
-                    specific_criteria.setdefault('AgeOn', []).extend(val)
-                else:
-                    raise Exception(f'Unknown type for xml handler {val} for mod {mod_id}')
-            elif 'ConfigurationValueMatch' in key:
-                if isinstance(val, dict):
-                    config_group = val['{ModInfo}Group']
-                    config_id = val['{ModInfo}ConfigurationId']
-                    config_value = val['{ModInfo}Value']
-                    config_tuple = (config_id, config_value)
-                    specific_criteria.setdefault('ConfigurationValueMatches', {}).setdefault(config_group, []).extend(
-                        config_tuple)
-                else:
-                    raise Exception(f'Unknown type for xml handler {val} for mod {mod_id}')
-
-            elif 'AlwaysMet' in key:
-                continue
-            else:
-                log.critical(f'Trying to parse modinfo of {mod_id} and met new criteria! {key}. skipping but this bad')
-
-    # criterias
-    # do we handle dependencies?
-    action_groups_dict = {}
-    action_groups = xml_['{ModInfo}ActionGroups']['{ModInfo}ActionGroup']
-    action_groups = xml_ensure_list_of_dicts(action_groups)
-    for action_group in action_groups:
-        scope = action_group.get('@scope', None)
-        if scope is not None:
-            if scope == 'shell':
-                continue                # currently not handling shell
-            elif scope == 'game':
-                action_group_id = action_group['@id']
-                action_groups_dict[action_group_id] = {'criteria': action_group.get('@criteria', 'always'),
-                                                       'filepaths': [],
-                                                       'priority': int(action_group.get('{ModInfo}Properties', {}).get('{ModInfo}LoadOrder', -1))}
-                actions = action_group.get('{ModInfo}Actions', {})
-                for action_type, action_dict in actions.items():
-                    if action_dict == '':       # empty xml. We should fix this earlier, but we didnt.
-                        continue
-                    if 'UpdateDatabase' in action_type:
-                        for item_name, file_path_list in action_dict.items():
-                            if isinstance(file_path_list, str):
-                                full_file_path = f"{mod_folder_path}/{file_path_list}"
-                                action_groups_dict[action_group_id]['filepaths'].append(full_file_path)
-                            else:
-                                for mod_file_path in file_path_list:
-                                    full_file_path = f"{mod_folder_path}/{mod_file_path}"
-                                    action_groups_dict[action_group_id]['filepaths'].append(full_file_path)
-            else:
-                raise Exception(f'scope on mod {mod_id},'
-                      f' with action {action_group.get("@id", "unknown")} had unregistered scope: {scope}')
-    mod_info_dict = {'criteria': criteria_dict, 'action_groups': action_groups_dict, 'base_folder': mod_folder_path}
-    return mod_info_dict, mod_id
-
-
 def modinfo_into_jobs(mod_info_dict):
     base_folder_path = mod_info_dict['base_folder']
     mod_info_dict['sql'] = {}
@@ -257,43 +168,35 @@ def modinfo_into_jobs(mod_info_dict):
             short_name = db_file_path.replace(f'{base_folder_path}/', '')
             if db_file_path.endswith('.xml'):
                 try:
-                    statements, xml_errors = convert_xml_to_sql(db_file_path)
-                    if isinstance(statements, str):
+                    statements = parse_db_file(db_file_path)
+                    if statements is None:
                         log.info(f'{db_file_path} was an empty file. Skipping it.')
                         mod_info_dict['sql'][short_name] = []
                         continue
-                    mod_info_dict['sql'][short_name], xml_errors = convert_xml_to_sql(db_file_path)
+                    mod_info_dict['sql'][short_name] = statements
                 except ET.ParseError as e:
                     log.error(f'could not parse file {db_file_path}.. skipping')
                     mod_info_dict['sql'][short_name] = []
 
             elif db_file_path.endswith('.sql'):
-                try:
-                    with open(db_file_path, 'r') as file:
-                        sql_contents = file.read()
-                except UnicodeDecodeError as e:
-                    log.debug(f'Bad unicode, trying windows-1252: {e}')
-                    try:
-                        with open(db_file_path, 'r', encoding='windows-1252') as file:
-                            sql_contents = file.read()
-                    except UnicodeDecodeError as e:
-                        with open(db_file_path, 'r', encoding='utf-8') as file:
-                            sql_contents = file.read()
-                comment_cleaned = re.sub(r'--.*?\n', '', sql_contents, flags=re.DOTALL)
-                mod_info_dict['sql'][short_name] = sqlparse.split(comment_cleaned)
+                mod_info_dict['sql'][short_name] = parse_db_file(db_file_path)
             else:
                 raise Exception(f'modinfo path does not end with .xml or .sql: {db_file_path}')
     return mod_info_dict
 
 
 def mod_info_into_orm(sql_info_dict, file_path_list, age='AGE_ANTIQUITY', mod_id=''):
+    from sqlglot.errors import ParseError           # sqlglot is only loaded once a mod is imported
     orm_list, update_delete_list, bad_instances_list = [], [], []
     for file_path in file_path_list:
         short_path = file_path.replace(f'{sql_info_dict["base_folder"]}/', '')
         sql_commands = sql_info_dict['sql'][short_path]
         for sql_text in sql_commands:
             try:
-                instance_list, bad_instances, list_type = create_instances_from_sql(sql_text, age)
+                if statement_ir.is_statement(sql_text):
+                    instance_list, bad_instances, list_type = create_instances_from_statement(sql_text, age)
+                else:
+                    instance_list, bad_instances, list_type = create_instances_from_sql(sql_text, age)
                 if list_type is None:
                     continue
                 elif list_type == 'insert':
@@ -637,12 +540,6 @@ def build_graph_from_orm(graph, orm_list, update_delete_list: [(str, str)], age:
     return orm_list
 
 
-def xml_ensure_list_of_dicts(data):
-    if not isinstance(data, list):
-        return [data]
-    return data
-
-
 class ErrorNodeTracker:
     def __init__(self):
         self.nodes = deque()
@@ -695,6 +592,8 @@ def extract_state_test(graph, data):
             LogPusher.push_to_log(val, log)
     if no_errors:
         LogPusher.push_to_log('Valid mod setup', log)
+    if data.get('timings'):
+        LogPusher.push_to_log(f"{data['level']} validation: {format_timings(data['timings'])}", log)
 
     num_incompletes = len(data.get('incomplete_dict', {}))
     all_nodes, incomplete_nodes = graph.all_nodes(), []
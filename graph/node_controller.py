@@ -11,7 +11,7 @@ from graph.patchs import _patched_size_hint
 
 from graph.db_node_support import NodeCreationDialog, set_nodes_visible_by_type
 from graph.set_hotkeys import set_hotkeys
-from graph.nodes.dynamic_nodes import generate_tables
+from graph.nodes.dynamic_nodes import LazyNodeFactory, register_table_stubs
 from graph.nodes.effect_nodes import GameEffectNode, RequirementEffectNode
 from graph.nodes.update_nodes import WhereNode
 from graph.port import port_connect_transmit, update_widget_or_prop
@@ -19,6 +19,7 @@ from graph.node_state import SuggestionHub
 from schema_generator import SQLValidator
 from graph.info_panel import CollapsiblePanel
 from graph.utils import resource_path
+from startup_profile import profiler
 
 import logging
 
@@ -30,9 +31,11 @@ with open(resource_path('resources/template_mod_metadata.json')) as f:
 
 
 class NodeEditorWindow(QMainWindow):
+    @profiler.profiled('NodeEditorWindow')
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.graph = NodeGraph()
+        self.node_factory = LazyNodeFactory()
+        self.graph = NodeGraph(node_factory=self.node_factory)
         self.setCentralWidget(self.graph.widget)
         mod_uuid = 'SQL_GUI_' + str(uuid.uuid4().hex)
         default_meta['Mod UUID'] = mod_uuid
@@ -41,8 +44,8 @@ class NodeEditorWindow(QMainWindow):
         menubar = self.menuBar()
         set_hotkeys(self, menubar)
         # custom SQL nodes
-        table_nodes_list = generate_tables(self.graph)
-        self.graph.register_nodes(table_nodes_list + [GameEffectNode, RequirementEffectNode, WhereNode])
+        register_table_stubs(self.graph, self.node_factory)          # table classes are built on first use
+        self.graph.register_nodes([GameEffectNode, RequirementEffectNode, WhereNode])
 
         graph_widget = self.graph.widget             # show the node graph widget.
         graph_widget.setWindowTitle("Database Editor")
@@ -88,6 +91,7 @@ class NodeEditorWindow(QMainWindow):
 
         # wire function to "node_double_clicked" signal.
         self.graph.node_double_clicked.connect(display_properties_bin)
+        profiler.watch_first_paint(self)
 
     def enable_auto_node_creation(self):
         """
@@ -1,9 +1,11 @@
 from PyQt5 import QtCore
 from graph.custom_widgets import ExpandingLineEdit, DropDownLineEdit
 from schema_generator import SQLValidator
+from startup_profile import profiler
 
 
 class SuggestionHub(QtCore.QObject):
+    @profiler.profiled('SuggestionHub')
     def __init__(self, graph):
         super().__init__()
         self.graph = graph
@@ -1,4 +1,5 @@
 from NodeGraphQt.constants import PortTypeEnum, NodePropWidgetEnum
+from NodeGraphQt.base.factory import NodeFactory
 from PyQt5 import QtCore, QtGui
 
 from graph.singletons.db_spec_singleton import db_spec
@@ -7,11 +8,17 @@ from graph.custom_widgets import IntSpinNodeWidget, FloatSpinNodeWidget, DropDow
 from graph.nodes.base_nodes import BasicDBNode, set_output_port_constraints, index_label
 
 from graph.transform_json_to_sql import transform_localisation, transform_to_sql
+from startup_profile import profiler
 
-db_map = {'ModifierArguments': db_spec.mod_arg_database_types,
-          'RequirementArguments': db_spec.req_arg_database_types}
-bonus_col_poss_map = {'Name': {'ModifierArguments': db_spec.modifier_argument_list},
-                                  'RequirementArguments': db_spec.req_argument_list}
+
+def db_map():          # looked up on use, the spec sections load after this module is imported
+    return {'ModifierArguments': db_spec.mod_arg_database_types,
+            'RequirementArguments': db_spec.req_arg_database_types}
+
+
+def bonus_col_poss_map():
+    return {'Name': {'ModifierArguments': db_spec.modifier_argument_list},
+            'RequirementArguments': db_spec.req_argument_list}
 
 
 class DynamicNode(BasicDBNode):
@@ -74,7 +81,7 @@ class DynamicNode(BasicDBNode):
         if table_name in ('ModifierArguments', 'RequirementArguments'):
             super().set_property(name=name, value=value, push_undo=True)
             if name == 'Name':
-                database_arg_map = db_map[table_name]
+                database_arg_map = db_map()[table_name]
                 self._arguments_change(database_arg_map, old_name=old_value, new_name=value)
         else:
             widget = self.get_widget(name)
@@ -100,6 +107,55 @@ class DynamicNode(BasicDBNode):
         return sql, dict_form, loc_entries
 
 
+_blueprints = {}
+
+
+def table_blueprint(table_name):
+    """ column order, widget kind, defaults, fk ports and colours of a table node. Only depends on the schema, so
+    it is worked out once per table rather than in every node __init__ """
+    blueprint = _blueprints.get(table_name)
+    if blueprint is not None:
+        return blueprint
+    primary_keys = SQLValidator.pk_map[table_name]
+    prim_texts = [i for i in SQLValidator.required_map[table_name] if i not in primary_keys]
+    second_texts = SQLValidator.less_important_map[table_name]
+
+    if table_name in SQLValidator.incremental_pk:
+        initial_fields = prim_texts
+        cols_ordered = prim_texts + second_texts
+    else:
+        initial_fields = primary_keys + prim_texts
+        cols_ordered = primary_keys + prim_texts + second_texts
+
+    default_map = SQLValidator.default_map.get(table_name, {})
+    fk_to_tbl_map = SQLValidator.fk_to_tbl_map.get(table_name, {})
+    fk_to_pk_map = SQLValidator.fk_to_pk_map.get(table_name, {})
+    require_map = SQLValidator.required_map.get(table_name, {})
+    localised_cols = db_spec.node_templates[table_name].get('localised', [])
+    cols = []
+    for idx, col in enumerate(cols_ordered):
+        default_val = default_map.get(col, None)
+        col_type = SQLValidator.type_map[table_name][col]
+        if isinstance(col_type, bool):
+            kind, extra_default = 'bool', bool(int(default_val)) if default_val is not None else False
+        elif isinstance(col_type, int):
+            kind, extra_default = 'int', int(default_val) if default_val is not None else 0
+        elif isinstance(col_type, float):
+            kind, extra_default = 'float', float(default_val) if default_val is not None else 0.0
+        else:
+            kind, extra_default = 'text', default_val if default_val is not None else ''
+        cols.append({'idx': idx, 'col': col, 'kind': kind, 'default': default_val, 'extra_default': extra_default,
+                     'is_extra': col in second_texts, 'fk_tbl': fk_to_tbl_map.get(col, None),
+                     'fk_pk': fk_to_pk_map.get(col, None), 'is_required': require_map.get(col, False),
+                     'color': SQLValidator.port_color_map['input'].get(table_name, {}).get(col),
+                     'localised': col in localised_cols})
+
+    blueprint = {'primary_keys': primary_keys, 'initial_fields': initial_fields, 'extra_fields': second_texts,
+                 'cols': cols}
+    _blueprints[table_name] = blueprint
+    return blueprint
+
+
 # had to auto generate classes rather then generate at node instantition because
 # on save they werent storing their properties in such a way they could be loaded again
 def create_table_node_class(table_name, graph):
@@ -109,18 +165,10 @@ def create_table_node_class(table_name, graph):
         super(type(self), self).__init__()
         self._validation_errors = {}  # Track validation errors for each field
         self.view.setVisible(False)
-        primary_keys = SQLValidator.pk_map[table_name]
-        prim_texts = [i for i in SQLValidator.required_map[table_name] if i not in primary_keys]
-        second_texts = SQLValidator.less_important_map[table_name]
-
-        if table_name in SQLValidator.incremental_pk:
-            self._initial_fields = prim_texts
-            cols_ordered = prim_texts + second_texts
-        else:
-            self._initial_fields = primary_keys + prim_texts
-            cols_ordered = primary_keys + prim_texts + second_texts
-
-        self._extra_fields = second_texts
+        blueprint = table_blueprint(table_name)
+        primary_keys = blueprint['primary_keys']
+        self._initial_fields = list(blueprint['initial_fields'])
+        self._extra_fields = list(blueprint['extra_fields'])
         self.create_property('table_name', value=table_name)
 
         age = graph.property('meta').get('Age')
@@ -135,73 +183,41 @@ def create_table_node_class(table_name, graph):
         if len(primary_keys) == 1:
             self.create_property('primary_key', primary_keys[0])
 
-        default_map = SQLValidator.default_map.get(table_name, {})
-        fk_to_tbl_map = SQLValidator.fk_to_tbl_map.get(table_name, {})
-        fk_to_pk_map = SQLValidator.fk_to_pk_map.get(table_name, {})
-        require_map = SQLValidator.required_map.get(table_name, {})
-        localised_cols = db_spec.node_templates[table_name].get('localised', [])
         lazy_params = {}
-        for idx, col in enumerate(cols_ordered):
-            default_val = default_map.get(col, None)
-            fk_to_tbl_link = fk_to_tbl_map.get(col, None)
-            fk_to_pk_link = fk_to_pk_map.get(col, None)
-            is_required = require_map.get(col, False)
-            if fk_to_pk_link is not None:
-                color = SQLValidator.port_color_map['input'].get(table_name, {}).get(col)
-                if is_required:
-                    port = self.add_input(col, color=color)
+        for col_info in blueprint['cols']:
+            idx, col, kind = col_info['idx'], col_info['col'], col_info['kind']
+            if col_info['fk_pk'] is not None:
+                if col_info['is_required']:
+                    port = self.add_input(col, color=col_info['color'])
                 else:
-                    port = self.add_input(col, painter_func=draw_square_port, color=color)
-                self.set_input_port_constraint(port, fk_to_tbl_link, fk_to_pk_link)
-
-            col_poss_vals = bonus_col_poss_map.get(col, {}).get(table_name, self._possible_vals.get(col, None))
-            col_type = SQLValidator.type_map[table_name][col]
-            if isinstance(col_type, bool):
-                if col in self._extra_fields:
-                    default_val = bool(int(default_val))if default_val is not None else False
-                    lazy_params[col] = default_val
-                    self.create_property(col, default_val, widget_type=NodePropWidgetEnum.QCHECK_BOX.value)
-                    continue
-                self.set_bool_checkbox(col, idx, default_val)
-            elif isinstance(col_type, int):
-                if col in self._extra_fields:
-                    default_val = int(default_val) if default_val is not None else 0
-                    lazy_params[col] = default_val
-                    self.create_property(col, default_val, widget_type=NodePropWidgetEnum.QSPIN_BOX.value)
-                    continue
+                    port = self.add_input(col, painter_func=draw_square_port, color=col_info['color'])
+                self.set_input_port_constraint(port, col_info['fk_tbl'], col_info['fk_pk'])
+
+            if col_info['is_extra']:             # hidden columns are just properties until shown
+                lazy_params[col] = col_info['extra_default']
+                self.create_property(col, col_info['extra_default'], widget_type=lazy_widget_types[kind])
+                continue
+
+            col_poss_vals = bonus_col_poss_map().get(col, {}).get(table_name, self._possible_vals.get(col, None))
+            if kind == 'bool':
+                self.set_bool_checkbox(col, idx, col_info['default'])
+            elif kind == 'int':
                 custom_widget = IntSpinNodeWidget(col, self.view)
                 self.add_custom_widget(custom_widget,
                                        widget_type=NodePropWidgetEnum.QSPIN_BOX.value, tab='fields')
-            elif isinstance(col_type, float):
-                if col in self._extra_fields:
-                    default_val = float(default_val) if default_val is not None else 0.0
-                    lazy_params[col] = default_val
-                    self.create_property(col, default_val, widget_type=NodePropWidgetEnum.QDOUBLESPIN_BOX.value)
-                    continue
+            elif kind == 'float':
                 custom_widget = FloatSpinNodeWidget(col, self.view)
                 self.add_custom_widget(custom_widget,
                                        widget_type=NodePropWidgetEnum.QDOUBLESPIN_BOX.value, tab='fields')
             elif col_poss_vals is not None:
                 if 'vals' in col_poss_vals:
                     col_poss_vals = col_poss_vals['vals']
-                if default_val is None:
-                    default_val = ''
-                if col in self._extra_fields:
-                    lazy_params[col] = default_val
-                    self.create_property(col, default_val, widget_type=NodePropWidgetEnum.QLINE_EDIT.value)
-                    continue
                 self.add_custom_widget(
                     DropDownLineEdit(parent=self.view, label=index_label(idx, col), name=col, text='',
                                      suggestions=col_poss_vals or []),
                     tab='fields', widget_type=NodePropWidgetEnum.QLINE_EDIT.value)
             else:
-                is_localised = col in localised_cols
-                if col in self._extra_fields:
-                    default_val = default_val if default_val is not None else ''
-                    lazy_params[col] = default_val
-                    self.create_property(col, default_val, widget_type=NodePropWidgetEnum.QLINE_EDIT.value)
-                    continue
-                self.set_text_input(col, idx, default_val, localise=is_localised)
+                self.set_text_input(col, idx, col_info['default'], localise=col_info['localised'])
 
         self.create_property('arg_params', lazy_params)
         for col in self._initial_fields:            # dont validate on start, takes like 0.2s
@@ -233,12 +249,56 @@ def create_table_node_class(table_name, graph):
     return NewClass
 
 
-def generate_tables(graph):
-    all_custom_nodes = []
-    for name in SQLValidator.Base.metadata.tables:
-        NodeClass = create_table_node_class(name, graph)
-        all_custom_nodes.append(NodeClass)
-    return all_custom_nodes
+lazy_widget_types = {'bool': NodePropWidgetEnum.QCHECK_BOX.value, 'int': NodePropWidgetEnum.QSPIN_BOX.value,
+                     'float': NodePropWidgetEnum.QDOUBLESPIN_BOX.value, 'text': NodePropWidgetEnum.QLINE_EDIT.value}
+
+
+class LazyNodeFactory(NodeFactory):
+    """ Node factory that registers the ~400 table nodes as stubs. A table node class is only built the first time
+    a node of that type is created, loaded from a session or picked from the tab search. """
+
+    def __init__(self):
+        super().__init__()
+        self.stubs = {}
+        self.stub_names = {}
+
+    def register_stub(self, node_type, name, builder):
+        self.stubs[node_type] = (name, builder)
+        self.stub_names.setdefault(name, []).append(node_type)
+
+    def materialize(self, node_type):
+        stub = self.stubs.pop(node_type, None)
+        if stub is None:
+            return
+        name, builder = stub
+        self.stub_names[name].remove(node_type)
+        if not self.stub_names[name]:
+            del self.stub_names[name]
+        self.register_node(builder())
+
+    @property
+    def nodes(self):            # caller wants the classes themselves, so build whatever is still a stub
+        for node_type in list(self.stubs):
+            self.materialize(node_type)
+        return super().nodes
+
+    @property
+    def names(self):
+        names = {k: list(v) for k, v in super().names.items()}
+        for name, node_types in self.stub_names.items():
+            names.setdefault(name, []).extend(node_types)
+        return names
+
+    def create_node_instance(self, node_type=None):
+        self.materialize(self.aliases.get(node_type, node_type))
+        return super().create_node_instance(node_type)
+
+
+@profiler.profiled('register_table_stubs')
+def register_table_stubs(graph, node_factory):
+    for name in SQLValidator.table_names:
+        node_type = SQLValidator.table_name_class_map[name]
+        node_factory.register_stub(node_type, name, lambda table_name=name: create_table_node_class(table_name, graph))
 
 
 def draw_square_port(painter, rect, info):
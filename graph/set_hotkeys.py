@@ -5,8 +5,8 @@ import shutil
 import logging
 
 from graph.db_node_support import NodeCreationDialog
-from graph.transform_json_to_sql import transform_json, make_modinfo
-from schema_generator import check_valid_sql_against_db
+from graph.transform_json_to_sql import transform_json, transform_graph, make_modinfo
+from schema_generator import check_valid_sql_against_db, SQLValidator
 from graph.singletons.db_spec_singleton import db_spec
 from graph.singletons.filepaths import LocalFilePaths
 from graph.nodes.effect_nodes import BaseEffectNode
@@ -17,6 +17,8 @@ from graph.utils import resource_path
 from graph.mod_conversion import extract_state_test
 from graph.utils import LogPusher
 from graph.hotkey_support import write_sql, write_loc_sql, ConfigTestWorker
+from lint_service import lint_service
+from incremental_lint import IncrementalLint
 
 log = logging.getLogger(__name__)
 
@@ -482,11 +484,78 @@ def mod_test_session(graph):
     sql_lines, dict_form_list, loc_lines, incompletes_ordered = transform_json(current)
     age = graph.property('meta').get('Age')
     LogPusher.push_to_log(f'Testing mod for: {age}', log)
-    result = check_valid_sql_against_db(age, sql_lines, db_spec, dict_form_list, incompletes=incompletes_ordered)
+    level = graph.property('meta').get('Validation Level', SQLValidator.validation_level)
+    result = check_valid_sql_against_db(age, sql_lines, db_spec, dict_form_list, incompletes=incompletes_ordered,
+                                        level=level)
     # need to do loc test too
     extract_state_test(graph, result)
 
 
+def mod_test_incremental(graph):
+    """
+    Quick re-test while editing. The last test stays applied in memory, so only nodes changed since, and the nodes
+    referencing their primary keys, are rolled back and run again. Needs no session save.
+    """
+    age = graph.property('meta').get('Age')
+    level = graph.property('meta').get('Validation Level', SQLValidator.validation_level)
+    SQLValidator.state_validation_setup(age, db_spec)
+    db_path = SQLValidator.age_db_path(age)
+    lint = getattr(graph, '_incremental_lint', None)
+    if lint is None or lint.db_path != db_path or lint.stale():
+        if lint is not None:
+            lint.close()
+        lint = graph._incremental_lint = IncrementalLint(db_path)
+    node_sql_map, dependents, dict_form_list, incompletes_ordered = transform_graph(graph)
+    result = lint.run(node_sql_map, dependents, db_spec, level=level, dict_form_list=dict_form_list,
+                      incomplete_dict=incompletes_ordered)
+    LogPusher.push_to_log(f"Re-tested {len(result['relinted'])} of {len(node_sql_map)} nodes for: {age}", log)
+    extract_state_test(graph, result)
+
+
+class LintBridge(QtCore.QObject):
+    """ hands lint service callbacks, which arrive on its reader thread, over to the ui thread """
+    node_done = QtCore.pyqtSignal(object)
+    finished = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+
+
+def mod_test_background(graph):
+    """
+    mod_test_session on the background lint service, so the window stays responsive. Failing nodes are logged as
+    soon as the statements have run, the full report once the checks finish.
+    """
+    current = graph.current_session() or LocalFilePaths.app_data_path_form('graph.json')
+    graph.save_session(current)
+    age = graph.property('meta').get('Age')
+    level = graph.property('meta').get('Validation Level', SQLValidator.validation_level)
+    bridge = getattr(graph, '_lint_bridge', None)
+    if bridge is None:
+        bridge = graph._lint_bridge = LintBridge()
+        bridge.node_done.connect(lambda node_info: log_node_result(graph, node_info))
+        bridge.finished.connect(lambda result: extract_state_test(graph, result))
+        bridge.failed.connect(lambda message: test_in_process(graph, message))
+    LogPusher.push_to_log(f'Testing mod for: {age}', log)
+    try:
+        lint_service.submit(age, current, level, on_node=bridge.node_done.emit, on_done=bridge.finished.emit,
+                            on_error=bridge.failed.emit)
+    except OSError as e:
+        log.error(f'lint service unavailable, testing in process: {e}')
+        mod_test_session(graph)
+
+
+def test_in_process(graph, message):
+    LogPusher.push_to_log(f'Background test failed ({message}), testing in process', log)
+    mod_test_session(graph)
+
+
+def log_node_result(graph, node_info):
+    if not node_info['errors']:
+        return
+    node = graph.get_node_by_id(node_info['node']) if node_info['node'] is not None else None
+    name = node.name() if node is not None else node_info['node']
+    LogPusher.push_to_log(f"{name}: {len(node_info['errors'])} of {node_info['statements']} statements failed", log)
+
+
 def save_session_to_mod(graph, parent=None):
     """
     Saves the session, converts to SQL, and packages into a new folder with a template .modinfo
@@ -594,7 +663,8 @@ def mod_test_current_config(graph):
     age = graph.side_panel.ageComboBox.currentText() or 'AGE_ANTIQUITY'
 
     thread = QtCore.QThread()
-    worker = ConfigTestWorker(age, extra_sql=None)
+    level = (graph.property('meta') or {}).get('Validation Level', SQLValidator.validation_level)
+    worker = ConfigTestWorker(age, extra_sql=None, level=level)
     worker.moveToThread(thread)
 
     graph._config_thread = thread
@@ -1,32 +1,57 @@
 import json
-import sqlite3
 from copy import deepcopy
 from threading import Lock
 import os
-from pathlib import Path
-import glob
-import re
 import logging
 
 from graph.singletons.filepaths import LocalFilePaths
+from install_manifest import InstallManifest
+from mod_catalogue import mod_catalogue
+from graph.singletons.spec_store import SpecStore
 from schema_generator import SQLValidator
 from stats import gather_effects
 from graph.utils import resource_path
+from startup_profile import profiler
+from connection_factory import connect
 
 
 log = logging.getLogger(__name__)
 
 
+def _spec_section(name):
+    """ db_spec attribute backed by a spec store section, only loaded on first access """
+    def getter(self):
+        value = self._sections.get(name)
+        if value is None:
+            if self.spec_store is None:
+                return {}
+            value = self._sections[name] = self.spec_store.section(name)
+        return value
+
+    def setter(self, value):
+        self._sections[name] = value
+        self._derived.clear()
+    return property(getter, setter)
+
+
 class ResourceLoader:
     _instance = None
     _lock = Lock()
     initialized = False
-    node_templates = {}
-    possible_vals = {}
-    all_possible_vals = {}
-    collection_effect_map = {}
-    mod_type_arg_map = {}
-    req_type_arg_map = {}
+    spec_store = None
+    node_templates = _spec_section('node_templates')
+    possible_vals = _spec_section('possible_vals')
+    all_possible_vals = _spec_section('all_possible_vals')
+    collection_effect_map = _spec_section('collection_effect_map')
+    collections_list = _spec_section('collections_list')
+    dynamic_mod_info = _spec_section('dynamic_mod_info')
+    localized_tags = _spec_section('localized_tags')
+    modifier_argument_info = _spec_section('modifier_argument_info')
+    requirement_argument_info = _spec_section('requirement_argument_info')
+    mod_type_arg_map = _spec_section('mod_type_arg_map')
+    mod_arg_database_types = _spec_section('mod_arg_database_types')
+    req_type_arg_map = _spec_section('req_type_arg_map')
+    req_arg_database_types = _spec_section('req_arg_database_types')
     civ_config = ''
     workshop = ''
     civ_install = ''
@@ -37,22 +62,28 @@ class ResourceLoader:
     metadata = {}
     dlc_mod_ids = []
     attach_tables = []
+    install_manifest = None
+    install_changes = set()
 
     def __new__(cls):
         if not cls._instance:
             with cls._lock:
                 if not cls._instance:
                     cls._instance = super().__new__(cls)
+                    cls._instance._sections = {}        # spec store sections loaded so far
+                    cls._instance._derived = {}         # values built from the sections, cleared along with them
         return cls._instance
 
-    def initialize(self, patch_occurred, latest=None):
+    def initialize(self, patch_occurred, latest=None, progress=None):
         with self._lock:
             if not self.initialized:
-                SQLValidator.initialize()
-                self._load_resources(patch_occurred, latest)
+                if not SQLValidator.initialized:       # start up may already have loaded it alongside other work
+                    SQLValidator.initialize()
+                self._load_resources(patch_occurred, latest, progress)
                 self.initialized = True
 
-    def _load_resources(self, new_patch_occurred, latest=None):
+    @profiler.profiled('_load_resources')
+    def _load_resources(self, new_patch_occurred, latest=None, progress=None):
         self._files = {
             'localized_tags': self.full_resource_path('LocalizedTags.json'),
             'all_possible_vals': self.appdata_path('all_possible_vals.json'),
@@ -61,7 +92,7 @@ class ResourceLoader:
             'dlc_mod_ids': self.appdata_path('DLCModIds.json'),
             'dynamic_mod_info': self.appdata_path('DynamicModifierMap.json'),
             'metadata': self.appdata_path('metadata.json'),
-            'mod_arg_type_list_map': self.appdata_path('ModifierArgumentTypes.json'),
+            'mod_type_arg_map': self.appdata_path('ModifierArgumentTypes.json'),
             'mod_arg_database_types': self.appdata_path('ModifierArgumentDatabaseTypes.json'),
             'modifier_argument_info': self.appdata_path('ModArgInfo.json'),
             'node_templates': self.appdata_path("node_templates.json"),
@@ -73,33 +104,35 @@ class ResourceLoader:
 
         if new_patch_occurred:
             log.info('new patch! rebuild all files')        # cant toast as dont have application yet
-            self.update_database_spec()
-            self.modifier_argument_info = self._read_file(self._files['modifier_argument_info'])
-            self.requirement_argument_info = self._read_file(self._files['requirement_argument_info'])
+            self.update_database_spec(progress)
             self.metadata['patch_time'] = latest
             self._write_file(self._files['metadata'], self.metadata)
+            if self.install_manifest is not None:
+                self.install_manifest.save()        # only commit once the rebuild has succeeded
         mod_ids = get_dlc_mod_ids()
         self.update_mod_ids(mod_ids)
-        self.node_templates = self._read_file(self._files['node_templates'])
-        self.possible_vals = self._read_file(self._files['possible_vals'])
-        self.all_possible_vals = self._read_file(self._files['all_possible_vals'])
-        self.collection_effect_map = self._read_file(self._files['collection_effect_map'])
-
-        self.modifier_argument_info = self._read_file(self._files['modifier_argument_info'])
-        self.requirement_argument_info = self._read_file(self._files['requirement_argument_info'])
-        self.dynamic_mod_info = self._read_file(self._files['dynamic_mod_info'])
-
-        self.mod_type_arg_map = self._read_file(self._files['mod_arg_type_list_map'])
-        self.mod_arg_database_types = self._read_file(self._files['mod_arg_database_types'])
-        self.req_type_arg_map = self._read_file(self._files['req_type_arg_map'])
-        self.req_arg_database_types = self._read_file(self._files['req_arg_database_types'])
-        self.localized_tags = self._read_file(self._files['localized_tags'])
-        self.collections_list = self._read_file(self._files['collections_list'])
-        self.modifier_argument_list = set()
-        [self.modifier_argument_list.update(list(v.keys())) for k, v in self.mod_type_arg_map.items()]
-        self.req_argument_list = set()
-        [self.req_argument_list.update(list(v.keys())) for k, v in self.req_type_arg_map.items()]
-        self.dlc_mod_ids = self._read_file(self._files['dlc_mod_ids'])
+
+        self.spec_store = SpecStore(self.appdata_path('spec_store.sqlite'))
+        self.spec_store.sync({k: v for k, v in self._files.items() if k not in ('metadata', 'dlc_mod_ids')})
+        self._sections, self._derived = {}, {}     # sections now load from the store when first used
+
+    @property
+    def modifier_argument_list(self):
+        return self._derive('modifier_argument_list',
+                            lambda: {arg for v in self.mod_type_arg_map.values() for arg in v})
+
+    @property
+    def req_argument_list(self):
+        return self._derive('req_argument_list', lambda: {arg for v in self.req_type_arg_map.values() for arg in v})
+
+    def _derive(self, name, build):
+        """ memoised value built from spec sections, only kept once the store is loaded """
+        if name in self._derived:
+            return self._derived[name]
+        value = build()
+        if self.spec_store is not None:
+            self._derived[name] = value
+        return value
 
     @staticmethod
     def _read_file(path):
@@ -147,6 +180,7 @@ class ResourceLoader:
         self.metadata['age'] = text
         self._write_file(self._files['metadata'],  self.metadata)
 
+    @profiler.profiled('check_firaxis_patched')
     def check_firaxis_patched(self):
         if not os.path.exists(self.appdata_path('metadata.json')):
             self.age = 'AGE_ANTIQUITY'
@@ -161,25 +195,32 @@ class ResourceLoader:
             self.age = self.metadata.get('age', 'AGE_ANTIQUITY')
             self.patch_time = self.metadata.get('patch_time', -1)
 
-        root = Path(LocalFilePaths.civ_install)       # find the most recent changed file and the time it was changed.
-        file_changes = [(p, p.stat().st_mtime) for p in root.rglob("*") if p.is_file()
-                        and '/.' not in str(p) and '\.' not in str(p)]
-        file_changes.sort(key=lambda x: x[1], reverse=True)
-        latest = file_changes[0][1]
-        current = self.metadata.get('patch_time')
-        if current is None or latest > current:
-            self.patch_change = True
-            self.patch_time = latest
+        # only the schema scripts, base/dlc modinfos and the files they reference feed the gameplay databases
+        self.install_manifest = InstallManifest(LocalFilePaths.civ_install, self.appdata_path('install_manifest.json'))
+        self.install_changes = self.install_manifest.scan()
+        latest = self.install_manifest.latest_mtime()
+        if self.install_manifest.has_baseline:
+            if len(self.install_changes) > 0:
+                log.info(f'install files changed since last launch: {sorted(self.install_changes)}')
+                self.patch_change = True
+                self.patch_time = latest
+        else:                               # first launch with a manifest, fall back on the stored patch time
+            current = self.metadata.get('patch_time')
+            if current is None or latest > current:
+                self.patch_change = True
+                self.patch_time = latest
         if not self.patch_change:
             all_mined_files_exist = all(os.path.exists(v) for k, v in self._files.items())
             if not all_mined_files_exist:
                 self.patch_change = True
+        if not self.patch_change:
+            self.install_manifest.save()            # refresh cached dir listings if any moved, nothing tracked did
         return self.patch_change, latest
 
-    def update_database_spec(self):
+    def update_database_spec(self, progress=None):
         mod_ids = get_dlc_mod_ids()
         self.update_mod_ids(mod_ids)
-        SQLValidator.state_validation_setup('AGE_ANTIQUITY', self, first_run=True)
+        SQLValidator.state_validation_setup('AGE_ANTIQUITY', self, progress=progress)
 
         database_path = LocalFilePaths.app_data_path_form('gameplay-base_AGE_ANTIQUITY.sqlite')
         db = BaseDB(database_path)
@@ -217,7 +258,7 @@ class BaseDB:
         self.db_path = full_path
 
     def setup_table_infos(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path, 'read')
         cursor = conn.cursor()
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
         self.tables = [row[0] for row in cursor.fetchall()]
@@ -259,7 +300,7 @@ class BaseDB:
         for full_path, db_name in db_path_list.items():
             possible_vals[db_name] = {}
             possible_vals_age = possible_vals[db_name]
-            conn = sqlite3.connect(full_path)
+            conn = connect(full_path, 'read')
             cursor = conn.cursor()
             for table in self.tables:
                 primary_keys = self.table_data[table]['primary_keys']
@@ -317,7 +358,7 @@ class BaseDB:
     def fix_firaxis_missing_fks(self):
         # find all primary key columns where theres only one PK.
         # get the example database of antiquity
-        conn = sqlite3.connect(LocalFilePaths.app_data_path_form('gameplay-base_AGE_ANTIQUITY.sqlite'))
+        conn = connect(LocalFilePaths.app_data_path_form('gameplay-base_AGE_ANTIQUITY.sqlite'), 'read')
         unique_pks = {}
         for table in self.tables:
             pk_list = self.table_data[table]['primary_keys']
@@ -451,7 +492,7 @@ class BaseDB:
 
     def fix_firaxis_missing_bools(self):
         result = {}
-        conn = sqlite3.connect(LocalFilePaths.app_data_path_form('gameplay-base_AGE_ANTIQUITY.sqlite'))
+        conn = connect(LocalFilePaths.app_data_path_form('gameplay-base_AGE_ANTIQUITY.sqlite'), 'read')
         for table in self.tables:
             cols = conn.execute(f"PRAGMA table_info({table})").fetchall()
             int_cols = [c[1] for c in cols if "INT" in c[2].upper() or "BOOL" in c[2].upper()]
@@ -518,16 +559,7 @@ def ensure_text_column(conn, table, col):
 
 
 def get_dlc_mod_ids():
-    dlc_modinfo_fp_list = [f for f in glob.glob(f"{LocalFilePaths.civ_install}/**/*.modinfo*", recursive=True)]
-    dlc_mod_ids = []
-    for filepath in dlc_modinfo_fp_list:
-        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-            text = f.read()
-        match = re.search(r'<Mod id="([^"]+)"', text)
-        if match:
-            uuid = match.group(1)
-            dlc_mod_ids.append(uuid)
-    return dlc_mod_ids
+    return mod_catalogue.dlc_mod_ids()
 
 
 db_spec = ResourceLoader()
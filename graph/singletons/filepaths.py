@@ -3,11 +3,13 @@ from pathlib import Path
 from platformdirs import user_data_dir
 import logging
 from logging.handlers import RotatingFileHandler
+import multiprocessing
 import sys
 if sys.platform == 'win32':
     import winreg
 
 from graph.utils import check_civ_install_works, check_civ_config_works
+from startup_profile import profiler
 
 
 class FilePaths:
@@ -84,6 +86,7 @@ class FilePaths:
         file_path = os.path.join(self.save_appdata_path, filename)
         return file_path
 
+    @profiler.profiled('initialize_paths')
     def initialize_paths(self):
         self.civ_config = self._find_civ_config()
         self.civ_install = self._find_civ_install()
@@ -101,15 +104,14 @@ logger.setLevel(logging.INFO)
 
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
-info_handler = logging.handlers.RotatingFileHandler(Path(LocalFilePaths.app_data_path_form('logs')) / "app.log",
-                                                    maxBytes=1_000_000, backupCount=5)
-info_handler.setLevel(logging.INFO)
-info_handler.setFormatter(formatter)
 
-error_handler = logging.handlers.RotatingFileHandler(Path(LocalFilePaths.app_data_path_form('logs')) / "errors.log",
-                                                     maxBytes=1_000_000, backupCount=5)
-error_handler.setLevel(logging.ERROR)
-error_handler.setFormatter(formatter)
+def file_log_handler(file_name, level=logging.INFO):
+    handler = RotatingFileHandler(Path(LocalFilePaths.app_data_path_form('logs')) / file_name,
+                                  maxBytes=1_000_000, backupCount=5)
+    handler.setLevel(level)
+    handler.setFormatter(formatter)
+    return handler
+
 
 console_handler = logging.StreamHandler()       # terminal only
 console_handler.setLevel(logging.DEBUG)
@@ -118,6 +120,7 @@ console_handler.setFormatter(formatter)
 if logger.hasHandlers():
     logger.handlers.clear()
 
-logger.addHandler(info_handler)
-logger.addHandler(error_handler)
+if multiprocessing.parent_process() is None:    # spawned workers import this too, rotating shared files breaks
+    logger.addHandler(file_log_handler("app.log"))          # on windows, so only the app itself writes them
+    logger.addHandler(file_log_handler("errors.log", logging.ERROR))
 logger.addHandler(console_handler)
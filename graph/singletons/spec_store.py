@@ -0,0 +1,148 @@
+import os
+import json
+import sqlite3
+import logging
+from threading import Lock
+from collections.abc import Mapping
+
+log = logging.getLogger(__name__)
+
+STORE_VERSION = 2
+MISS = object()
+
+
+class SpecStore:
+    """ Single indexed sqlite copy of the mined db_spec json files. A dict file is stored one row per top level key,
+    so a table's entry can be fetched without deserializing the rest, along with its position so sections iterate
+    in the order the json had. Files are only imported again once their size or mtime changes, which only happens
+    after a rebuild. """
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        self._lock = Lock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.store_path, check_same_thread=False)
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != STORE_VERSION:
+                with self._conn:                # older layout, imported again from the json files
+                    self._conn.execute("DROP TABLE IF EXISTS sources")
+                    self._conn.execute("DROP TABLE IF EXISTS entries")
+                self._conn.execute(f"PRAGMA user_version = {STORE_VERSION}")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS sources (section TEXT PRIMARY KEY, kind TEXT, "
+                               "size INTEGER, mtime REAL, version INTEGER)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS entries (section TEXT, key TEXT, ordinal INTEGER, "
+                               "value TEXT, PRIMARY KEY (section, key)) WITHOUT ROWID")
+        return self._conn
+
+    def sync(self, files):
+        """ imports every section whose json file differs from what the store last saw """
+        with self._lock:
+            known = {row[0]: tuple(row[1:]) for row in
+                     self.conn.execute("SELECT section, size, mtime, version FROM sources")}
+            for section, path in files.items():
+                stat_result = os.stat(path)
+                if known.get(section) == (stat_result.st_size, stat_result.st_mtime, STORE_VERSION):
+                    continue
+                log.info(f'importing {os.path.basename(path)} into the spec store')
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                self._import(section, data, stat_result)
+
+    def _import(self, section, data, stat_result):
+        with self.conn:
+            self.conn.execute("DELETE FROM entries WHERE section = ?", (section,))
+            if isinstance(data, dict):
+                kind = 'dict'
+                rows = ((section, key, ordinal, json.dumps(val, separators=(',', ':')))
+                        for ordinal, (key, val) in enumerate(data.items()))
+            else:
+                kind = 'value'
+                rows = [(section, '', 0, json.dumps(data, separators=(',', ':')))]
+            self.conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)",
+                              (section, kind, stat_result.st_size, stat_result.st_mtime, STORE_VERSION))
+
+    def section(self, section):
+        with self._lock:
+            row = self.conn.execute("SELECT kind FROM sources WHERE section = ?", (section,)).fetchone()
+        if row is None:
+            return {}
+        if row[0] == 'dict':
+            return LazySection(self, section)
+        return self.entry(section, '')
+
+    def entry(self, section, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM entries WHERE section = ? AND key = ?",
+                                    (section, key)).fetchone()
+        return MISS if row is None else json.loads(row[0])
+
+    def keys(self, section):
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT key FROM entries WHERE section = ? ORDER BY ordinal",
+                                                        (section,))]
+
+    def entries(self, section):
+        with self._lock:
+            rows = self.conn.execute("SELECT key, value FROM entries WHERE section = ? ORDER BY ordinal",
+                                     (section,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+
+class LazySection(Mapping):
+    """ Read only dict view of a store section. Entries are fetched and kept on first lookup, the whole section is
+    only deserialized when something iterates it. """
+
+    def __init__(self, store, section):
+        self._store = store
+        self._section = section
+        self._entries = {}
+        self._keys = None
+        self._key_set = None
+        self._complete = False
+
+    def __getitem__(self, key):
+        if key in self._entries:
+            return self._entries[key]
+        if self._complete or not isinstance(key, str):
+            raise KeyError(key)
+        value = self._store.entry(self._section, key)
+        if value is MISS:
+            raise KeyError(key)
+        self._entries[key] = value
+        return value
+
+    def __contains__(self, key):
+        if key in self._entries:
+            return True
+        self.keys()
+        return key in self._key_set
+
+    def keys(self):
+        if self._keys is None:
+            self._keys = self._store.keys(self._section)
+            self._key_set = set(self._keys)
+        return self._keys
+
+    def _load_all(self):
+        if not self._complete:
+            fetched = self._entries             # keep objects already handed out, in stored key order
+            self._entries = {key: fetched.get(key, value) for key, value in self._store.entries(self._section).items()}
+            self._complete = True
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        self._load_all()
+        return self._entries.items()
+
+    def values(self):
+        self._load_all()
+        return self._entries.values()
@@ -39,31 +39,12 @@ def transform_json(json_filepath):
         if val['type_'] == 'db.where.WhereNode':
             update_nodes[node_id] = val
         custom_properties = val['custom']
-        sql_form = custom_properties.get('sql_form')
-        if isinstance(sql_form, str):
-            sql_commands = [{'sql': f'{i.strip()};', 'node_source': node_id} for i in sql_form.split(';') if len(i) > 0]
-        else:
-            sql_commands = [{'sql': i, 'node_source': node_id} for i in sql_form]
-        incompletes = {idx: i for idx, i in enumerate(sql_commands) if 'MISSING REQUIRED COLUMNS' in i['sql'] or 'NO COLUMNS PRESENT' in i['sql']}
-        completes = [i for i in sql_commands if i not in incompletes.values()]
+        completes, dict_form = node_sql(node_id, custom_properties, incompletes_ordered)
         sql_code.extend(completes)
-        dict_form = custom_properties.get('dict_sql')
         dict_form_list.append({'sql': dict_form, 'node_source': node_id})
         loc_form = custom_properties.get('loc_sql_form', [])
         if len(loc_form) > 0:
             loc_dict_list.extend(loc_form)
-        for idx, i in incompletes.items():
-            if isinstance(dict_form, list):
-                dict_form = dict_form[idx]
-            tbl_name = dict_form['table_name']
-            primary_key_cols = db_spec.node_templates[tbl_name].get("primary_keys")
-            pk_dict = {k: v for k, v in dict_form['columns'].items() if k in primary_key_cols}
-            pk_tuple = tuple([v for k, v in pk_dict.items()])
-            if len(pk_tuple) == 0 or pk_tuple in incompletes_ordered[tbl_name]:
-                key = (i['node_source'], tbl_name)                       # for very broken ones with no pk tuple
-            else:
-                key = pk_tuple
-            incompletes_ordered[tbl_name][key] = i
 
     if len(error_string) > 0:
         return error_string
@@ -76,6 +57,43 @@ def transform_json(json_filepath):
     return sql_code, dict_form_list, loc_code, dict(incompletes_ordered)
 
 
+def transform_graph(graph):
+    """ transform_json straight off the live graph, with no session save, keeping the statements per node. Also
+    gives the nodes connected to each node's output ports, which reference its primary key """
+    node_sql_map, dict_form_list, dependents = {}, [], {}
+    incompletes_ordered = defaultdict(dict)
+    for node in graph.all_nodes():
+        node_sql_map[node.id], dict_form = node_sql(node.id, node.model.custom_properties, incompletes_ordered)
+        dict_form_list.append({'sql': dict_form, 'node_source': node.id})
+        dependents[node.id] = {port.node().id for output in node.output_ports() for port in output.connected_ports()}
+    return node_sql_map, dependents, dict_form_list, dict(incompletes_ordered)
+
+
+def node_sql(node_id, custom_properties, incompletes_ordered):
+    """ statements of one node ready to run, and its dict form. Ones missing required columns are not run, they
+    are filed under their table and primary key in incompletes_ordered instead """
+    sql_form = custom_properties.get('sql_form')
+    if isinstance(sql_form, str):
+        sql_commands = [{'sql': f'{i.strip()};', 'node_source': node_id} for i in sql_form.split(';') if len(i) > 0]
+    else:
+        sql_commands = [{'sql': i, 'node_source': node_id} for i in sql_form]
+    incompletes = {idx: i for idx, i in enumerate(sql_commands) if 'MISSING REQUIRED COLUMNS' in i['sql'] or 'NO COLUMNS PRESENT' in i['sql']}
+    completes = [i for i in sql_commands if i not in incompletes.values()]
+    dict_form = custom_properties.get('dict_sql')
+    for idx, i in incompletes.items():
+        entry_form = dict_form[idx] if isinstance(dict_form, list) else dict_form
+        tbl_name = entry_form['table_name']
+        primary_key_cols = db_spec.node_templates[tbl_name].get("primary_keys")
+        pk_dict = {k: v for k, v in entry_form['columns'].items() if k in primary_key_cols}
+        pk_tuple = tuple([v for k, v in pk_dict.items()])
+        if len(pk_tuple) == 0 or pk_tuple in incompletes_ordered[tbl_name]:
+            key = (i['node_source'], tbl_name)                       # for very broken ones with no pk tuple
+        else:
+            key = pk_tuple
+        incompletes_ordered[tbl_name][key] = i
+    return completes, dict_form
+
+
 def argument_transform(sql_code, error_string, dict_form_list, effect_string, effect_id, custom_properties, type_arg,
                        effect_info, node_id):
     arg_params = custom_properties.get('arg_params', {})
@@ -5,7 +5,7 @@ import os
 import sys
 
 from graph.db_node_support import sync_node_options_all, set_nodes_visible_by_type
-from schema_generator import SQLValidator
+from schema_generator import SQLValidator, VALIDATION_LEVELS
 from graph.singletons.db_spec_singleton import db_spec
 from graph.utils import resource_path
 from graph.utils import check_civ_install_works, check_civ_config_works, check_workshop_works
@@ -48,6 +48,11 @@ class MetadataDialog(QtWidgets.QDialog):
         self.mod_age.addItems(["AGE_ANTIQUITY", "AGE_EXPLORATION", "AGE_MODERN"])
 
         self.hide_types = QtWidgets.QCheckBox()
+        self.validation_level = QtWidgets.QComboBox()
+        self.validation_level.addItems(VALIDATION_LEVELS)
+        self.validation_level.setToolTip('quick: failed inserts only\n'
+                                         'standard: also foreign keys of the rows the mod wrote\n'
+                                         'deep: also foreign keys and integrity of the whole database')
 
         self.mod_name.setText(MetaStore.get(graph, "Mod Name", ""))
         self.mod_desc.setText(MetaStore.get(graph, "Mod Description", ""))
@@ -56,6 +61,7 @@ class MetadataDialog(QtWidgets.QDialog):
         self.mod_action_id.setText(MetaStore.get(graph, "Mod Action", ""))
         self.mod_age.setCurrentText(MetaStore.get(graph, "Age", "AGE_ANTIQUITY"))
         self.hide_types.setChecked(MetaStore.get(graph, "Hide Types", False))
+        self.validation_level.setCurrentText(MetaStore.get(graph, "Validation Level", SQLValidator.validation_level))
 
         meta_group = QtWidgets.QGroupBox("Metadata")
         meta_layout = QtWidgets.QFormLayout(meta_group)
@@ -71,6 +77,7 @@ class MetadataDialog(QtWidgets.QDialog):
         graph_group = QtWidgets.QGroupBox("Graph")
         graph_setting_layout = QtWidgets.QFormLayout(graph_group)
         graph_setting_layout.addRow("Hide Types", self.hide_types)
+        graph_setting_layout.addRow("Validation Level", self.validation_level)
         layout.addWidget(graph_group)
 
         buttons = QtWidgets.QDialogButtonBox(
@@ -91,6 +98,7 @@ class MetadataDialog(QtWidgets.QDialog):
         MetaStore.set(self.graph, "Mod Action", self.mod_action_id.text())
         MetaStore.set(self.graph, "Age", self.mod_age.currentText())
         MetaStore.set(self.graph, "Hide Types", self.hide_types.isChecked())
+        MetaStore.set(self.graph, "Validation Level", self.validation_level.currentText())
 
         if old_age != self.mod_age.currentText():
             sync_node_options_all(self.graph)
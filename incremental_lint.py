@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import logging
+from itertools import count
+from collections import namedtuple
+
+from age_memory import age_memory
+from fk_check import WriteTracker, foreign_key_errors
+from lint_results import LintResults
+from sql_runner import execute_bisected
+from schema_generator import VALIDATION_LEVELS, explain_lint_errors, format_timings
+
+log = logging.getLogger(__name__)
+
+AppliedNode = namedtuple('AppliedNode', ['node', 'key', 'savepoint', 'statements', 'errors', 'written'])
+
+
+class IncrementalLint:
+    """ Graph lint kept open between tests on an in memory clone of an age database. Every node's statements run
+    inside their own savepoint, stacked in the order they were applied. On the next test only nodes whose
+    statements changed, were added or removed, and the nodes referencing their primary keys through ports are
+    dirty. The stack is rolled back to the lowest dirty node, the clean nodes above it re-applied as they were,
+    then the dirty ones pushed on top. A node being edited so ends up at the top of the stack, and re-testing it
+    only undoes and re-runs that node and its dependents. Apply order can drift from graph order this way, so when
+    unrelated nodes insert the same primary key the edited one is blamed, where a full test blames the later. """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._source = self._stat()
+        self.db = age_memory.clone(db_path)
+        self.db.isolation_level = None              # transactions and savepoints are handled here
+        self.db.execute('BEGIN')
+        self.tracker = WriteTracker(self.db)        # watermarks of the bare age, every node is scoped against them
+        self.applied = []                           # AppliedNode stack, bottom first
+        self._savepoints = count()
+
+    def _stat(self):
+        stat_result = os.stat(self.db_path)
+        return stat_result.st_size, stat_result.st_mtime
+
+    def stale(self):
+        """ True once the age database was rebuilt, the clone then needs replacing """
+        try:
+            return self._stat() != self._source
+        except OSError:
+            return True
+
+    def close(self):
+        self.db.close()
+        self.applied = []
+
+    def run(self, node_sql, dependents, database_spec, level='standard', dict_form_list=None, incomplete_dict=()):
+        """ node_sql: node id to its statements, in graph order. dependents: node id to the ids of nodes connected
+        to its output ports. Returns lint_info shaped like lint_database's, covering every node, with the ids of
+        the nodes that were re-run under 'relinted' """
+        if level not in VALIDATION_LEVELS:
+            raise ValueError(f'unknown validation level {level}, expected one of {VALIDATION_LEVELS}')
+        timings = {}
+        start = time.perf_counter()
+        relinted = self._update(node_sql, dependents)
+        entries = {entry.node: entry for entry in self.applied}
+        results = LintResults()
+        index = count()
+        for node_id in node_sql:
+            entry = entries[node_id]
+            for sql_info, error in zip(entry.statements, entry.errors):
+                results.add('main.sql', next(index), sql_info, error)
+        timings['statements'] = time.perf_counter() - start
+
+        fk_errors, integrity, start = [], None, time.perf_counter()
+        if level == 'standard':
+            self.tracker.inserted = set().union(*(entry.written[0] for entry in self.applied))
+            self.tracker.changed = set().union(*(entry.written[1] for entry in self.applied))
+            fk_errors = foreign_key_errors(self.db, self.tracker)
+            self.tracker.take()
+            timings['foreign keys'] = time.perf_counter() - start
+        elif level == 'deep':
+            fk_errors = self.db.execute("PRAGMA foreign_key_check").fetchall()
+            timings['foreign keys'] = time.perf_counter() - start
+            start = time.perf_counter()
+            integrity = self.db.execute("PRAGMA integrity_check").fetchone()[0]
+            timings['integrity'] = time.perf_counter() - start
+        lint_info = {"results": results, "foreign_key_errors": fk_errors, "integrity": integrity,
+                     "incomplete_dict": incomplete_dict, "level": level, "timings": timings, "relinted": relinted}
+
+        start = time.perf_counter()
+        explain_lint_errors(lint_info, self.db, dict_form_list, database_spec)
+        timings['explain'] = time.perf_counter() - start
+        log.info(f'{level} incremental lint, {len(relinted)} of {len(node_sql)} nodes re-run: '
+                 + format_timings(timings))
+        return lint_info
+
+    def _update(self, node_sql, dependents):
+        """ brings the stack in line with node_sql, returns the ids of the nodes that were (re)applied """
+        keys = {node_id: _statements_key(statements) for node_id, statements in node_sql.items()}
+        applied_keys = {entry.node: entry.key for entry in self.applied}
+        changed = {node_id for node_id, key in keys.items() if applied_keys.get(node_id) != key}
+        changed.update(node_id for node_id in applied_keys if node_id not in keys)          # deleted nodes
+        dirty = set(changed)
+        for node_id in changed:
+            dirty.update(dependents.get(node_id, ()))
+
+        depth = next((pos for pos, entry in enumerate(self.applied) if entry.node in dirty), len(self.applied))
+        popped = self.applied[depth:]
+        if popped:
+            self.db.execute(f'ROLLBACK TO {popped[0].savepoint}')
+            self.db.execute(f'RELEASE {popped[0].savepoint}')
+            del self.applied[depth:]
+        replay = [entry.node for entry in popped if entry.node in keys and entry.node not in dirty]
+        replay += [node_id for node_id in node_sql if node_id in dirty]
+        for node_id in replay:
+            self._apply(node_id, keys[node_id], node_sql[node_id])
+        return replay
+
+    def _apply(self, node_id, key, statements):
+        savepoint = f'lint_node_{next(self._savepoints)}'
+        self.db.execute(f'SAVEPOINT {savepoint}')
+        with self.tracker:
+            errors = execute_bisected(self.db, [sql_info['sql'] for sql_info in statements])
+        self.applied.append(AppliedNode(node_id, key, savepoint, statements, errors, self.tracker.take()))
+
+
+def _statements_key(statements):
+    return json.dumps([sql_info['sql'] for sql_info in statements], sort_keys=True, default=str)
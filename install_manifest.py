@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import logging
+
+log = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+SCHEMA_DIR = 'Base/Assets/schema/gameplay'
+MODINFO_ROOTS = ('Base', 'DLC')
+_item_pattern = re.compile(r'<Item[^>]*>\s*([^<]+?\.(?:xml|sql))\s*</Item>', re.IGNORECASE)
+
+
+class InstallManifest:
+    """ Tracks size and mtime of only the install files that feed the gameplay databases: the gameplay schema
+    scripts, the Base/DLC .modinfo files and the xml/sql files those modinfos reference. Directory listings are
+    cached against the directory mtime, so unchanged folders are never re-listed on later launches. Once there is a
+    stored manifest the modinfo walk only goes down the folders above known modinfos and into new folders, so trees
+    without any, like Base/Assets, are not statted again. A modinfo added deep inside such a tree is only found once
+    a folder above it on the walk changes. """
+
+    def __init__(self, civ_install, manifest_path):
+        self.root = civ_install
+        self.manifest_path = manifest_path
+        self.previous = self._read()
+        self.current = None
+
+    @property
+    def has_baseline(self):
+        return self.previous is not None
+
+    @property
+    def dirty(self):
+        """ True when the last scan differs from the stored manifest """
+        return self.current is not None and self.current != self.previous
+
+    def _read(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path, 'r') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            log.warning(f'install manifest unreadable, treating as first run: {e}')
+            return None
+        if data.get('version') != MANIFEST_VERSION or data.get('root') != self.root:
+            return None
+        return data
+
+    def scan(self):
+        """ Builds the current manifest and returns the set of relative paths that were added, removed or modified
+        since the stored one. Every tracked file counts as changed if there is no stored manifest. """
+        old = self.previous or {}
+        old_dirs, old_modinfos = old.get('dirs', {}), old.get('modinfos', {})
+        old_files = old.get('files', {})
+        new_dirs, new_modinfos, new_files = {}, {}, {}
+
+        for rel_path in self._list_dir(SCHEMA_DIR, old_dirs, new_dirs)['files']:
+            if rel_path.endswith('.sql'):
+                self._stat_into(f'{SCHEMA_DIR}/{rel_path}', new_files)
+
+        modinfo_paths, skipped = [], set()
+        spine = self._spine(old_modinfos) if self.previous is not None else None
+        for root_dir in MODINFO_ROOTS:
+            modinfo_paths.extend(self._walk_modinfos(root_dir, old_dirs, new_dirs, spine, skipped))
+        for rel_dir, listing in old_dirs.items():         # skipped trees keep their listings for the next scan
+            if rel_dir not in new_dirs and self._below(rel_dir, skipped):
+                new_dirs[rel_dir] = listing
+
+        for modinfo_path in modinfo_paths:
+            stat_info = self._stat_into(modinfo_path, new_files)
+            if stat_info is None:
+                continue
+            cached = old_modinfos.get(modinfo_path)
+            if cached is not None and old_files.get(modinfo_path) == stat_info:
+                refs = cached['refs']                   # modinfo untouched, so its references are too
+            else:
+                refs = self._modinfo_refs(modinfo_path)
+            new_modinfos[modinfo_path] = {'refs': refs}
+            for ref in refs:
+                self._stat_into(ref, new_files)
+
+        self.current = {'version': MANIFEST_VERSION, 'root': self.root, 'dirs': new_dirs,
+                        'modinfos': new_modinfos, 'files': new_files}
+        changed = {p for p, info in new_files.items() if old_files.get(p) != info}
+        changed.update(p for p in old_files if p not in new_files)
+        return changed
+
+    def latest_mtime(self):
+        files = (self.current or self.previous or {}).get('files', {})
+        if not files:
+            return -1
+        return max(info[1] for info in files.values())
+
+    def save(self):
+        if not self.dirty:
+            return
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.current, f, separators=(',', ':'), sort_keys=True)
+        self.previous = self.current
+
+    def _list_dir(self, rel_dir, old_dirs, new_dirs):
+        full_path = os.path.join(self.root, rel_dir)
+        try:
+            dir_mtime = os.stat(full_path).st_mtime
+        except OSError:
+            return {'mtime': -1, 'dirs': [], 'files': []}
+        cached = old_dirs.get(rel_dir)
+        if cached is not None and cached['mtime'] == dir_mtime:
+            new_dirs[rel_dir] = cached
+            return cached
+        sub_dirs, files = [], []
+        with os.scandir(full_path) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    sub_dirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+        listing = {'mtime': dir_mtime, 'dirs': sorted(sub_dirs), 'files': sorted(files)}
+        new_dirs[rel_dir] = listing
+        return listing
+
+    def _walk_modinfos(self, rel_dir, old_dirs, new_dirs, spine, skipped):
+        """ spine None walks everything, else only folders in the spine and folders the last scan hadnt seen """
+        listing = self._list_dir(rel_dir, old_dirs, new_dirs)
+        found = [f'{rel_dir}/{name}' for name in listing['files'] if '.modinfo' in name]
+        for sub_dir in listing['dirs']:
+            sub_path = f'{rel_dir}/{sub_dir}'
+            if spine is None or sub_path in spine:
+                found.extend(self._walk_modinfos(sub_path, old_dirs, new_dirs, spine, skipped))
+            elif sub_path not in old_dirs:
+                found.extend(self._walk_modinfos(sub_path, old_dirs, new_dirs, None, skipped))
+            else:
+                skipped.add(sub_path)
+        return found
+
+    @staticmethod
+    def _spine(modinfos):
+        """ every folder holding or above a modinfo """
+        spine = set()
+        for modinfo_path in modinfos:
+            parts = modinfo_path.split('/')[:-1]
+            spine.update('/'.join(parts[:depth]) for depth in range(1, len(parts) + 1))
+        return spine
+
+    @staticmethod
+    def _below(rel_dir, folders):
+        parts = rel_dir.split('/')
+        return any('/'.join(parts[:depth]) in folders for depth in range(1, len(parts) + 1))
+
+    def _modinfo_refs(self, modinfo_path):
+        with open(os.path.join(self.root, modinfo_path), 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        folder = modinfo_path.rsplit('/', 1)[0]
+        return sorted({f"{folder}/{item.strip().replace(chr(92), '/')}" for item in _item_pattern.findall(text)})
+
+    def _stat_into(self, rel_path, files):
+        try:
+            stat_result = os.stat(os.path.join(self.root, rel_path))
+        except OSError:
+            return None
+        info = [stat_result.st_size, stat_result.st_mtime]
+        files[rel_path] = info
+        return info
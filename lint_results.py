@@ -0,0 +1,138 @@
+import re
+import json
+import sqlite3
+from array import array
+from contextlib import closing
+from collections import namedtuple
+
+import statement_ir
+
+PASSED, FAILED, ROWS_FAILED = 0, 1, 2       # ROWS_FAILED: a multi row insert that only lost some of its rows
+_table_pattern = re.compile(r'^\s*(?:INSERT|REPLACE|UPDATE|DELETE)\b(?:\s+OR\s+\w+)?(?:\s+INTO|\s+FROM)?\s+'
+                            r'["`\[]?(\w+)', re.IGNORECASE)
+
+LintResult = namedtuple('LintResult', ['file', 'index', 'node', 'table', 'status', 'error'])
+
+
+class LintResults:
+    """ Outcome of every statement in a lint, kept as parallel arrays of file, statement index, node, table and
+    status code. Only failures get an entry in the sparse error table, holding text: the error kind and message,
+    the sql and any failed rows of a multi row insert. No statement dicts or exceptions are held on to, so a full
+    modlist replay stays small. Iterates as LintResult tuples. """
+
+    def __init__(self):
+        self.files, self.nodes, self.tables = [], [], []
+        self._file_ids, self._node_ids, self._table_ids = {}, {}, {}
+        self.file_idx, self.statement_idx = array('I'), array('I')
+        self.node_idx, self.table_idx = array('i'), array('i')         # -1 when there is none
+        self.status = array('B')
+        self.errors = {}                                                # position: error dict
+
+    def __len__(self):
+        return len(self.status)
+
+    def __iter__(self):
+        return (self._result(pos) for pos in range(len(self)))
+
+    def add(self, file_name, index, sql_info, error=None):
+        """ error is None, a sqlite3 error, or for a multi row insert a dict of row index to error """
+        stmt = sql_info['sql']
+        self.file_idx.append(self._intern(file_name, self.files, self._file_ids))
+        self.statement_idx.append(index)
+        self.node_idx.append(self._intern(sql_info.get('node_source'), self.nodes, self._node_ids))
+        self.table_idx.append(self._intern(table_of(stmt), self.tables, self._table_ids))
+        if error is None:
+            self.status.append(PASSED)
+            return
+        if isinstance(error, dict):             # coalesced xml rows, blame each bad row on its element and line
+            failed_rows = [{'row': row, 'source': stmt['sources'][row], 'values': stmt['rows'][row],
+                            'error': str(row_error)} for row, row_error in sorted(error.items())]
+            row, first_error = min(error.items())
+            self.status.append(ROWS_FAILED if len(error) < len(stmt['rows']) else FAILED)
+            self.errors[len(self.status) - 1] = {'kind': type(first_error).__name__, 'message': str(first_error),
+                                                 'sql': statement_ir.render(statement_ir.split_rows(stmt)[row]),
+                                                 'failed_rows': failed_rows}
+            return
+        self.status.append(FAILED)
+        self.errors[len(self.status) - 1] = {'kind': type(error).__name__, 'message': str(error),
+                                             'sql': statement_ir.render(stmt)}
+
+    def extend(self, other):
+        """ appends the results of another lint, as when mods are linted one after another """
+        offset = len(self)
+        for pos, result in enumerate(other):
+            self.file_idx.append(self._intern(result.file, self.files, self._file_ids))
+            self.statement_idx.append(result.index)
+            self.node_idx.append(self._intern(result.node, self.nodes, self._node_ids))
+            self.table_idx.append(self._intern(result.table, self.tables, self._table_ids))
+            self.status.append(result.status)
+            if result.error is not None:
+                self.errors[offset + pos] = result.error
+
+    def failures(self):
+        return (self._result(pos) for pos in sorted(self.errors))
+
+    def by_file(self, file_name):
+        return self._matching(self.file_idx, self._file_ids.get(file_name))
+
+    def by_node(self, node):
+        return self._matching(self.node_idx, self._node_ids.get(node))
+
+    def by_table(self, table):
+        return self._matching(self.table_idx, self._table_ids.get(table))
+
+    def counts(self):
+        return {'statements': len(self), 'failed': len(self.errors)}
+
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({'files': self.files, 'nodes': self.nodes, 'tables': self.tables,
+                       'file_idx': self.file_idx.tolist(), 'statement_idx': self.statement_idx.tolist(),
+                       'node_idx': self.node_idx.tolist(), 'table_idx': self.table_idx.tolist(),
+                       'status': self.status.tolist(), 'errors': self.errors}, f, separators=(',', ':'))
+
+    def to_sqlite(self, path):
+        """ one row per statement, error columns null for those that passed """
+        with closing(sqlite3.connect(path)) as conn, conn:
+            conn.execute("DROP TABLE IF EXISTS lint_results")
+            conn.execute("CREATE TABLE lint_results (file TEXT, statement INTEGER, node TEXT, table_name TEXT, "
+                         "status INTEGER, kind TEXT, message TEXT, sql TEXT, failed_rows TEXT)")
+            conn.executemany("INSERT INTO lint_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             ((result.file, result.index, result.node, result.table, result.status,
+                               *self._error_columns(result.error)) for result in self))
+
+    @staticmethod
+    def _error_columns(error):
+        if error is None:
+            return None, None, None, None
+        failed_rows = json.dumps(error['failed_rows']) if 'failed_rows' in error else None
+        return error['kind'], error['message'], error['sql'], failed_rows
+
+    def _matching(self, column, value_id):
+        if value_id is None:
+            return iter(())
+        return (self._result(pos) for pos, value in enumerate(column) if value == value_id)
+
+    def _result(self, pos):
+        return LintResult(self.files[self.file_idx[pos]], self.statement_idx[pos],
+                          self.nodes[self.node_idx[pos]] if self.node_idx[pos] >= 0 else None,
+                          self.tables[self.table_idx[pos]] if self.table_idx[pos] >= 0 else None,
+                          self.status[pos], self.errors.get(pos))
+
+    @staticmethod
+    def _intern(value, values, ids):
+        if value is None:
+            return -1
+        value_id = ids.get(value)
+        if value_id is None:
+            value_id = ids[value] = len(values)
+            values.append(value)
+        return value_id
+
+
+def table_of(stmt):
+    """ table a statement writes to, None for anything that isnt an insert, update or delete """
+    if statement_ir.is_statement(stmt):
+        return stmt['table']
+    match = _table_pattern.match(stmt)
+    return match.group(1) if match else None
@@ -0,0 +1,139 @@
+import logging
+import multiprocessing
+from itertools import count
+from functools import partial
+from threading import Lock, Thread
+
+from graph.singletons.filepaths import LocalFilePaths, file_log_handler
+
+log = logging.getLogger(__name__)
+
+
+def serve(conn, install_paths):
+    """ Lint service process. Loads the database spec and the three age databases once, then runs jobs sent over
+    the pipe until it closes. Per node outcomes go back as soon as the statements have run, the full lint_info
+    once foreign keys are checked and errors explained. """
+    (LocalFilePaths.civ_install, LocalFilePaths.civ_config, LocalFilePaths.workshop,
+     LocalFilePaths.save_appdata_path) = install_paths
+    logging.getLogger().addHandler(file_log_handler('lint_service.log'))         # app.log belongs to the app
+    from constants import ages
+    from age_memory import age_memory
+    from schema_generator import SQLValidator, check_valid_sql_against_db
+    from graph.singletons.db_spec_singleton import db_spec
+    from graph.transform_json_to_sql import transform_json
+    db_spec.initialize(False)
+    for age in ages:                        # warm, so a job only pays for its own in memory clone
+        SQLValidator.state_validation_setup(age, db_spec)
+        age_memory.preload(SQLValidator.age_db_path(age))
+    log.info('lint service ready')
+    conn.send(('ready', None, None))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message[0] == 'stop':
+            return
+        _, job_id, age, session_path, level = message
+        try:
+            sql_lines, dict_form_list, loc_lines, incompletes = transform_json(session_path)
+            result = check_valid_sql_against_db(age, sql_lines, db_spec, dict_form_list, incompletes=incompletes,
+                                                level=level, on_statements=partial(_send_nodes, conn, job_id))
+            conn.send(('done', job_id, result))
+        except Exception as e:
+            log.error(f'lint job {job_id} failed', exc_info=True)
+            conn.send(('error', job_id, f'{type(e).__name__}: {e}'))
+
+
+def _send_nodes(conn, job_id, results):
+    nodes = {}
+    for result in results:
+        node = nodes.setdefault(result.node, {'node': result.node, 'statements': 0, 'errors': []})
+        node['statements'] += 1
+        if result.error is not None:
+            node['errors'].append(result.error['message'])
+    for node in nodes.values():
+        conn.send(('node', job_id, node))
+
+
+class LintService:
+    """ Client side of a long lived lint process, started on first use. Jobs are lints of a saved graph session
+    against an age. Callbacks run on a reader thread, so Qt callers should hand them on through a signal. Jobs
+    still waiting when the process goes away get on_error, and a process that died before it was ready is not
+    started again, submit raises OSError instead. """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._process = None
+        self._conn = None
+        self._jobs = {}                     # job id: (on_node, on_done, on_error)
+        self._job_ids = count()
+        self._ready = False
+        self.failed_start = False
+
+    @property
+    def running(self):
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        self._ready = False
+        context = multiprocessing.get_context('spawn')          # never fork a process that has Qt running
+        self._conn, child_conn = context.Pipe()
+        install_paths = (LocalFilePaths.civ_install, LocalFilePaths.civ_config, LocalFilePaths.workshop,
+                         LocalFilePaths.save_appdata_path)
+        self._process = context.Process(target=serve, args=(child_conn, install_paths), name='lint-service',
+                                        daemon=True)
+        self._process.start()
+        child_conn.close()
+        Thread(target=self._read, args=(self._conn,), name='lint-service-reader', daemon=True).start()
+
+    def submit(self, age, session_path, level, on_node=None, on_done=None, on_error=None):
+        with self._lock:
+            if self.failed_start:
+                raise OSError('lint service failed to start, see lint_service.log')
+            if not self.running:
+                self.start()
+            job_id = next(self._job_ids)
+            self._jobs[job_id] = (on_node, on_done, on_error)
+            self._conn.send(('lint', job_id, age, session_path, level))
+        return job_id
+
+    def stop(self):
+        with self._lock:
+            if self.running:
+                self._conn.send(('stop',))
+                self._process.join(timeout=5)
+            self._process = None
+
+    def _read(self, conn):
+        while True:
+            try:
+                kind, job_id, payload = conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == 'ready':
+                self._ready = True
+                continue
+            with self._lock:
+                callbacks = self._jobs.get(job_id) if kind == 'node' else self._jobs.pop(job_id, None)
+            if callbacks is None:
+                continue
+            on_node, on_done, on_error = callbacks
+            callback = {'node': on_node, 'done': on_done, 'error': on_error}[kind]
+            if callback is not None:
+                callback(payload)
+        with self._lock:                    # service went away, fail whatever was still waiting on it
+            if conn is not self._conn:
+                return                      # already replaced by a restart, its jobs are not ours
+            if not self._ready and self._process is not None:
+                self.failed_start = True
+                log.error('lint service died while starting up')
+            pending = [callbacks[2] for callbacks in self._jobs.values()]
+            self._jobs.clear()
+        for on_error in pending:
+            if on_error is not None:
+                on_error('lint service stopped')
+
+
+lint_service = LintService()
@@ -1,11 +1,16 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QSplashScreen, QProgressBar, QLabel, QDialog
-from PyQt5.QtCore import QThread, pyqtSignal, Qt, QWaitCondition, QMutex
-from PyQt5.QtGui import QPixmap
+from startup_profile import profiler
+profiler.enable_from_argv(sys.argv)                         # --profile-startup
 
-from graph.utils import resource_path
-from graph.windows import PathSettingsDialog
-from graph.singletons.filepaths import LocalFilePaths       # needed because we want logger initialised
+with profiler.phase('imports'):
+    import multiprocessing
+    from PyQt5.QtWidgets import QApplication, QSplashScreen, QProgressBar, QLabel, QDialog
+    from PyQt5.QtCore import QThread, pyqtSignal, Qt, QWaitCondition, QMutex
+    from PyQt5.QtGui import QPixmap
+
+    from graph.utils import resource_path
+    from graph.windows import PathSettingsDialog
+    from graph.singletons.filepaths import LocalFilePaths       # needed because we want logger initialised
 
 LocalFilePaths.initialize_paths()
 
@@ -23,7 +28,20 @@ class SetupWorker(QThread):
 
     def run(self):
         self.progress.emit("resources/DB_Start.png", 0)
-        from graph.singletons.db_spec_singleton import db_spec
+        from startup import StartupScheduler
+        self.image = resource_path("resources/DB_Loading.png")
+        self.scheduler = StartupScheduler(progress=self.report_stage)
+        self.scheduler.add('paths', self.ensure_paths)
+        self.scheduler.add('manifest_scan', self.scan_install, deps=['paths'])
+        self.scheduler.add('schema_snapshot', self.load_schema, deps=['paths'])
+        self.scheduler.add('spec_load', self.load_spec, deps=['manifest_scan', 'schema_snapshot'], weight=6)
+        self.scheduler.add('node_blueprints', self.build_blueprints, deps=['spec_load'])
+        self.scheduler.run()
+
+        self.progress.emit("resources/DB_Done.png", 100)
+        self.finished.emit()
+
+    def ensure_paths(self, scheduler):
         paths = {'config': LocalFilePaths.civ_config, 'install': LocalFilePaths.civ_install,
                  'workshop': LocalFilePaths.workshop}
         if not all(paths.values()):
@@ -32,19 +50,35 @@ class SetupWorker(QThread):
             self.condition.wait(self.mutex)
             self.mutex.unlock()                 # db_spec initialization will continue
 
+    def scan_install(self, scheduler):
+        from graph.singletons.db_spec_singleton import db_spec
         patch_occurred, latest = db_spec.check_firaxis_patched()
         if patch_occurred:
-            self.progress.emit(resource_path("resources/DB_Changes.png"), 10)
-        else:
-            self.progress.emit(resource_path("resources/DB_Loading.png"), 50)
-        db_spec.initialize(patch_occurred, latest)
+            self.image = resource_path("resources/DB_Changes.png")
+        return patch_occurred, latest
 
-        self.progress.emit("resources/DB_Loading.png", 50)
+    @staticmethod
+    def load_schema(scheduler):
+        from schema_generator import SQLValidator
+        SQLValidator.initialize()
 
-        db_spec.initialize(patch_occurred, latest)
+    def load_spec(self, scheduler):
+        from graph.singletons.db_spec_singleton import db_spec
+        patch_occurred, latest = scheduler.results['manifest_scan']
+        db_spec.initialize(patch_occurred, latest, progress=self.report_age_built)
 
-        self.progress.emit("resources/DB_Done.png", 100)
-        self.finished.emit()
+    @staticmethod
+    def build_blueprints(scheduler):
+        from schema_generator import SQLValidator
+        from graph.nodes.dynamic_nodes import table_blueprint
+        for table_name in SQLValidator.table_names:
+            table_blueprint(table_name)
+
+    def report_stage(self, stage_name, value):
+        self.progress.emit(self.image, value)
+
+    def report_age_built(self, age_type, done, total):          # called per age as the databases finish building
+        self.scheduler.report('spec_load', done / total)
 
 
 class MainController:
@@ -97,7 +131,8 @@ class MainController:
         self.worker.condition.wakeAll()
 
     def on_finished(self):
-        from graph.node_controller import NodeEditorWindow
+        with profiler.phase('imports:node_controller'):
+            from graph.node_controller import NodeEditorWindow
         self.main_window = NodeEditorWindow()
         self.main_window.show()
         self.splash.finish(self.main_window)
@@ -108,5 +143,6 @@ class MainController:
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()        # age databases build in worker processes, needed when packaged
     controller = MainController()
     controller.run()
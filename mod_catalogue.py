@@ -0,0 +1,277 @@
+import os
+import re
+import copy
+import json
+import hashlib
+import logging
+from threading import Lock
+
+from xml_handler import read_xml
+from graph.singletons.filepaths import LocalFilePaths
+
+log = logging.getLogger(__name__)
+
+CATALOGUE_VERSION = 2
+_mod_id_pattern = re.compile(r'<Mod id="([^"]+)"')
+
+
+class ModCatalogue:
+    """ Installed mods and dlc, kept in mod_catalogue.json in app data. Folder listings are cached against the
+    folder mtime, so unchanged folders under the install, workshop and config roots are never re-listed, and a
+    .modinfo is only reopened once its size or mtime moves, and then only read up to its <Mod id=...> header.
+    Criteria, action groups and the hashes of the files they apply are parsed the first time they are asked for
+    and kept until the modinfo or file changes. Paths are joined with '/' like the globbed paths they replaced, as
+    load_files and the short names in reports split on it. """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._data = None
+
+    @property
+    def catalogue_path(self):
+        return LocalFilePaths.app_data_path_form('mod_catalogue.json')
+
+    @staticmethod
+    def _roots():
+        """ (folder, is dlc), dlc first so its ids win when a mod id is duplicated """
+        return [(LocalFilePaths.civ_install, True), (LocalFilePaths.workshop, False),
+                (LocalFilePaths.civ_config, False)]
+
+    def mods(self):
+        """ every catalogued modinfo in scan order, as {'path', 'id', 'folder', 'dlc'} """
+        with self._lock:
+            self._refresh()
+            return [{'path': path, 'id': entry['id'], 'folder': entry['folder'], 'dlc': entry['dlc']}
+                    for path, entry in self._data['mods'].items()]
+
+    def dlc_mod_ids(self):
+        return [mod['id'] for mod in self.mods() if mod['dlc'] and mod['id'] is not None]
+
+    def mods_in_folder(self, mod_folder_path):
+        """ modinfos directly inside a folder. Folders outside the catalogue roots are listed as they are asked for """
+        folder = _trim(mod_folder_path)
+        found = [mod for mod in self.mods() if os.path.normpath(mod['folder']) == os.path.normpath(folder)]
+        if found or not os.path.isdir(folder):
+            return found
+        with self._lock:
+            for name in sorted(os.listdir(folder)):
+                if '.modinfo' in name:
+                    path = f'{folder}/{name}'
+                    self._data['mods'][path] = self._read_header(path, dlc=False)
+                    found.append({'path': path, 'id': self._data['mods'][path]['id'], 'folder': folder, 'dlc': False})
+        return found
+
+    def mod_info(self, modinfo_path):
+        """ parse_modinfo output for a catalogued modinfo, plus 'files' of path: [size, mtime, sha1] for every
+        file its action groups apply. Returns a copy along with the mod id """
+        with self._lock:
+            if self._data is None:
+                self._refresh()
+            entry = self._data['mods'][modinfo_path]
+            if entry.get('info') is None:
+                info, mod_id = parse_modinfo(modinfo_path, entry['folder'])
+                entry['info'], entry['id'], entry['files'] = info, mod_id, {}
+            files = {}
+            for action_group in entry['info']['action_groups'].values():
+                for file_path in action_group['filepaths']:
+                    files[file_path] = self._file_hash(file_path, entry['files'].get(file_path))
+            entry['files'] = files
+            self._save()
+            return dict(copy.deepcopy(entry['info']), files=copy.deepcopy(files)), entry['id']
+
+    def _refresh(self):
+        if self._data is None:
+            self._data = self._read()
+        roots = [root for root, _ in self._roots()]
+        old_dirs, old_mods = self._data['dirs'], self._data['mods']
+        new_dirs, new_mods, changed = {}, {}, self._data['roots'] != roots
+        for root, dlc in self._roots():
+            if not root:                        # not found on this machine, dont glob from the filesystem root
+                continue
+            for path in self._walk(_trim(root), old_dirs, new_dirs):
+                entry = old_mods.get(path)
+                stat_info = self._stat(path)
+                if entry is None or entry['stat'] != stat_info:
+                    entry, changed = self._read_header(path, dlc), True
+                entry['dlc'] = dlc
+                new_mods.setdefault(path, entry)
+        changed = changed or new_dirs != old_dirs or list(new_mods) != list(old_mods)
+        self._data = {'version': CATALOGUE_VERSION, 'roots': roots, 'dirs': new_dirs, 'mods': new_mods}
+        if changed:
+            self._save()
+
+    def _walk(self, dir_path, old_dirs, new_dirs):
+        try:
+            dir_mtime = os.stat(dir_path).st_mtime
+        except OSError:
+            return []
+        listing = old_dirs.get(dir_path)
+        if listing is None or listing['mtime'] != dir_mtime:
+            sub_dirs, modinfos = [], []
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir():
+                        sub_dirs.append(entry.name)
+                    elif '.modinfo' in entry.name:
+                        modinfos.append(entry.name)
+            listing = {'mtime': dir_mtime, 'dirs': sorted(sub_dirs), 'modinfos': sorted(modinfos)}
+        new_dirs[dir_path] = listing
+        found = [f'{dir_path}/{name}' for name in listing['modinfos']]
+        for sub_dir in listing['dirs']:
+            found.extend(self._walk(f'{dir_path}/{sub_dir}', old_dirs, new_dirs))
+        return found
+
+    def _read_header(self, modinfo_path, dlc):
+        """ reads only as far as the <Mod id=...> tag """
+        mod_id, text = None, ''
+        with open(modinfo_path, 'r', encoding='utf-8', errors='replace') as f:
+            for chunk in iter(lambda: f.read(4096), ''):
+                text += chunk
+                match = _mod_id_pattern.search(text)
+                if match:
+                    mod_id = match.group(1)
+                    break
+        return {'stat': self._stat(modinfo_path), 'id': mod_id, 'folder': modinfo_path.rsplit('/', 1)[0],
+                'dlc': dlc, 'info': None, 'files': {}}
+
+    def _file_hash(self, file_path, cached):
+        stat_info = self._stat(file_path)
+        if stat_info is None:
+            return None
+        if cached is not None and cached[:2] == stat_info:
+            return cached
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return stat_info + [digest.hexdigest()]
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        return [stat_result.st_size, stat_result.st_mtime]
+
+    def _read(self):
+        empty = {'version': CATALOGUE_VERSION, 'roots': None, 'dirs': {}, 'mods': {}}
+        if not os.path.exists(self.catalogue_path):
+            return empty
+        try:
+            with open(self.catalogue_path, 'r') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            log.warning(f'mod catalogue unreadable, rescanning: {e}')
+            return empty
+        if data.get('version') != CATALOGUE_VERSION:
+            return empty
+        return data
+
+    def _save(self):
+        tmp_path = f'{self.catalogue_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.catalogue_path)
+
+
+def _trim(folder):
+    return folder.rstrip('/\\') or folder
+
+
+def parse_modinfo(modinfo_path, mod_folder_path):
+    xml_ = read_xml(modinfo_path)
+    xml_ = xml_['{ModInfo}Mod']
+    mod_id = xml_['@id']
+    criterias = xml_['{ModInfo}ActionCriteria']['{ModInfo}Criteria']
+    criteria_dict = {}
+    criterias = xml_ensure_list_of_dicts(criterias)
+    for criteria_info in criterias:
+        criteria_dict[criteria_info['@id']] = {}
+        specific_criteria = criteria_dict[criteria_info['@id']]
+        any_check = '@any' in criteria_info and criteria_info['@any'] == 'true'
+        for key, val in criteria_info.items():
+            if key == '@id':
+                continue
+            if 'ModInUse' in key:
+                if isinstance(val, dict):
+                    if val.get('@inverse') == '1':
+                        specific_criteria.setdefault('ModsOff', []).append(val['#text'])
+                    else:
+                        specific_criteria.setdefault('ModsOn', []).append(val['#text'])
+                elif isinstance(val, list):
+                    specific_criteria.setdefault('ModsOn', []).extend(val)
+                elif isinstance(val, str):
+                    specific_criteria.setdefault('ModsOn', []).append(val)
+                else:
+                    raise Exception(f'Unknown type for xml handler {val} for mod {mod_id}')
+
+            elif 'AgeInUse' in key:
+                if isinstance(val, dict):
+                    log.warning('skipping xml dict while parsing criteria as Age in Use but is dict')
+                elif isinstance(val, str):
+                    specific_criteria.setdefault('AgeOn', []).append(val)
+                elif isinstance(val, list):
+                    specific_criteria.setdefault('AgeOn', []).extend(val)
+                else:
+                    raise Exception(f'Unknown type for xml handler {val} for mod {mod_id}')
+            elif 'ConfigurationValueMatch' in key:
+                if isinstance(val, dict):
+                    config_group = val['{ModInfo}Group']
+                    config_id = val['{ModInfo}ConfigurationId']
+                    config_value = val['{ModInfo}Value']
+                    config_tuple = (config_id, config_value)
+                    specific_criteria.setdefault('ConfigurationValueMatches', {}).setdefault(config_group, []).extend(
+                        config_tuple)
+                else:
+                    raise Exception(f'Unknown type for xml handler {val} for mod {mod_id}')
+
+            elif 'AlwaysMet' in key:
+                continue
+            else:
+                log.critical(f'Trying to parse modinfo of {mod_id} and met new criteria! {key}. skipping but this bad')
+
+    # criterias
+    # do we handle dependencies?
+    action_groups_dict = {}
+    action_groups = xml_['{ModInfo}ActionGroups']['{ModInfo}ActionGroup']
+    action_groups = xml_ensure_list_of_dicts(action_groups)
+    for action_group in action_groups:
+        scope = action_group.get('@scope', None)
+        if scope is not None:
+            if scope == 'shell':
+                continue                # currently not handling shell
+            elif scope == 'game':
+                action_group_id = action_group['@id']
+                action_groups_dict[action_group_id] = {'criteria': action_group.get('@criteria', 'always'),
+                                                       'filepaths': [],
+                                                       'priority': int(action_group.get('{ModInfo}Properties', {}).get('{ModInfo}LoadOrder', -1))}
+                actions = action_group.get('{ModInfo}Actions', {})
+                for action_type, action_dict in actions.items():
+                    if action_dict == '':       # empty xml. We should fix this earlier, but we didnt.
+                        continue
+                    if 'UpdateDatabase' in action_type:
+                        for item_name, file_path_list in action_dict.items():
+                            if isinstance(file_path_list, str):
+                                full_file_path = f"{mod_folder_path}/{file_path_list}"
+                                action_groups_dict[action_group_id]['filepaths'].append(full_file_path)
+                            else:
+                                for mod_file_path in file_path_list:
+                                    full_file_path = f"{mod_folder_path}/{mod_file_path}"
+                                    action_groups_dict[action_group_id]['filepaths'].append(full_file_path)
+            else:
+                raise Exception(f'scope on mod {mod_id},'
+                      f' with action {action_group.get("@id", "unknown")} had unregistered scope: {scope}')
+    mod_info_dict = {'criteria': criteria_dict, 'action_groups': action_groups_dict, 'base_folder': mod_folder_path}
+    return mod_info_dict, mod_id
+
+
+def xml_ensure_list_of_dicts(data):
+    if not isinstance(data, list):
+        return [data]
+    return data
+
+
+mod_catalogue = ModCatalogue()
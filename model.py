@@ -1,68 +1,28 @@
 import os
 import re
-import glob
+import time
 import sqlite3
 import shutil
 import logging
 import sqlparse
+from itertools import repeat
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 
-from xml_handler import read_xml
+from xml_handler import read_xml, element_lines
 from gameeffects import game_effects, req_build, req_set_build
 from graph.singletons.filepaths import LocalFilePaths
 from graph.utils import resource_path, LogPusher
+from statement_cache import statement_cache, MISS
+from mod_catalogue import mod_catalogue
+import statement_ir
 
 log = logging.getLogger(__name__)
 
-
-def convert_to_sql(statements):
-    sql_list = []
-    for stmt in statements:
-        if stmt["type"] == "INSERT":
-            columns = ", ".join(stmt["columns"])
-            for idx, i in enumerate(stmt["values"]):
-                if i is not None and '"' in i:
-                    stmt["values"][idx] = stmt["values"][idx].replace('"', "'")
-            values = ", ".join(f'"{value}"' if isinstance(value, str) else str(value) for value in stmt["values"])
-            sql = f"INSERT INTO {stmt['table']} ({columns}) VALUES ({values});"
-
-        elif stmt["type"] == "REPLACE":
-            columns = ", ".join(stmt["columns"])
-            values = ", ".join(f"'{value}'" if isinstance(value, str) else str(value) for value in stmt["values"])
-            sql = f"INSERT OR REPLACE into {stmt['table']} ({columns}) VALUES ({values});"
-
-        elif stmt["type"] == "UPDATE":
-            set_clause = ", ".join(f"{col} = '{value}'" if isinstance(value, str) else f"{col} = {value}"
-                                   for col, value in stmt["set"].items())
-            where_clause = " AND ".join(f"{col} = '{value}'" if isinstance(value, str) else f"{col} = {value}"
-                                        for col, value in stmt["where"].items())
-            sql = f"UPDATE {stmt['table']} SET {set_clause} WHERE {where_clause};"
-
-        elif stmt["type"] == "DELETE":
-            where_clause = " AND ".join(f"{col} = '{value}'" if isinstance(value, str) else f"{col} = {value}"
-                                        for col, value in stmt["where"].items())
-            sql = f"DELETE FROM {stmt['table']} WHERE {where_clause};"
-        elif stmt["type"] == "INSERT IGNORE":
-            columns = ", ".join(stmt["columns"])
-            values = ", ".join(f"'{value}'" if isinstance(value, str) else str(value) for value in stmt["values"])
-            sql = f"INSERT OR IGNORE INTO {stmt['table']} ({columns}) VALUES ({values});"
-        else:
-            raise Exception("Unknown")
-        sql = sql.replace('@', '')
-        sql = sql.replace('true', '1')
-        sql = sql.replace('True', '1')
-        sql = sql.replace('TRUE', '1')
-        sql = sql.replace('false', '0')
-        sql = sql.replace('False', '0')
-        sql = sql.replace('FALSE', '0')
-        sql = sql.replace('None', 'NULL')
-        if "'’'" in sql:
-            sql = sql.replace("'’'", '"’"')
-        if "'''" in sql:
-            sql = sql.replace("'''", '"\'"')
-        sql_list.append(sql)
-    return sql_list
+CONVERTER_VERSION = 4           # bump when convert_xml_to_sql output changes, invalidates the statement cache
+PARSE_WORKERS = os.cpu_count() or 1
+MIN_POOL_PARSES = 16            # fewer cache misses than this parse faster in process than a pool starts up
 
 
 def convert_xml_to_sql(xml_file, job_type=None):
@@ -96,11 +56,7 @@ def convert_xml_to_sql(xml_file, job_type=None):
             sql_string += f"PRIMARY KEY({', '.join([i for i in pks])}));"
             sql_strings.append(sql_string)
         return sql_strings, {}
-    # filter out empty strings
-    for key, val in xml_.items():
-        if isinstance(val, list):
-            new_val = [j for j in val if not isinstance(j, str)]
-            xml_[key] = new_val
+    lines = element_lines(xml_file)          # provenance, so a bad row can be blamed after coalescing
     xml_errors = {}
     for table_name, sql_commands in xml_.items():
         if table_name == 'Row':
@@ -115,9 +71,14 @@ def convert_xml_to_sql(xml_file, job_type=None):
             continue
         if not isinstance(sql_commands, list):
             sql_commands = [sql_commands]
-        for sql_commands_dict in sql_commands:
+        # filter out empty table elements, which come through as strings or None. element_lines still counts them
+        # among the siblings, so each table keeps its index from before the filter
+        elements = [(idx, j) for idx, j in enumerate(sql_commands) if isinstance(j, dict)]
+        for table_idx, sql_commands_dict in elements:
+            first = len(sql_statements)
             if table_name == '{GameEffects}Modifier':
                 sql_statements, errors = game_effects(sql_statements, sql_commands_dict, xml_file, skips)
+                element_source(sql_statements[first:], lines, table_name, table_idx)
                 if len(errors) > 0:
                     if xml_errors.get(table_name, False):
                         xml_errors[table_name].append(errors)
@@ -127,10 +88,12 @@ def convert_xml_to_sql(xml_file, job_type=None):
             if table_name == '{GameEffects}RequirementSet':
                 req_set_id = sql_commands_dict['@id']
                 sql_statements = req_set_build(sql_statements, sql_commands_dict, req_set_id)
+                element_source(sql_statements[first:], lines, table_name, table_idx)
                 continue
             if table_name == '{GameEffects}Requirement':
                 req_id = sql_commands_dict['@id']
                 sql_statements, req_id = req_build(sql_statements, sql_commands_dict, req_id)
+                element_source(sql_statements[first:], lines, table_name, table_idx)
                 continue
             for command, details in sql_commands_dict.items():
                 if details is None:
@@ -138,39 +101,50 @@ def convert_xml_to_sql(xml_file, job_type=None):
                 if command == 'Delete':
                     if not isinstance(details, list):
                         details = [details]
-                    for record in details:
-                        for column, value in record.items():
-                            sql_statements.append({"type": "DELETE", "table": table_name, "where": {column: value}})
+                    for row_idx, record in enumerate(details):
+                        deletes = [statement_ir.delete(table_name, {column: value}) for column, value in record.items()]
+                        element_source(deletes, lines, table_name, table_idx, command, row_idx)
+                        sql_statements.extend(deletes)
                 elif command == 'Update':
                     if not isinstance(details, list):
                         details = [details]
-                    for record in details:
-                        sql_statements.append({"type": "UPDATE", "table": table_name, "set": record['Set'],
-                                                   "where": {i: j for i, j in record['Where'].items()}})
+                    for row_idx, record in enumerate(details):
+                        stmt = statement_ir.update(table_name, record['Set'], record['Where'])
+                        element_source([stmt], lines, table_name, table_idx, command, row_idx)
+                        sql_statements.append(stmt)
                 elif command == 'Row':
                     if not isinstance(details, list):
                         details = [details]
-                    for record in details:
-                        columns, values = [i for i in record], [j for j in record.values()]
-                        sql_statements.append({"type": "INSERT", "table": table_name, "columns": columns, "values": values})
+                    for row_idx, record in enumerate(details):
+                        stmt = statement_ir.insert(table_name, record, record.values())
+                        element_source([stmt], lines, table_name, table_idx, command, row_idx)
+                        sql_statements.append(stmt)
                 elif command == 'Replace':
                     if not isinstance(details, list):
                         details = [details]
-                    for record in details:
-                        columns, values = [i for i in record], [j for j in record.values()]
-                        sql_statements.append({"type": "REPLACE", "table": table_name, "columns": columns, "values": values})
+                    for row_idx, record in enumerate(details):
+                        stmt = statement_ir.insert(table_name, record, record.values(), op='INSERT OR REPLACE')
+                        element_source([stmt], lines, table_name, table_idx, command, row_idx)
+                        sql_statements.append(stmt)
                 elif command == 'InsertOrIgnore':
                     if not isinstance(details, list):
                         details = [details]
-                    for record in details:
-                        columns, values = [i for i in record], [j for j in record.values()]
-                        sql_statements.append({"type": "INSERT IGNORE", "table": table_name, "columns": columns, "values": values})
+                    for row_idx, record in enumerate(details):
+                        stmt = statement_ir.insert(table_name, record, record.values(), op='INSERT OR IGNORE')
+                        element_source([stmt], lines, table_name, table_idx, command, row_idx)
+                        sql_statements.append(stmt)
                 elif command == '#text':
                     LogPusher.push_to_log(f'Firaxis typo lol on {xml_file}', log)
                 else:
                     LogPusher.push_to_log(f'unknown command: {command}', log)
-    sql_strings = convert_to_sql(sql_statements)
-    return sql_strings, xml_errors
+    return statement_ir.coalesce(sql_statements), xml_errors
+
+
+def element_source(statements, lines, *path):
+    """ tags statements with the xml element they came from and its line, path is alternating tag and index """
+    element = '/'.join(f'{tag}[{idx}]' for tag, idx in zip(path[::2], path[1::2]))
+    for stmt in statements:
+        stmt['source'] = [element, lines.get(path)]
 
 
 def validate_xml(xml_dict):
@@ -195,27 +169,20 @@ def validate_xml(xml_dict):
 
 def query_mod_db(age, log_queue=None):
     files_to_apply = []
-    # first we need the modinfos of each mod
-    filepath_dlc_mod_infos = [f for f in glob.glob(f"{LocalFilePaths.civ_install}/**/*.modinfo*", recursive=True)]
-    filepath_mod_mod_infos = ([f for f in glob.glob(f"{LocalFilePaths.workshop}/**/*.modinfo*", recursive=True)] +
-                              [f for f in glob.glob(f"{LocalFilePaths.civ_config}/**/*.modinfo*", recursive=True)])
-    filepath_mod_infos = filepath_dlc_mod_infos + filepath_mod_mod_infos
+    # first we need the modinfos of each mod, from the catalogue so only changed folders and modinfos are read
     modinfo_uuids, err_string, dlc_mods, mod_mods = {}, '', [], []
 
-    for filepath in filepath_mod_infos:
-        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-            text = f.read()
-        match = re.search(r'<Mod id="([^"]+)"', text)
-        if match:
-            folder_path = os.path.dirname(filepath)
-            uuid = match.group(1)
+    for mod in mod_catalogue.mods():
+        if mod['id'] is not None:
+            folder_path = mod['folder']
+            uuid = mod['id']
             if uuid in modinfo_uuids:
                 log.error(f'ERROR: Duplicate modinfo UUID:You likely have a local copy and a workshop copy of '
                                f'the same mod {uuid}.\nCurrent folder path: {folder_path},\nexistin'
                                f'g folder path: {modinfo_uuids[uuid]}\n----------------')
             else:
                 modinfo_uuids[uuid] = folder_path
-                if filepath in filepath_dlc_mod_infos:
+                if mod['dlc']:
                     dlc_mods.append(uuid)
                 else:
                     mod_mods.append(uuid)
@@ -297,42 +264,108 @@ def organise_entries(database_entries, wrap_queue=None):
     return modded_short, modded, dlc, dlc_files
 
 
-def load_files(jobs, job_type):
+def read_sql_file(db_file):
+    try:
+        with open(db_file, 'r') as file:
+            sql_contents = file.read()
+    except UnicodeDecodeError as e:
+        LogPusher.push_to_log(f'Bad unicode, trying windows-1252: {e}', log)
+        with open(db_file, 'r', encoding='windows-1252') as file:
+            sql_contents = file.read()
+    comment_cleaned = re.sub(r'--.*?\n', '', sql_contents, flags=re.DOTALL)
+    return sqlparse.split(comment_cleaned)
+
+
+def parse_db_file(db_file, job_type=None):
+    """ sql statements of an xml or sql file, None if it was an empty xml. Goes through the on disk statement
+    cache, so a file is only parsed again once it changes on disk or the converter version is bumped. """
+    statements = statement_cache.get(db_file, CONVERTER_VERSION)
+    if statements is MISS:
+        statements = convert_db_file(db_file, job_type)
+    return statement_ir.bind_types(statements)
+
+
+def convert_db_file(db_file, job_type=None):
+    """ parse_db_file without the cache lookup, for files already known to be misses """
+    if db_file.endswith('.xml'):
+        statements, xml_errors = convert_xml_to_sql(db_file, job_type)
+        if isinstance(statements, str):             # empty file message
+            statements = None
+    else:
+        statements = read_sql_file(db_file)
+    statement_cache.put(db_file, CONVERTER_VERSION, statements)
+    return statements
+
+
+def _timed_convert(db_file, job_type, save_appdata_path=None):
+    if save_appdata_path is not None:               # worker processes write to the same statement cache
+        LocalFilePaths.save_appdata_path = save_appdata_path
+    start = time.perf_counter()
+    statements = convert_db_file(db_file, job_type)
+    return statements, time.perf_counter() - start
+
+
+def parse_files(db_files, job_type, workers=None):
+    """ (statements, seconds) per file, in the order given. Cache hits are read here, the misses are parsed in a
+    process pool when there are enough of them to pay for it """
+    workers = PARSE_WORKERS if workers is None else workers
+    parsed, misses = [None] * len(db_files), []
+    for idx, db_file in enumerate(db_files):
+        start = time.perf_counter()
+        statements = statement_cache.get(db_file, CONVERTER_VERSION)
+        if statements is MISS:
+            misses.append(idx)
+        else:
+            parsed[idx] = statements, time.perf_counter() - start
+    miss_files, processes = [db_files[idx] for idx in misses], 1
+    if workers > 1 and len(misses) >= MIN_POOL_PARSES:
+        processes = min(workers, len(misses))
+        with ProcessPoolExecutor(max_workers=processes) as pool:         # map keeps the order it was given
+            converted = list(pool.map(_timed_convert, miss_files, repeat(job_type),
+                                      repeat(LocalFilePaths.save_appdata_path),
+                                      chunksize=max(1, len(misses) // (processes * 4))))
+    else:
+        converted = [_timed_convert(db_file, job_type) for db_file in miss_files]
+    for idx, result in zip(misses, converted):
+        parsed[idx] = result
+    for statements, _ in parsed:
+        statement_ir.bind_types(statements)             # cached as written, bound against the loaded schema
+    statement_cache.flush()
+    if misses:
+        log.info(f'parsed {len(misses)} {job_type} files on {processes} processes, '
+                 f'{len(db_files) - len(misses)} from the statement cache')
+    return parsed
+
+
+def load_files(jobs, job_type, workers=None):
     jobs_short_ref = [('/'.join(i.split('/')[-4:]), i) for i in jobs]
-    missed_files, ensure_ordered_sql, firaxis_fails, known_mod_fails = [], [], [], []
-    known_mod_fails, sql_statements, sql_cache = [], {}, {}
+    missed_files, sql_statements, sql_cache, seen_files, parse_jobs = [], {}, {}, {}, []
 
     for short_name, db_file in jobs_short_ref:
-        existing_short = [i[0] for i in ensure_ordered_sql if i[0] == short_name]
-        if len(existing_short) > 0:
-            error_msg = f'Duplicate file: {short_name} already in list:\n2nd ref: {db_file}. Existing ref: {existing_short}'
+        if short_name in seen_files:
+            error_msg = (f'Duplicate file: {short_name} already in list:\n2nd ref: {db_file}. '
+                         f'Existing ref: {seen_files[short_name]}')
             LogPusher.push_to_log(error_msg, log)
-        if db_file.endswith('.xml'):
-            statements, xml_errors = convert_xml_to_sql(db_file, job_type)
-            if isinstance(statements, str):
-                missed_files.append(short_name)
-                sql_cache[db_file] = []
-                if job_type in ['DLC', 'vanilla']:
-                    log.debug('ignore as its just firaxis')
-                else:
-                    log.debug('ignore as its just modders having empty files')
-                continue
-            sql_statements[short_name], xml_errors = convert_xml_to_sql(db_file, job_type)
-            sql_cache[db_file] = sql_statements[short_name]
-            ensure_ordered_sql.append((short_name, sql_statements[short_name]))
-        if db_file.endswith('.sql'):
-            try:
-                with open(db_file, 'r') as file:
-                    sql_contents = file.read()
-            except UnicodeDecodeError as e:
-                LogPusher.push_to_log(f'Bad unicode, trying windows-1252: {e}', log)
-                with open(db_file, 'r', encoding='windows-1252') as file:
-                    sql_contents = file.read()
-            comment_cleaned = re.sub(r'--.*?\n', '', sql_contents, flags=re.DOTALL)
-            parsed_commands = sqlparse.split(comment_cleaned)
-            sql_statements[short_name] = parsed_commands
-            sql_cache[db_file] = parsed_commands
-            ensure_ordered_sql.append((short_name, sql_statements[short_name]))
+        else:
+            seen_files[short_name] = db_file
+        if not (db_file.endswith('.xml') or db_file.endswith('.sql')):
+            continue
+        parse_jobs.append((short_name, db_file))
+
+    parse_times = {}
+    parsed = parse_files([db_file for _, db_file in parse_jobs], job_type, workers)
+    for (short_name, db_file), (statements, seconds) in zip(parse_jobs, parsed):
+        parse_times[short_name] = seconds
+        if statements is None:
+            missed_files.append(short_name)
+            sql_cache[db_file] = []
+            if job_type in ['DLC', 'vanilla']:
+                log.debug('ignore as its just firaxis')
+            else:
+                log.debug('ignore as its just modders having empty files')
+            continue
+        sql_statements[short_name] = statements
+        sql_cache[db_file] = statements
 
     # new logic for linting database entries relies on using a source node. As raw files dont have source,
     # we are just gonna use the filepath i guess
@@ -342,5 +375,9 @@ def load_files(jobs, job_type):
     log.info(missed_files)
     log.info('Modinfo Files and Statements')
     log.info({k: len(v) for k, v in sql_statements.items()})
+    slowest = sorted(parse_times.items(), key=lambda item: item[1], reverse=True)[:10]
+    log.info(f'Parse time {sum(parse_times.values()):.2f}s, slowest files:')
+    log.info({k: round(v, 3) for k, v in slowest})
+    log.debug(f'Per file parse times: {parse_times}')
 
     return dictified, sql_cache, missed_files
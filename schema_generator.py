@@ -1,29 +1,48 @@
 import glob
 import os
+import shutil
 import sqlite3
 from collections import defaultdict
 import json
 import colorsys
+import time
+import hashlib
 import logging
+from decimal import Decimal
+from functools import lru_cache
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
-from marshmallow import EXCLUDE
-from marshmallow import pre_load
-from sqlalchemy import create_engine, insert, Boolean, inspect, text, event, Table, Integer
+from sqlalchemy import insert, Boolean, inspect, event, Table, Integer
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.automap import automap_base
 from sqlalchemy.sql.schema import UniqueConstraint
 from sqlalchemy.sql.elements import TextClause, ClauseElement
-from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.dialects import sqlite
 
-from model import query_mod_db, organise_entries, load_files, make_hash
+from model import query_mod_db, organise_entries, load_files, PARSE_WORKERS
 from constants import ages
+from age_db_cache import age_db_cache
+from age_memory import age_memory
+from connection_factory import connect, make_engine
 from graph.singletons.filepaths import LocalFilePaths
 from graph.utils import resource_path
+from startup_profile import profiler
+import statement_ir
+from sql_runner import execute_bisected, run_in_order, run_script
+from fk_check import WriteTracker, foreign_key_errors
+from lint_results import LintResults
 
 log = logging.getLogger(__name__)
 
+VALIDATION_LEVELS = ('quick', 'standard', 'deep')    # constraint errors, + scoped foreign keys, + whole database
+TEMPLATE_VERSION = 1            # bump when the template database is built differently
+SCHEMA_SNAPSHOT_VERSION = 1     # bump when derive_schema_maps changes what it produces
+_snapshot_attrs = ('table_names', 'pk_map', 'fk_to_tbl_map', 'fk_to_pk_map', 'pk_ref_map', 'nullable_map',
+                   'default_map', 'odd_constraint_map', 'required_map', 'less_important_map', 'table_name_class_map',
+                   'incremental_pk', 'class_table_name_map', 'canonicalise_tables', 'canonicalise_columns')
+_python_types = {t.__name__: t for t in (str, int, float, bool, bytes, Decimal)}
+
 
 @event.listens_for(Table, "column_reflect")
 def force_sqlite_autoincrement(inspector, table, column_info):
@@ -31,12 +50,17 @@ def force_sqlite_autoincrement(inspector, table, column_info):
         column_info['autoincrement'] = True
 
 
-class BaseSchema(SQLAlchemyAutoSchema):
-    """Base schema with common configuration."""
+@lru_cache(maxsize=None)
+def base_schema():
+    """Base schema with common configuration. marshmallow is only imported once a field is first validated."""
+    from marshmallow import EXCLUDE
+    from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
-    class Meta:
-        unknown = EXCLUDE
-        load_instance = True
+    class BaseSchema(SQLAlchemyAutoSchema):
+        class Meta:
+            unknown = EXCLUDE
+            load_instance = True
+    return BaseSchema
 
 
 # Cache for schemas to avoid regenerating
@@ -45,10 +69,10 @@ _schema_cache = {}
 
 class SchemaInspector:
     """ Class to handle inspect columns and data types """
-    Base = None
-    session = None
-    empty_engine = None
-    metadata = {}
+    _base = None
+    _session = None
+    _empty_engine = None
+    table_names = []
     pk_map = {}
     fk_to_tbl_map = {}
     fk_to_pk_map = {}
@@ -65,15 +89,50 @@ class SchemaInspector:
     mod_setup = {}
     prebuilt = {}
     include_mods = False
+    parallel_build = True
+    memory_lint = True              # lint graph sql on in memory clones of the age databases
+    validation_level = 'standard'   # default for lints that dont pick one, see VALIDATION_LEVELS
+    initialized = False
 
+    @profiler.profiled('SQLValidator.initialize')
     def initialize(self):
         with open(resource_path('resources/mined/PreBuiltData.json'), 'r') as f:
             self.prebuilt = json.load(f)
 
-        self.Base, self.session, self.empty_engine = self.engine_instantiation(LocalFilePaths.app_data_path_form('created-db.sqlite'))
-
+        file_stats = build_file_stats()
+        if not self.load_schema_snapshot(file_stats):
+            self.derive_schema_maps()
+            self.save_schema_snapshot(file_stats)
+        statement_ir.set_column_types(self.type_map)
+        self.initialized = True
+
+    def _reflect(self):         # reflection is only paid for by code that needs real Table objects
+        if self._base is None:
+            self._base, self._session, self._empty_engine = self.engine_instantiation(
+                LocalFilePaths.app_data_path_form('created-db.sqlite'))
+
+    @property
+    def Base(self):
+        self._reflect()
+        return self._base
+
+    @property
+    def session(self):
+        self._reflect()
+        return self._session
+
+    @property
+    def empty_engine(self):
+        self._reflect()
+        return self._empty_engine
+
+    @property
+    def metadata(self):
+        return self.Base.metadata
+
+    def derive_schema_maps(self):
         tables = self.Base.metadata.tables
-        self.metadata = self.Base.metadata
+        self.table_names = list(tables)
 
         self.pk_map = {name: [c.name for c in table.primary_key.columns] for name, table in tables.items()}
 
@@ -144,6 +203,51 @@ class SchemaInspector:
         self.canonicalise_columns = {name: {col.name.lower(): col.name for col in table.columns}
                                      for name, table in tables.items()}
 
+    @staticmethod
+    def schema_snapshot_key(file_stats):
+        return _content_key(f'schema-snapshot-v{SCHEMA_SNAPSHOT_VERSION}', file_stats)
+
+    def load_schema_snapshot(self, file_stats):
+        """ The snapshot keeps the sizes and mtimes of the files it was derived from, their contents are only hashed
+        again once one of those moves """
+        snapshot_path = LocalFilePaths.app_data_path_form('schema_snapshot.json')
+        if not os.path.exists(snapshot_path):
+            return False
+        try:
+            with open(snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            log.warning(f'schema snapshot unreadable, rebuilding it: {e}')
+            return False
+        stats = [list(file_stat) for file_stat in file_stats]
+        if snapshot.get('file_stats') != stats:
+            if snapshot.get('key') != self.schema_snapshot_key(file_stats):
+                return False
+            snapshot['file_stats'] = stats          # only touched, keep the new stats so the next start skips the hash
+            self._write_schema_snapshot(snapshot)
+        maps = snapshot['maps']
+        for attr in _snapshot_attrs:
+            setattr(self, attr, maps[attr])
+        self.type_map = {tbl: {col: _python_types.get(type_name, str)() for col, type_name in cols.items()}
+                         for tbl, cols in maps['type_map'].items()}
+        self.port_color_map = {direction: defaultdict(dict, {tbl: {col: tuple(color) for col, color in cols.items()}
+                                                             for tbl, cols in tbl_colors.items()})
+                               for direction, tbl_colors in maps['port_color_map'].items()}
+        return True
+
+    def save_schema_snapshot(self, file_stats):
+        maps = {attr: getattr(self, attr) for attr in _snapshot_attrs}
+        maps['type_map'] = {tbl: {col: type(val).__name__ for col, val in cols.items()}
+                            for tbl, cols in self.type_map.items()}
+        maps['port_color_map'] = self.port_color_map
+        self._write_schema_snapshot({'key': self.schema_snapshot_key(file_stats),
+                                     'file_stats': [list(file_stat) for file_stat in file_stats], 'maps': maps})
+
+    @staticmethod
+    def _write_schema_snapshot(snapshot):
+        with open(LocalFilePaths.app_data_path_form('schema_snapshot.json'), 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'), sort_keys=True)
+
     def update_from_spec(self, database_spec):      # db spec update
         extra_fks = {key: {k: v['ref_table'] for k, v in val['extra_fks'].items()} for key, val in
                      database_spec.node_templates.items() if val.get('extra_fks') is not None}
@@ -250,9 +354,10 @@ class SchemaInspector:
         if table_name in _schema_cache:
             return _schema_cache[table_name]
 
+        from marshmallow import EXCLUDE, pre_load
         model_class = self.Base.classes[table_name]
 
-        class TableSchema(BaseSchema):
+        class TableSchema(base_schema()):
             class Meta:
                 model = model_class
                 unknown = EXCLUDE
@@ -285,36 +390,82 @@ class SchemaInspector:
         _schema_cache[table_name] = TableSchema
         return TableSchema
 
-    def state_validation_setup(self, age, database_spec, first_run=False, graph=None):
+    def build_age_databases(self, age_jobs, progress=None):
+        """ builds each age job's database, returns age: build status """
+        built = {}
+        if self.parallel_build and len(age_jobs) > 1:     # each age writes its own database, so build side by side
+            install_paths = (LocalFilePaths.civ_install, LocalFilePaths.civ_config, LocalFilePaths.workshop,
+                             LocalFilePaths.save_appdata_path)
+            with ProcessPoolExecutor(max_workers=len(age_jobs)) as pool:
+                parse_workers = max(1, PARSE_WORKERS // len(age_jobs))         # share the cores between ages
+                futures = [pool.submit(build_age_database, *job, install_paths=install_paths,
+                                       parse_workers=parse_workers, column_types=self.type_map) for job in age_jobs]
+                for future in as_completed(futures):
+                    age_type, status = future.result()
+                    built[age_type] = status
+                    if progress is not None:
+                        progress(age_type, len(built), len(age_jobs))
+        else:
+            for job in age_jobs:
+                age_type, status = build_age_database(*job, prebuilt=self.prebuilt)
+                built[age_type] = status
+                if progress is not None:
+                    progress(age_type, len(built), len(age_jobs))
+        return built
+
+    def state_validation_setup(self, age, database_spec, graph=None, progress=None):
         if age in self.engine_dict:     # setup db state validation
             return False
         else:
             path = LocalFilePaths.app_data_path_form('gameplay-base')
             if database_spec.patch_change:
-                # we do all 3 ages
-                # because of the PAIN of XML parse/large storage objects failing in python threads, we are
-                # caching the results of each databases files. For the "default run" button.
-                base_files_as_sql = {}
+                # we do all 3 ages, but only rebuild the ones whose input files changed since the cached build
+                build_files = gameplay_schema_scripts() + [resource_path('resources/mined/PreBuiltData.json')]
+                age_jobs, age_keys = [], {}
                 for age_type in ages:
-                    engine = self.make_base_db(f"{path}_{age_type}.sqlite", self.prebuilt)
-                    log.info(f'making base database on {age_type}')
+                    age_path = f"{path}_{age_type}.sqlite"
                     database_entries = query_mod_db(age=age_type)
                     modded_short, modded, dlc, dlc_files = organise_entries(database_entries)
-                    sql_statements_dlc, file_statement_dict, missed_dlc = load_files(dlc_files, 'DLC')
-                    base_files_as_sql.update(file_statement_dict)
-                    dlc_status_info = lint_database(engine, sql_statements_dlc, keep_changes=True,
-                                                    database_spec=database_spec)
-                    if self.include_mods:
-                        sql_statements_mods, missed_mods = load_files(modded, 'Mod')
-                        mod_status_info = lint_database(engine, sql_statements_mods, keep_changes=True)
-                    self.engine_dict[age_type] = engine
-                if first_run:
-                    with open(LocalFilePaths.app_data_path_form('cached_base_game_sql.json'), 'w') as f:
-                        json.dump(base_files_as_sql, f, separators=(',', ':'), sort_keys=True)
+                    modded = modded if self.include_mods else []
+                    age_key = age_db_cache.key_for(dlc_files + modded, build_files)
+                    if age_db_cache.restore(age_type, age_key, age_path):
+                        log.info(f'inputs for {age_type} unchanged, using cached database {age_key}')
+                        self.save_age_files(age_type, dlc_files + modded)
+                        self.engine_dict[age_type] = make_engine(age_path, 'scratch')
+                        continue
+                    age_jobs.append((age_type, age_path, dlc_files, modded))
+                    age_keys[age_type] = age_key
+
+                if age_jobs:
+                    ensure_template_db(self.prebuilt)      # before the age workers all need a copy of it
+                built = self.build_age_databases(age_jobs, progress)
+                for age_type, age_path, dlc_files, modded in age_jobs:
+                    log.info(f'built {age_type}: {built[age_type]["statements"]} statements, '
+                             f'{len(built[age_type]["missed"])} files missed, {built[age_type]["seconds"]:.1f}s')
+                    age_db_cache.store(age_type, age_keys[age_type], age_path)
+                    self.save_age_files(age_type, dlc_files + modded)
+                    self.engine_dict[age_type] = make_engine(age_path, 'scratch')
             else:
-                engine = create_engine(f"sqlite:///{path}_{age}.sqlite")     # already built
+                engine = make_engine(f"{path}_{age}.sqlite", 'scratch')     # already built
                 self.engine_dict[age] = engine
 
+    @staticmethod
+    def age_db_path(age):
+        return f"{LocalFilePaths.app_data_path_form('gameplay-base')}_{age}.sqlite"
+
+    def save_age_files(self, age, files):
+        """ records which game files went into an age database, in order """
+        with open(f'{self.age_db_path(age)}.files.json', 'w') as f:
+            json.dump(files, f)
+
+    def age_files(self, age):
+        """ files built into an age database, None when unknown """
+        try:
+            with open(f'{self.age_db_path(age)}.files.json', 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
     def state_validation_mod_setup(self, age, database_spec):               # same but for mods
         database_entries = query_mod_db(age=age)
         modded_short, modded_files, dlc, dlc_files = organise_entries(database_entries)
@@ -322,8 +473,9 @@ class SchemaInspector:
         database_entries = query_mod_db(age=age)
         modded_short, modded, dlc, dlc_files = organise_entries(database_entries)
         engine = self.engine_dict[age]
-        sql_statements_mods, _, missed_mods = load_files(modded, 'Mod', graph)
+        sql_statements_mods, _, missed_mods = load_files(modded, 'Mod')
         mod_status_info = lint_database(engine, sql_statements_mods, keep_changes=True, database_spec=database_spec)
+        self.save_age_files(age, dlc_files + modded)
 
     def filter_columns(self, table_name, data, skip_defaults=False):
         cols = {c.key: c for c in self.metadata.tables[table_name].columns}
@@ -446,29 +598,110 @@ class SchemaInspector:
             self.port_color_map['output'][origin_table][port_output] = color
 
     @staticmethod
-    def make_base_db(db_path, prebuilt):
-        if os.path.exists(db_path):
-            os.remove(db_path)
-        conn = sqlite3.connect(db_path)
-        definition_scripts = [f for f in glob.glob(f"{LocalFilePaths.civ_install}/Base/Assets/schema/gameplay/*.sql")]
-        cur = conn.cursor()
-        conn.create_function("Make_Hash", 1, make_hash)  # setup hash
-        for def_path_script in definition_scripts:
+    def make_base_db(db_path, prebuilt=None, profile='build'):
+        """ fresh gameplay database with the schema and prebuilt rows, cloned from the template """
+        copy_database(ensure_template_db(prebuilt), db_path)
+        return make_engine(db_path, profile)
+
+
+def build_age_database(age_type, age_path, dlc_files, modded, install_paths=None, prebuilt=None, parse_workers=None,
+                       column_types=None):
+    """ Builds one gameplay-base database and returns its status: statements run, files missed and build time. Module
+    level so it can run in a worker process, which is handed the install paths and column types as it starts without
+    them, and only this small status is sent back. """
+    if install_paths is not None:
+        (LocalFilePaths.civ_install, LocalFilePaths.civ_config, LocalFilePaths.workshop,
+         LocalFilePaths.save_appdata_path) = install_paths
+    if column_types is not None:
+        statement_ir.set_column_types(column_types)
+    start = time.perf_counter()
+    engine = SchemaInspector.make_base_db(age_path, prebuilt)       # template copy, prebuilt only read to build it
+    log.info(f'making base database on {age_type}')
+    sql_statements_dlc, _, missed = load_files(dlc_files, 'DLC', parse_workers)
+    lint_database(engine, sql_statements_dlc, keep_changes=True, database_spec=None, trusted=True, level='quick')
+    statements = sum(len(file_statements) for file_statements in sql_statements_dlc.values())
+    if len(modded) > 0:
+        sql_statements_mods, _, missed_mods = load_files(modded, 'Mod', parse_workers)
+        lint_database(engine, sql_statements_mods, keep_changes=True, database_spec=None, level='quick')
+        statements += sum(len(file_statements) for file_statements in sql_statements_mods.values())
+        missed = missed + missed_mods
+    engine.dispose()                        # release the file so it can be snapshotted
+    return age_type, {'statements': statements, 'missed': missed, 'seconds': time.perf_counter() - start}
+
+
+def gameplay_schema_scripts():
+    return sorted(glob.glob(f"{LocalFilePaths.civ_install}/Base/Assets/schema/gameplay/*.sql"))
+
+
+def copy_database(source_path, db_path):
+    """ replaces db_path with a copy of a closed or idle database file """
+    for path in (db_path, f'{db_path}-journal', f'{db_path}-wal', f'{db_path}-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.copyfile(source_path, db_path)
+
+
+def build_file_stats():
+    """ (path, size, mtime) of the schema scripts and prebuilt data every gameplay database is built from """
+    build_files = gameplay_schema_scripts() + [resource_path('resources/mined/PreBuiltData.json')]
+    return tuple((path, os.path.getsize(path), os.path.getmtime(path)) for path in build_files)
+
+
+def template_key():
+    """ hash of the schema scripts and prebuilt data, only rehashed when one of their sizes or mtimes moves """
+    return _content_key(f'template-v{TEMPLATE_VERSION}', build_file_stats())
+
+
+@lru_cache(maxsize=8)
+def _content_key(prefix, file_stats):
+    digest = hashlib.sha1(prefix.encode())
+    for file_path, _, _ in file_stats:
+        digest.update(os.path.basename(file_path).encode())
+        with open(file_path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def ensure_template_db(prebuilt=None):
+    """ Empty schema database every fresh database is copied from. Built again only when the schema scripts or
+    prebuilt data change, the key of what it was built from sits next to it in schema_template.json. Written to a
+    temporary file first, so age workers racing to build it only ever copy a finished template. """
+    template_path = LocalFilePaths.app_data_path_form('schema_template.sqlite')
+    key_path = LocalFilePaths.app_data_path_form('schema_template.json')
+    key = template_key()
+    if os.path.exists(template_path) and os.path.exists(key_path):
+        try:
+            with open(key_path, 'r') as f:
+                if json.load(f).get('key') == key:
+                    return template_path
+        except (json.JSONDecodeError, OSError):
+            pass
+    log.info('schema or prebuilt data changed, building the template database')
+    if prebuilt is None:
+        with open(resource_path('resources/mined/PreBuiltData.json'), 'r') as f:
+            prebuilt = json.load(f)
+    build_path = f'{template_path}.{os.getpid()}.tmp'
+    if os.path.exists(build_path):
+        os.remove(build_path)
+    conn = connect(build_path, 'build')
+    try:
+        for def_path_script in gameplay_schema_scripts():
             with open(def_path_script, 'r') as f:
-                query_tables = f.read()
-            cur.executescript(query_tables)
-        # setup prebuilt entries
-        engine = create_engine(f"sqlite:///{db_path}")
-        with engine.begin() as conn_engine:
-            conn_engine.connection.create_function("Make_Hash", 1, make_hash)  # setup hash
+                conn.executescript(f.read())
+        with conn:                                      # setup prebuilt entries
             for table_name, table_entries in prebuilt.items():
                 columns = ", ".join(table_entries[0].keys())
                 params = ", ".join(f":{k}" for k in table_entries[0].keys())
-                sql = text(f"""INSERT INTO {table_name}({columns}) VALUES ({params})""")
-                conn_engine.execute(sql, table_entries)
-
+                conn.executemany(f"INSERT INTO {table_name}({columns}) VALUES ({params})", table_entries)
+    finally:
         conn.close()
-        return engine
+    try:
+        os.replace(build_path, template_path)
+    except PermissionError:                 # windows, another process is copying the template it just built
+        os.remove(build_path)
+    with open(key_path, 'w') as f:
+        json.dump({'key': key}, f)
+    return template_path
 
 
 def extract_server_default(col, engine_default):
@@ -494,61 +727,112 @@ def extract_server_default(col, engine_default):
     return arg
 
 
-def lint_database(engine, sql_command_dict, database_spec, keep_changes=False, dict_form_list=None, incomplete_dict=()):
-    Session = sessionmaker(bind=engine)
-
-    with engine.connect() as conn:
-        conn.connection.create_function("Make_Hash", 1, make_hash)
-        trans = conn.begin()
-        session = Session(bind=conn)
-        try:
-            results = defaultdict(list)
-            for file_name, sql_dict_list in sql_command_dict.items():
-                for sql_info in sql_dict_list:
-                    try:
-                        result_info = sql_info.copy()
-                        result_info['passed'] = True
-                        session.execute(text(sql_info['sql']))
-                        results[file_name].append(result_info)
-                    except SQLAlchemyError as e:
-                        result_info['passed'] = False
-                        result_info['error'] = str(e)
-                        result_info['error_type'] = e
-                        results[file_name].append(result_info)
-
-            session.execute(text("PRAGMA foreign_keys = ON"))
-            fk_errors = session.execute(text("PRAGMA foreign_key_check")).all()
-            integrity = session.execute(text("PRAGMA integrity_check")).scalar()
-
-            lint_info = {"results": results, "foreign_key_errors": fk_errors, "integrity": integrity,
-                         "incomplete_dict": incomplete_dict}
-            return lint_info
-
-        finally:
-            session.close()
-            bad_inserts = {k: {idx: i for idx, i in enumerate(v) if not i['passed']} for k, v in results.items()}
-            if any(len(i) > 0 for i in bad_inserts.values()):
-                log.info('Insertion Errors:')
-                log.info(bad_inserts)
-                if not keep_changes:            # init database does keep changes. Cant explain errors before db_spec
-                    insert_errors, mark_errors = explain_statement_errors(bad_inserts, dict_form_list, database_spec)
-                    lint_info['insert_error_explanations'] = insert_errors
-                    lint_info['marked_nodes'] = mark_errors
-
-            if len(lint_info['foreign_key_errors']) > 0 or lint_info['integrity'] != 'ok':
-                log.info('Explaining Foreign Key Errors:')
-                log.info(lint_info['foreign_key_errors'])
-                if not keep_changes:
-                    explained_error_dict = explain_fk_errors(lint_info, session, database_spec)
-                    lint_info['fk_error_explanations'] = {'title_errors': explained_error_dict}
-
-            if keep_changes:
-                trans.commit()
-            else:
-                trans.rollback()
-
-
-def explain_fk_errors(lint_info, session, database_spec):
+def lint_database(engine, sql_command_dict, database_spec, keep_changes=False, dict_form_list=None, incomplete_dict=(),
+                  trusted=False, level='standard', on_statements=None):
+    """ Runs every statement against the database through execute_bisected, so only chunks holding a failure pay
+    for finding it. trusted content that is kept (firaxis files) runs as executescript chunks, which commit as
+    they go. Everything else runs inside one transaction, rolled back unless keep_changes. level is one of
+    VALIDATION_LEVELS: quick only reports statements that failed, standard checks foreign keys on the tables and
+    rows the statements wrote, deep checks foreign keys and integrity over the whole database. Seconds spent
+    per phase are returned under 'timings'. on_statements is handed the LintResults as soon as every statement
+    has run, ahead of the slower checks. """
+    if level not in VALIDATION_LEVELS:
+        raise ValueError(f'unknown validation level {level}, expected one of {VALIDATION_LEVELS}')
+    flat = [(file_name, idx, sql_info) for file_name, sql_dict_list in sql_command_dict.items()
+            for idx, sql_info in enumerate(sql_dict_list)]
+    scripted = trusted and keep_changes
+    raw = engine.raw_connection()
+    db = raw.driver_connection
+    old_isolation = db.isolation_level
+    db.isolation_level = None                   # transactions and savepoints are handled here
+    timings = {}
+    try:
+        if not scripted:
+            db.execute('BEGIN')
+        start = time.perf_counter()
+        tracker = WriteTracker(db) if level == 'standard' else None
+        with tracker or nullcontext():
+            errors = execute_bisected(db, [sql_info['sql'] for _, _, sql_info in flat],
+                                      run_script if scripted else run_in_order)
+        results = LintResults()
+        for (file_name, idx, sql_info), error in zip(flat, errors):
+            results.add(file_name, idx, sql_info, error)
+        timings['statements'] = time.perf_counter() - start
+        if on_statements is not None:
+            on_statements(results)
+
+        fk_errors, integrity, start = [], None, time.perf_counter()             # integrity only checked deep
+        if level == 'standard':
+            fk_errors = foreign_key_errors(db, tracker)
+            timings['foreign keys'] = time.perf_counter() - start
+        elif level == 'deep':
+            fk_errors = db.execute("PRAGMA foreign_key_check").fetchall()
+            timings['foreign keys'] = time.perf_counter() - start
+            start = time.perf_counter()
+            integrity = db.execute("PRAGMA integrity_check").fetchone()[0]
+            timings['integrity'] = time.perf_counter() - start
+        lint_info = {"results": results, "foreign_key_errors": fk_errors, "integrity": integrity,
+                     "incomplete_dict": incomplete_dict, "level": level, "timings": timings}
+
+        start = time.perf_counter()             # init database does keep changes. Cant explain errors before db_spec
+        explain_lint_errors(lint_info, db, dict_form_list, database_spec, explain=not keep_changes)
+        timings['explain'] = time.perf_counter() - start
+        log.info(f'{level} lint of {len(flat)} statements: ' + format_timings(timings))
+        return lint_info
+
+    finally:
+        if db.in_transaction:
+            db.execute('COMMIT' if keep_changes else 'ROLLBACK')
+        db.isolation_level = old_isolation
+        raw.close()
+
+
+def explain_lint_errors(lint_info, db, dict_form_list, database_spec, explain=True):
+    """ logs the failed statements and foreign key errors of a lint, and unless told not to adds the explanations
+    and marked nodes the graph shows to lint_info """
+    results = lint_info['results']
+    if results.errors:
+        log.info('Insertion Errors:')
+        log.info({(failure.file, failure.index): failure.error['message'] for failure in results.failures()})
+        if explain:
+            insert_errors, mark_errors = explain_statement_errors(results, dict_form_list, database_spec)
+            lint_info['insert_error_explanations'] = insert_errors
+            lint_info['marked_nodes'] = mark_errors
+
+    if len(lint_info['foreign_key_errors']) > 0 or lint_info['integrity'] not in ('ok', None):
+        log.info('Explaining Foreign Key Errors:')
+        log.info(lint_info['foreign_key_errors'])
+        if explain:
+            explained_error_dict = explain_fk_errors(lint_info, db, database_spec)
+            lint_info['fk_error_explanations'] = {'title_errors': explained_error_dict}
+
+
+def format_timings(timings):
+    return ', '.join(f'{phase} {seconds:.3f}s' for phase, seconds in timings.items())
+
+
+def merge_lint_info(reports):
+    """ one lint_info out of several run one after another, as for the mods of a config test """
+    merged = {'results': LintResults(), 'foreign_key_errors': [], 'integrity': None, 'incomplete_dict': {},
+              'level': reports[-1]['level'], 'timings': {}}
+    for report in reports:
+        merged['results'].extend(report['results'])
+        merged['foreign_key_errors'].extend(report['foreign_key_errors'])
+        if report['integrity'] not in ('ok', None) or merged['integrity'] is None:
+            merged['integrity'] = report['integrity']
+        for phase, seconds in report['timings'].items():
+            merged['timings'][phase] = merged['timings'].get(phase, 0) + seconds
+        for table_name, errors in report.get('insert_error_explanations', {}).items():
+            merged.setdefault('insert_error_explanations', {}).setdefault(table_name, {}).update(errors)
+        if 'marked_nodes' in report:
+            merged.setdefault('marked_nodes', []).extend(report['marked_nodes'])
+        if 'fk_error_explanations' in report:
+            merged.setdefault('fk_error_explanations', {'title_errors': {}})['title_errors'].update(
+                report['fk_error_explanations']['title_errors'])
+    return merged
+
+
+def explain_fk_errors(lint_info, db, database_spec):
     error_info_list = lint_info['foreign_key_errors']
     error_table_indices = defaultdict(list)
     for i in error_info_list:
@@ -566,7 +850,9 @@ def explain_fk_errors(lint_info, session, database_spec):
         foreign_table_pk_list = database_spec.node_templates[primary_key_table]['primary_keys']
         foreign_table_pk = foreign_table_pk_list[0]
         indices_string = ", ".join([str(i) for i in indices_list])
-        rows = session.execute(text(f"SELECT * FROM {insertion_table} WHERE rowid IN ({indices_string});")).mappings().fetchall()
+        cursor = db.cursor()
+        cursor.row_factory = sqlite3.Row
+        rows = cursor.execute(f"SELECT * FROM {insertion_table} WHERE rowid IN ({indices_string});").fetchall()
         if len(rows) > 1:
             log.warning(f"Multiple rows obtained from explaining foreign key error. Shouldnt be possible."
                         f"Rows:\n {rows}")
@@ -600,42 +886,42 @@ def explain_fk_errors(lint_info, session, database_spec):
     return explained_error_dict
 
 
-def explain_statement_errors(bad_inserts, dict_form_list, database_spec):
+def explain_statement_errors(results, dict_form_list, database_spec):
     insert_errors = defaultdict(dict)
     mark_errors = []
-    for file_name, errors in bad_inserts.items():
-        for idx, error_info in errors.items():
-            mark_errors.append(error_info['node_source'])
-            if dict_form_list is not None:
-                dict_info = dict_form_list[idx]['sql']
-                table_name = dict_info['table_name']
-                primary_key_cols = database_spec.node_templates[table_name].get("primary_keys")
-                pk_dict = {k: v for k, v in dict_info['columns'].items() if k in primary_key_cols}
-                pk_string = ", ".join([f'{k}: {v}' for k, v in pk_dict.items()])
-                pk_tuple = tuple([v for k, v in pk_dict.items()])
-            else:  # planned last resort sqlglot
-                log.error('insert error, but we havent handled parsing yet, skipping error')
-                continue
-            error_string = f'Entry {table_name} with primary key: {pk_string}'
-            if isinstance(error_info['error_type'].orig, sqlite3.IntegrityError):
-                simple_error = str(error_info['error_type'].orig)
-                if 'UNIQUE constraint failed' in simple_error:
-                    error_string += (f' could not be inserted as that primary key {pk_string} was already'
-                                     f' present.')
-                elif 'NOT NULL constraint failed' in simple_error:
-                    col = simple_error.replace('NOT NULL constraint failed: ', '')
-                    col = col.replace(f'{table_name}.', '')
-                    error_string += f' could not be inserted as {col} was not specified.'
-                elif 'CHECK constraint' in simple_error:
-                    error_string += f' could not be inserted as column {"uh"}: {"uh"} is outside constraints.'
-                else:
-                    error_string += 'weird error not covered.'
+    for failure in results.failures():
+        error_info = failure.error
+        mark_errors.append(failure.node)
+        if dict_form_list is not None:
+            dict_info = dict_form_list[failure.index]['sql']
+            table_name = dict_info['table_name']
+            primary_key_cols = database_spec.node_templates[table_name].get("primary_keys")
+            pk_dict = {k: v for k, v in dict_info['columns'].items() if k in primary_key_cols}
+            pk_string = ", ".join([f'{k}: {v}' for k, v in pk_dict.items()])
+            pk_tuple = tuple([v for k, v in pk_dict.items()])
+        else:  # planned last resort sqlglot
+            log.error('insert error, but we havent handled parsing yet, skipping error')
+            continue
+        error_string = f'Entry {table_name} with primary key: {pk_string}'
+        if error_info['kind'] == 'IntegrityError':
+            simple_error = error_info['message']
+            if 'UNIQUE constraint failed' in simple_error:
+                error_string += (f' could not be inserted as that primary key {pk_string} was already'
+                                 f' present.')
+            elif 'NOT NULL constraint failed' in simple_error:
+                col = simple_error.replace('NOT NULL constraint failed: ', '')
+                col = col.replace(f'{table_name}.', '')
+                error_string += f' could not be inserted as {col} was not specified.'
+            elif 'CHECK constraint' in simple_error:
+                error_string += f' could not be inserted as column {"uh"}: {"uh"} is outside constraints.'
             else:
-                error_string += f'Some cursed error that is likely not your fault: {str(error_info["error_type"].orig)}'
-                log.error(f"non-user error on running sql statement: {error_info['sql']}\n"
-                          f"{str(error_info['error_type'].orig)}")
+                error_string += 'weird error not covered.'
+        else:
+            error_string += f'Some cursed error that is likely not your fault: {error_info["message"]}'
+            log.error(f"non-user error on running sql statement: {error_info['sql']}\n"
+                      f"{error_info['message']}")
 
-            insert_errors[table_name][pk_tuple] = error_string
+        insert_errors[table_name][pk_tuple] = error_string
     return dict(insert_errors), mark_errors
 
 
@@ -661,11 +947,20 @@ def constraint_color(index, total,                  # living here as used for in
     return int(r * 255), int(g * 255), int(b * 255)
 
 
-def check_valid_sql_against_db(age, sql_dict_list, database_spec, dict_form_list=None, incompletes=()):
+def check_valid_sql_against_db(age, sql_dict_list, database_spec, dict_form_list=None, incompletes=(), level=None,
+                               on_statements=None):
     SQLValidator.state_validation_setup(age, database_spec)
-    result_info = lint_database(SQLValidator.engine_dict[age], {'main.sql': sql_dict_list},
-                                keep_changes=False, dict_form_list=dict_form_list, incomplete_dict=incompletes,
-                                database_spec=database_spec)
+    engine = SQLValidator.engine_dict[age]
+    if SQLValidator.memory_lint:            # own in memory copy of the age, nothing to roll back or wait on
+        engine = age_memory.engine(engine.url.database)
+    try:
+        result_info = lint_database(engine, {'main.sql': sql_dict_list},
+                                    keep_changes=False, dict_form_list=dict_form_list, incomplete_dict=incompletes,
+                                    database_spec=database_spec, level=level or SQLValidator.validation_level,
+                                    on_statements=on_statements)
+    finally:
+        if engine is not SQLValidator.engine_dict[age]:
+            engine.dispose()
     return result_info
 
 
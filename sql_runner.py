@@ -0,0 +1,107 @@
+import sqlite3
+import logging
+
+import statement_ir
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000           # statements per savepoint chunk before any failure splits it
+
+
+def grouped(sqls):
+    """ consecutive statements of the same shape as (sql, [params, ...]), sql text as (sql, None) """
+    group_sql, group_params = None, None
+    for stmt in sqls:
+        if not statement_ir.is_statement(stmt):
+            if group_sql is not None:
+                yield group_sql, group_params
+                group_sql = None
+            yield stmt, None
+            continue
+        sql = statement_ir.template(stmt)
+        if sql != group_sql:
+            if group_sql is not None:
+                yield group_sql, group_params
+            group_sql, group_params = sql, []
+        if 'rows' in stmt:
+            group_params.extend(stmt['rows'])
+        else:
+            group_params.append(stmt['params'])
+    if group_sql is not None:
+        yield group_sql, group_params
+
+
+def run_in_order(db, sqls):
+    """ runs a chunk inside a savepoint, all or nothing. Statement dicts of the same shape are bound together
+    through executemany. Safe inside an open transaction, so used when changes might be rolled back afterwards """
+    db.execute('SAVEPOINT lint_chunk')
+    try:
+        for sql, params in grouped(sqls):
+            if params is None:
+                db.execute(sql)
+            else:
+                db.executemany(sql, params)
+    except sqlite3.Error:
+        db.execute('ROLLBACK TO lint_chunk')
+        db.execute('RELEASE lint_chunk')
+        raise
+    db.execute('RELEASE lint_chunk')
+
+
+def run_script(db, sqls):
+    """ runs a chunk of sql text as one executescript call inside a savepoint, all or nothing. executescript
+    commits whatever transaction is open first, so only for changes that are kept. Chunks holding statement dicts
+    need binding, so they go through run_in_order instead """
+    if any(statement_ir.is_statement(stmt) for stmt in sqls):
+        return run_in_order(db, sqls)
+    script = '\n;\n'.join(sqls)             # own line, in case a statement ends in a -- comment
+    try:
+        db.executescript(f'SAVEPOINT lint_chunk;\n{script}\n;\nRELEASE lint_chunk;')
+    except sqlite3.Error:
+        if db.in_transaction:
+            db.execute('ROLLBACK TO lint_chunk')
+            db.execute('RELEASE lint_chunk')
+        raise
+
+
+def execute_bisected(db, sqls, run_chunk=run_in_order, batch_size=BATCH_SIZE):
+    """ Runs statements in savepoint chunks. A chunk that errors is rolled back and split in half until the failing
+    statements are found on their own, so failures cost a log(n) number of extra chunk runs rather than every
+    statement paying for individual execution. A failing multi row insert is split the same way down to its bad
+    rows. The database ends up as if each statement and row had run alone in order. Returns per statement None
+    when it passed, its sqlite3 error, or for a multi row insert a dict of row index to error. """
+    errors = [None] * len(sqls)
+
+    def bisect(run, lo, hi, on_error, known_bad=False):
+        """ True when anything in lo:hi failed """
+        if not known_bad or hi - lo == 1:
+            try:
+                run(lo, hi)
+                return False
+            except sqlite3.Error as e:
+                if hi - lo == 1:
+                    on_error(lo, e)
+                    return True
+        mid = (lo + hi) // 2
+        left_failed = bisect(run, lo, mid, on_error)
+        bisect(run, mid, hi, on_error, known_bad=not left_failed)      # a clean left half means its on the right
+        return True
+
+    def run_statements(lo, hi):
+        run_chunk(db, sqls[lo:hi])
+
+    def statement_failed(idx, error):
+        stmt = sqls[idx]
+        if not statement_ir.is_statement(stmt) or len(stmt.get('rows', ())) < 2:
+            errors[idx] = error
+            return
+        row_errors = errors[idx] = {}
+        bisect(lambda lo, hi: run_chunk(db, [statement_ir.row_slice(stmt, lo, hi)]), 0, len(stmt['rows']),
+               row_errors.__setitem__, known_bad=True)
+
+    for start in range(0, len(sqls), batch_size):
+        bisect(run_statements, start, min(start + batch_size, len(sqls)), statement_failed)
+    failed = sum(1 for e in errors if e is not None)
+    if failed > 0:
+        log.info(f'{failed} of {len(sqls)} statements failed')
+    return errors
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from graph.singletons.filepaths import LocalFilePaths
+from startup_profile import profiler
+
+log = logging.getLogger(__name__)
+
+
+class StartupScheduler:
+    """ Runs start up stages as soon as the stages they depend on have finished, so independent work overlaps.
+    Progress comes from the weight of completed stages (plus any partial progress a stage reports), and the time
+    each stage took is written to logs/startup_timings.json on every launch. """
+
+    def __init__(self, progress=None, max_workers=4):
+        self.stages = {}
+        self.results = {}
+        self.timings = {}
+        self.progress = progress
+        self.max_workers = max_workers
+        self._partial = {}
+        self._lock = threading.Lock()
+        self._start = None
+
+    def add(self, name, func, deps=(), weight=1):
+        """ func takes the scheduler, so it can read results of its deps and report partial progress """
+        if name in self.stages:
+            raise ValueError(f'startup stage {name} added twice')
+        missing = [d for d in deps if d not in self.stages]
+        if missing:
+            raise ValueError(f'startup stage {name} depends on unknown stages {missing}')
+        self.stages[name] = {'func': func, 'deps': tuple(deps), 'weight': weight}
+
+    def report(self, name, fraction):
+        """ partial progress from inside a long stage, fraction in 0-1 """
+        with self._lock:
+            self._partial[name] = max(0.0, min(fraction, 1.0))
+        self._emit(name)
+
+    def _emit(self, name):
+        if self.progress is None:
+            return
+        total = sum(stage['weight'] for stage in self.stages.values())
+        with self._lock:
+            done = sum(self.stages[n]['weight'] * fraction for n, fraction in self._partial.items())
+        self.progress(name, int(100 * done / total) if total else 100)
+
+    def _run_stage(self, name):
+        started = time.perf_counter()
+        try:
+            with profiler.phase(f'stage:{name}'):
+                self.results[name] = self.stages[name]['func'](self)
+        finally:
+            ended = time.perf_counter()
+            self.timings[name] = {'start': round(started - self._start, 4), 'seconds': round(ended - started, 4),
+                                  'thread': threading.current_thread().name}
+        return name
+
+    def run(self):
+        self._start = time.perf_counter()
+        pending, running, finished = dict(self.stages), {}, set()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='startup') as pool:
+                while pending or running:
+                    ready = [n for n, stage in pending.items() if all(d in finished for d in stage['deps'])]
+                    for name in ready:
+                        del pending[name]
+                        running[pool.submit(self._run_stage, name)] = name
+                    if not running:
+                        raise RuntimeError(f'startup stages can never run, dependency cycle: {sorted(pending)}')
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        future.result()             # surface the stage's exception, remaining stages are dropped
+                        finished.add(name)
+                        with self._lock:
+                            self._partial[name] = 1.0
+                        self._emit(name)
+        finally:
+            self.write_report()
+        return self.results
+
+    def write_report(self):
+        total = round(time.perf_counter() - self._start, 4)
+        report = {'total_seconds': total,
+                  'stages': {name: dict(self.timings.get(name, {'skipped': True}), deps=list(stage['deps']))
+                             for name, stage in self.stages.items()}}
+        log.info(f'start up took {total}s: ' +
+                 ', '.join(f"{n} {t['seconds']}s" for n, t in sorted(self.timings.items(), key=lambda x: x[1]['start'])))
+        try:
+            with open(os.path.join(LocalFilePaths.app_data_path_form('logs'), 'startup_timings.json'), 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        except OSError as e:
+            log.warning(f'could not write start up timings: {e}')
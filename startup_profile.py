@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+_process_start = time.perf_counter()
+
+
+class StartupProfiler:
+    """ Records wall clock and cpu time of the start up phases when run with --profile-startup. Writes
+    logs/startup_profile.json, a chrome trace (startup_profile.trace.json, opens in perfetto or speedscope) and
+    collapsed stacks (startup_profile.folded, for flamegraph.pl) once the first window has painted.
+    Does nothing when not enabled. """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.written = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._paint_filter = None
+
+    def enable(self):
+        self.enabled = True
+
+    def enable_from_argv(self, argv):
+        if '--profile-startup' in argv:
+            argv.remove('--profile-startup')            # keep it away from Qt's own argument parsing
+            self.enable()
+        elif os.environ.get('CIV_PROFILE_STARTUP'):
+            self.enable()
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(name)
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            event = {'name': name, 'stack': ';'.join(stack), 'start': wall_start - _process_start,
+                     'wall': time.perf_counter() - wall_start, 'cpu': time.thread_time() - cpu_start,
+                     'thread': threading.current_thread().name, 'tid': threading.get_ident()}
+            stack.pop()
+            with self._lock:
+                self.events.append(event)
+
+    def profiled(self, name):
+        """ decorator form of phase """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def watch_first_paint(self, window):
+        """ times from now until the first paint of anything in window, then writes the report """
+        if not self.enabled or self._paint_filter is not None:
+            return
+        from PyQt5 import QtCore, QtWidgets
+        profiler = self
+        started = {'wall': time.perf_counter(), 'cpu': time.thread_time()}
+
+        class FirstPaintFilter(QtCore.QObject):
+            def eventFilter(self, obj, event):
+                if (event.type() == QtCore.QEvent.Paint and isinstance(obj, QtWidgets.QWidget)
+                        and obj.window() is window):
+                    QtWidgets.QApplication.instance().removeEventFilter(self)
+                    profiler.add_event('first_paint', started['wall'], started['cpu'])
+                    profiler.write()
+                return False
+
+        self._paint_filter = FirstPaintFilter()
+        QtWidgets.QApplication.instance().installEventFilter(self._paint_filter)
+
+    def add_event(self, name, wall_start, cpu_start):
+        with self._lock:
+            self.events.append({'name': name, 'stack': name, 'start': wall_start - _process_start,
+                                'wall': time.perf_counter() - wall_start, 'cpu': time.thread_time() - cpu_start,
+                                'thread': threading.current_thread().name, 'tid': threading.get_ident()})
+
+    def write(self):
+        if not self.enabled or self.written:
+            return
+        from graph.singletons.filepaths import LocalFilePaths
+        self.written = True
+        logs_folder = LocalFilePaths.app_data_path_form('logs')
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e['start'])
+        totals = {}
+        for event in events:
+            total = totals.setdefault(event['name'], {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+            total['wall'] += event['wall']
+            total['cpu'] += event['cpu']
+            total['calls'] += 1
+        report = {'argv': sys.argv, 'time_to_first_paint': max((e['start'] + e['wall'] for e in events), default=0),
+                  'totals': totals, 'phases': events}
+        with open(os.path.join(logs_folder, 'startup_profile.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+
+        trace = [{'name': e['name'], 'ph': 'X', 'pid': os.getpid(), 'tid': e['tid'], 'ts': round(e['start'] * 1e6),
+                  'dur': round(e['wall'] * 1e6), 'args': {'cpu_ms': round(e['cpu'] * 1000, 3), 'thread': e['thread']}}
+                 for e in events]
+        with open(os.path.join(logs_folder, 'startup_profile.trace.json'), 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+        with open(os.path.join(logs_folder, 'startup_profile.folded'), 'w') as f:
+            for event in events:                # folded stacks want self time, so take off direct children
+                prefix = event['stack'] + ';'
+                depth = event['stack'].count(';') + 1
+                child_wall = sum(c['wall'] for c in events if c['tid'] == event['tid']
+                                 and c['stack'].startswith(prefix) and c['stack'].count(';') == depth)
+                self_ms = max(0, round((event['wall'] - child_wall) * 1000))
+                f.write(f"{event['thread']};{event['stack']} {self_ms}\n")
+        log.info(f"start up profile written to {logs_folder}, first paint after {report['time_to_first_paint']:.2f}s")
+
+
+profiler = StartupProfiler()
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from threading import Lock
+
+from graph.singletons.filepaths import LocalFilePaths
+
+log = logging.getLogger(__name__)
+
+MAX_ENTRIES = 20000
+MAX_BYTES = 256 * 1024 * 1024
+EVICT_TO = 0.9              # eviction frees down to this share of the limits, so it runs rarely
+TOUCH_BATCH = 500           # cache hits whose last_used is written in one go
+SCHEMA_VERSION = 2
+MISS = object()
+
+
+class StatementCache:
+    """ On disk cache of the sql statements parsed out of game and mod files, keyed on the absolute path, size,
+    mtime and converter version, so untouched files are never parsed again. Lives in a small sqlite file so the
+    age build workers and the config test thread can share it. Each process keeps one connection open. The total
+    size is kept as a running count, so eviction only runs once a put takes the cache past a limit, and last used
+    times of hits are written in batches rather than on every hit. """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._conn, self._conn_key = None, None
+        self._touched = {}                  # path: last used time, not yet written
+
+    def _connection(self):
+        key = os.getpid(), LocalFilePaths.app_data_path_form('statement_cache.sqlite')
+        if key != self._conn_key:
+            if self._conn is not None and self._conn_key[0] == key[0]:
+                self._conn.close()          # a forked child leaves its parents connection alone
+            self._conn, self._conn_key, self._touched = self._open(key[1]), key, {}
+        return self._conn
+
+    @staticmethod
+    def _open(db_path):
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")              # a lost entry just means a reparse
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:     # another process won
+                conn.execute("DROP TABLE IF EXISTS parsed_files")
+                conn.execute("DROP TABLE IF EXISTS cache_size")
+                conn.execute("CREATE TABLE parsed_files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, "
+                             "version INTEGER, bytes INTEGER, last_used REAL, statements TEXT)")
+                conn.execute("CREATE INDEX parsed_files_last_used ON parsed_files (last_used)")
+                conn.execute("CREATE TABLE cache_size (entries INTEGER, bytes INTEGER)")
+                conn.execute("INSERT INTO cache_size VALUES (0, 0)")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        return conn
+
+    @staticmethod
+    def _file_key(file_path):
+        full_path = os.path.abspath(file_path)
+        stat_result = os.stat(full_path)
+        return full_path, stat_result.st_size, stat_result.st_mtime
+
+    def get(self, file_path, version):
+        try:
+            full_path, size, mtime = self._file_key(file_path)
+        except OSError:
+            return MISS
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT size, mtime, version, statements FROM parsed_files WHERE path = ?",
+                               (full_path,)).fetchone()
+            if row is None or tuple(row[:3]) != (size, mtime, version):
+                return MISS
+            self._touched[full_path] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._write(conn, self._write_touched)
+        return json.loads(row[3])
+
+    def put(self, file_path, version, statements):
+        try:
+            full_path, size, mtime = self._file_key(file_path)
+        except OSError:
+            return
+        text = json.dumps(statements, separators=(',', ':'))
+        with self._lock:
+            self._write(self._connection(), self._insert, (full_path, size, mtime, version, len(text), time.time(),
+                                                          text))
+
+    def flush(self):
+        """ writes out the last used times of hits still held back """
+        with self._lock:
+            if self._touched:
+                self._write(self._connection(), self._write_touched)
+
+    @staticmethod
+    def _write(conn, write, *args):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            write(conn, *args)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _insert(self, conn, row):
+        old = conn.execute("SELECT bytes FROM parsed_files WHERE path = ?", (row[0],)).fetchone()
+        conn.execute("INSERT OR REPLACE INTO parsed_files VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+        conn.execute("UPDATE cache_size SET entries = entries + ?, bytes = bytes + ?",
+                     (0 if old else 1, row[4] - (old[0] if old else 0)))
+        entries, total = conn.execute("SELECT entries, bytes FROM cache_size").fetchone()
+        if entries > MAX_ENTRIES or total > MAX_BYTES:
+            self._evict(conn, entries, total)
+
+    def _write_touched(self, conn):
+        conn.executemany("UPDATE parsed_files SET last_used = ? WHERE path = ?",
+                         [(used, path) for path, used in self._touched.items()])
+        self._touched = {}
+
+    def _evict(self, conn, entries, total):
+        """ drops least recently used entries until both limits are back under EVICT_TO of themselves """
+        self._write_touched(conn)
+        extra_entries, extra_bytes = entries - int(MAX_ENTRIES * EVICT_TO), total - int(MAX_BYTES * EVICT_TO)
+        evicted, freed = [], 0
+        for path, size in conn.execute("SELECT path, bytes FROM parsed_files ORDER BY last_used"):
+            if len(evicted) >= extra_entries and freed >= extra_bytes:
+                break
+            evicted.append((path,))
+            freed += size
+        conn.executemany("DELETE FROM parsed_files WHERE path = ?", evicted)
+        conn.execute("UPDATE cache_size SET entries = entries - ?, bytes = bytes - ?", (len(evicted), freed))
+        log.info(f'statement cache evicted {len(evicted)} files, {freed // 1024} KB')
+
+    def clear(self):
+        with self._lock:
+            self._touched = {}
+            self._write(self._connection(), self._delete_all)
+
+    @staticmethod
+    def _delete_all(conn):
+        conn.execute("DELETE FROM parsed_files")
+        conn.execute("UPDATE cache_size SET entries = 0, bytes = 0")
+
+
+statement_cache = StatementCache()
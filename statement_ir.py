@@ -0,0 +1,136 @@
+from functools import lru_cache
+
+# Statements parsed out of xml are kept as plain dicts so they json into the statement cache as they are:
+#   {'op': 'INSERT' | 'INSERT OR REPLACE' | 'INSERT OR IGNORE', 'table': t, 'columns': [...], 'params': [...]}
+#   {'op': 'UPDATE', 'table': t, 'columns': [set cols], 'where': [where cols], 'params': [set vals + where vals]}
+#   {'op': 'DELETE', 'table': t, 'where': [where cols], 'params': [where vals]}
+# They are bound as parameters when run, sql text is only rendered for display and export.
+# coalesce folds runs of inserts sharing op, table and columns into one statement that carries 'rows' (a params
+# list per row) and 'sources' instead of 'params' and 'source'. A source is [element path, line] in the xml file.
+# Values are kept as the xml text, so cached statements dont depend on the schema. bind_types turns true/false into
+# the 0/1 firaxis stores, for the columns the schema declares BOOLEAN or INTEGER, once they are loaded.
+
+INSERT_OPS = ('INSERT', 'INSERT OR REPLACE', 'INSERT OR IGNORE')
+MAX_ROWS = 500             # rows per coalesced insert, keeps the bisection to find a bad row short
+_bools = {'true': 1, 'True': 1, 'TRUE': 1, 'false': 0, 'False': 0, 'FALSE': 0}
+_numeric_columns = {}      # lowercased table: lowercased columns declared BOOLEAN or INTEGER, see set_column_types
+
+
+def set_column_types(type_map):
+    """ type_map is SQLValidator's, table: {column: instance of the column's python type} """
+    global _numeric_columns
+    _numeric_columns = {table.lower(): frozenset(col.lower() for col, example in columns.items()
+                                                 if isinstance(example, int))
+                        for table, columns in type_map.items()}
+
+
+def bind_value(value):
+    """ xml gives everything as text, booleans become the 0/1 firaxis stores """
+    if isinstance(value, str):
+        return _bools.get(value, value)
+    return value
+
+
+def bind_types(statements):
+    """ binds true/false in the BOOLEAN and INTEGER columns of parsed statements, in place. Text columns and
+    tables the schema doesnt know keep the value as written. Returns the statements """
+    for stmt in statements or ():
+        if not is_statement(stmt):
+            continue
+        numeric = _numeric_columns.get(stmt['table'].lower())
+        if not numeric:
+            continue
+        positions = [idx for idx, col in enumerate(stmt.get('columns', []) + stmt.get('where', []))
+                     if col.lower() in numeric]
+        for params in stmt['rows'] if 'rows' in stmt else [stmt['params']]:
+            for idx in positions:
+                params[idx] = bind_value(params[idx])
+    return statements
+
+
+def _names(columns):
+    return [col.lstrip('@') for col in columns]            # xml attributes come through as @Column
+
+
+def insert(table, columns, values, op='INSERT'):
+    return {'op': op, 'table': table, 'columns': _names(columns), 'params': list(values)}
+
+
+def update(table, set_dict, where_dict):
+    return {'op': 'UPDATE', 'table': table, 'columns': _names(set_dict), 'where': _names(where_dict),
+            'params': list(set_dict.values()) + list(where_dict.values())}
+
+
+def delete(table, where_dict):
+    return {'op': 'DELETE', 'table': table, 'where': _names(where_dict), 'params': list(where_dict.values())}
+
+
+def coalesce(statements):
+    """ groups consecutive inserts with the same table and column signature into multi row statements """
+    coalesced = []
+    for stmt in statements:
+        if not is_statement(stmt) or stmt['op'] not in INSERT_OPS:
+            coalesced.append(stmt)
+            continue
+        last = coalesced[-1] if coalesced else None
+        if (is_statement(last) and 'rows' in last and len(last['rows']) < MAX_ROWS and last['op'] == stmt['op']
+                and last['table'] == stmt['table'] and last['columns'] == stmt['columns']):
+            last['rows'].append(stmt['params'])
+            last['sources'].append(stmt.get('source'))
+        else:
+            coalesced.append({'op': stmt['op'], 'table': stmt['table'], 'columns': stmt['columns'],
+                              'rows': [stmt['params']], 'sources': [stmt.get('source')]})
+    return coalesced
+
+
+def split_rows(stmt):
+    """ a multi row statement as the single row statements it was coalesced from """
+    return [{'op': stmt['op'], 'table': stmt['table'], 'columns': stmt['columns'], 'params': params,
+             'source': source} for params, source in zip(stmt['rows'], stmt['sources'])]
+
+
+def row_slice(stmt, lo, hi):
+    return dict(stmt, rows=stmt['rows'][lo:hi], sources=stmt['sources'][lo:hi])
+
+
+def is_statement(stmt):
+    """ parsed statements are either sql text (sql files, graph nodes) or these dicts """
+    return isinstance(stmt, dict)
+
+
+@lru_cache(maxsize=4096)
+def _template(op, table, columns, where):
+    where_clause = " AND ".join(f"{col} = ?" for col in where)
+    if op in INSERT_OPS:
+        return f"{op} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    if op == 'UPDATE':
+        return f"UPDATE {table} SET {', '.join(f'{col} = ?' for col in columns)} WHERE {where_clause}"
+    if op == 'DELETE':
+        return f"DELETE FROM {table} WHERE {where_clause}"
+    raise ValueError(f'unknown statement op {op}')
+
+
+def template(stmt):
+    """ parameterised sql, shared by every statement of the same shape so they can go through executemany """
+    return _template(stmt['op'], stmt['table'], tuple(stmt.get('columns', ())), tuple(stmt.get('where', ())))
+
+
+def literal(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def render(stmt):
+    """ sql text of a statement, for showing to the user, exporting and the sqlglot based tooling """
+    if not is_statement(stmt):
+        return stmt
+    if 'rows' in stmt:
+        values = ', '.join(f"({', '.join(literal(v) for v in params)})" for params in stmt['rows'])
+        return f"{stmt['op']} INTO {stmt['table']} ({', '.join(stmt['columns'])}) VALUES {values};"
+    params = iter(stmt['params'])
+    sql = template(stmt)
+    return ''.join(part if idx == 0 else literal(next(params)) + part
+                   for idx, part in enumerate(sql.split('?'))) + ';'
@@ -2,11 +2,12 @@ import json
 import math
 from collections import defaultdict, Counter
 from itertools import combinations
-from sqlalchemy import create_engine, text, select, Text
+from sqlalchemy import text, select, Text
 
 from graph.utils import flatten_avoid_string, to_number
 from graph.singletons.filepaths import LocalFilePaths
 from graph.utils import resource_path
+from connection_factory import make_engine
 
 import logging
 
@@ -751,7 +752,7 @@ def map_effect_type_objects(db_dict, mod_tables, manual_collection_classificatio
 
 
 def mine_empty_effects():
-    engine = create_engine(f"sqlite:///{LocalFilePaths.app_data_path_form('created-db.sqlite')}")
+    engine = make_engine(LocalFilePaths.app_data_path_form('created-db.sqlite'), 'read')
     tables_data = {}
 
     with engine.connect() as conn:
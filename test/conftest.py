@@ -0,0 +1,37 @@
+import pytest
+
+from startup_profile import profiler
+from graph.singletons.filepaths import LocalFilePaths
+
+
+def pytest_addoption(parser):
+    parser.addoption('--profile-startup', action='store_true',
+                     help='write a start up profile of the first window to the app data logs folder')
+    parser.addoption('--benchmarks', action='store_true',
+                     help='run the benchmarks, which need a civ install and report timings to the app data logs')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: timed run against a civ install, skipped without --benchmarks')
+    if config.getoption('--profile-startup'):
+        profiler.enable()
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmarks'):
+        return
+    skip = pytest.mark.skip(reason='benchmark, run with --benchmarks')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def app_data(tmp_path, monkeypatch):
+    """ points the app data folder at a temporary one, for the caches kept there """
+    monkeypatch.setattr(LocalFilePaths, 'save_appdata_path', str(tmp_path))
+    return tmp_path
+
+
+def pytest_unconfigure(config):
+    profiler.write()            # in case no window ever painted
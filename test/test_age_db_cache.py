@@ -0,0 +1,38 @@
+import os
+
+import age_db_cache
+
+
+def test_age_db_cache_restores_and_evicts(app_data, monkeypatch):
+    monkeypatch.setattr(age_db_cache, 'MAX_SNAPSHOTS', 1)
+    cache = age_db_cache.AgeDatabaseCache()
+    inputs = [app_data / 'a.sql', app_data / 'b.sql']
+    for path in inputs:
+        path.write_text(path.name)
+    key = cache.key_for([str(path) for path in inputs], [])
+    assert key == cache.key_for([str(path) for path in inputs], [])
+    assert key != cache.key_for([str(path) for path in reversed(inputs)], [])             # load order matters
+    inputs[0].write_text('edited')
+    edited_key = cache.key_for([str(path) for path in inputs], [])
+    assert edited_key != key
+
+    built = app_data / 'built.sqlite'
+    built.write_bytes(b'antiquity')
+    cache.store('AGE_ANTIQUITY', key, str(built))
+    built.write_bytes(b'exploration')
+    cache.store('AGE_EXPLORATION', 'exploration_key', str(built))
+    built.write_bytes(b'antiquity edited')
+    cache.store('AGE_ANTIQUITY', edited_key, str(built))
+    assert not os.path.exists(cache.snapshot_path(key))                     # neither current nor recent
+    assert os.path.exists(cache.snapshot_path('exploration_key'))           # current, so kept past the limit
+
+    target = app_data / 'gameplay-base_AGE_EXPLORATION.sqlite'
+    assert cache.restore('AGE_EXPLORATION', 'exploration_key', str(target))
+    assert target.read_bytes() == b'exploration'
+    target = app_data / 'gameplay-base_AGE_ANTIQUITY.sqlite'
+    assert not cache.restore('AGE_ANTIQUITY', key, str(target))
+    assert cache.restore('AGE_ANTIQUITY', edited_key, str(target))
+    assert target.read_bytes() == b'antiquity edited'
+    target.write_bytes(b'kept')
+    assert cache.restore('AGE_ANTIQUITY', edited_key, str(target))          # already in place, not copied again
+    assert target.read_bytes() == b'kept'
@@ -0,0 +1,26 @@
+import sqlite3
+
+from config_checkpoints import ConfigCheckpoints
+
+
+def test_config_checkpoints_restore_reports(app_data):
+    checkpoints = ConfigCheckpoints()
+    mod_file = app_data / 'mod.sql'
+    mod_file.write_text('x')
+    steps = [('base', []), ('mod_a', [str(mod_file)]), ('mod_b', []), ('mod_c', [])]
+    keys = checkpoints.chain_keys(steps)
+    db_path = str(app_data / 'current.sqlite')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE Steps (name TEXT)")
+    conn.close()
+    checkpoints.store('AGE_TEST', 0, keys[0], db_path, {0: 'base report'})
+    checkpoints.store('AGE_TEST', 2, keys[2], db_path, {1: 'mod_a report', 2: 'mod_b report'})
+    checkpoints.store('AGE_TEST', 3, keys[3], db_path, {3: 'mod_c report'})
+
+    target = str(app_data / 'restored.sqlite')
+    assert checkpoints.restore('AGE_TEST', keys, target) == (4, ['base report', 'mod_a report', 'mod_b report',
+                                                                 'mod_c report'])
+    mod_file.write_text('edited')                   # every step from mod_a on is stale
+    assert checkpoints.restore('AGE_TEST', checkpoints.chain_keys(steps), target) == (1, ['base report'])
+    checkpoints.prune('AGE_TEST', 0)
+    assert checkpoints.restore('AGE_TEST', keys, target) == (0, [])
@@ -0,0 +1,61 @@
+import random
+import sqlite3
+
+from fk_check import WriteTracker, foreign_key_errors
+
+FK_SCHEMA = """
+CREATE TABLE Types (Type TEXT PRIMARY KEY, Kind TEXT);
+CREATE TABLE Units (UnitId INTEGER PRIMARY KEY, UnitType TEXT REFERENCES Types(Type));
+CREATE TABLE Abilities (UnitId INTEGER REFERENCES Units, Name TEXT, Level INTEGER,
+                        PRIMARY KEY (UnitId, Name));
+CREATE TABLE AbilityLevels (UnitId INTEGER, Name TEXT, Note TEXT,
+                            FOREIGN KEY (UnitId, Name) REFERENCES Abilities(UnitId, Name));
+CREATE TABLE Tags (Tag TEXT PRIMARY KEY, Type TEXT REFERENCES Types(Type)) WITHOUT ROWID;
+CREATE TABLE Orphans (Ref TEXT REFERENCES Missing(Ref));
+"""
+
+
+def _random_statement(rng):
+    type_name = f"'T{rng.randrange(8)}'"
+    unit_id, ability = rng.randrange(8), f"'A{rng.randrange(3)}'"
+    return rng.choice([
+        f"INSERT OR REPLACE INTO Types VALUES ({type_name}, 'KIND')",
+        f"INSERT OR REPLACE INTO Units VALUES ({unit_id}, {type_name})",
+        f"INSERT INTO Units (UnitType) VALUES ({rng.choice([type_name, 'NULL'])})",
+        f"INSERT OR IGNORE INTO Abilities VALUES ({unit_id}, {ability}, 1)",
+        f"INSERT INTO AbilityLevels VALUES ({unit_id}, {rng.choice([ability, 'NULL'])}, 'x')",
+        f"INSERT OR REPLACE INTO Tags VALUES ('TAG{rng.randrange(5)}', {type_name})",
+        f"INSERT INTO Orphans VALUES ({rng.choice([type_name, 'NULL'])})",
+        f"UPDATE Types SET Type = 'T{rng.randrange(8)}x' WHERE Type = {type_name}",
+        f"UPDATE Units SET UnitType = {type_name} WHERE UnitId = {unit_id}",
+        f"DELETE FROM Types WHERE Type = {type_name}",
+        f"DELETE FROM Units WHERE UnitId = {unit_id}",
+        f"DELETE FROM Abilities WHERE UnitId = {unit_id}",
+    ])
+
+
+def test_scoped_fk_check_matches_pragma():
+    rng = random.Random(2024)
+    for trial in range(300):
+        db = sqlite3.connect(':memory:', isolation_level=None)
+        db.executescript(FK_SCHEMA)
+        for _ in range(rng.randrange(15)):                  # rows already there, broken or not
+            db.execute(_random_statement(rng))
+        before = set(db.execute("PRAGMA foreign_key_check").fetchall())
+        with WriteTracker(db) as tracker:
+            for _ in range(rng.randrange(1, 12)):
+                db.execute(_random_statement(rng))
+        full = set(db.execute("PRAGMA foreign_key_check").fetchall())
+        scoped = set(foreign_key_errors(db, tracker))
+        assert scoped <= full, trial
+        assert full - before <= scoped, trial              # everything the batch broke is found
+        db.close()
+
+
+def test_scoped_fk_check_skips_untouched_tables():
+    db = sqlite3.connect(':memory:', isolation_level=None)
+    db.executescript(FK_SCHEMA)
+    db.execute("INSERT INTO Orphans VALUES ('BROKEN_BEFORE')")
+    with WriteTracker(db) as tracker:
+        db.execute("INSERT INTO Units VALUES (1, 'T_MISSING')")
+    assert foreign_key_errors(db, tracker) == [('Units', 1, 'Types', 0)]
@@ -0,0 +1,68 @@
+import os
+
+from install_manifest import InstallManifest
+
+
+def test_install_manifest_tracks_only_referenced_files(tmp_path):
+    install = tmp_path / 'install'
+    for rel_path, text in (('Base/Assets/schema/gameplay/01_schema.sql', 'CREATE TABLE Units (Id);'),
+                           ('Base/Assets/schema/gameplay/notes.txt', 'ignored'),
+                           ('Base/modules/core/core.modinfo', '<Item>data/units.xml</Item><Item>art.blp</Item>'),
+                           ('Base/modules/core/data/units.xml', '<Database/>'),
+                           ('Base/modules/core/data/unused.xml', '<Database/>'),
+                           ('DLC/extra/extra.modinfo', '<Item>data\\extra.sql</Item>'),
+                           ('DLC/extra/data/extra.sql', 'SELECT 1;')):
+        (install / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (install / rel_path).write_text(text)
+    manifest_path = str(tmp_path / 'manifest.json')
+    tracked = {'Base/Assets/schema/gameplay/01_schema.sql', 'Base/modules/core/core.modinfo',
+               'Base/modules/core/data/units.xml', 'DLC/extra/extra.modinfo', 'DLC/extra/data/extra.sql'}
+
+    manifest = InstallManifest(str(install), manifest_path)
+    assert not manifest.has_baseline
+    assert manifest.scan() == tracked
+    manifest.save()
+
+    manifest = InstallManifest(str(install), manifest_path)
+    assert manifest.has_baseline
+    assert manifest.scan() == set()
+    (install / 'Base/modules/core/data/unused.xml').write_text('<Database>changed</Database>')
+    (install / 'DLC/extra/data/extra.sql').write_text('SELECT 12;')
+    (install / 'Base/Assets/schema/gameplay/01_schema.sql').unlink()
+    assert manifest.scan() == {'DLC/extra/data/extra.sql', 'Base/Assets/schema/gameplay/01_schema.sql'}
+    assert manifest.latest_mtime() == max(os.path.getmtime(install / path) for path in tracked
+                                          if (install / path).exists())
+    assert not InstallManifest(str(tmp_path / 'other_install'), manifest_path).has_baseline
+
+
+def test_install_manifest_walk_skips_trees_without_modinfos(tmp_path, monkeypatch):
+    install = tmp_path / 'install'
+    for rel_path in ('Base/Assets/schema/gameplay/01_schema.sql', 'Base/Assets/art/units/a.blp',
+                     'Base/modules/core/core.modinfo', 'DLC/extra/extra.modinfo'):
+        (install / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (install / rel_path).write_text('x')
+    manifest_path = str(tmp_path / 'manifest.json')
+    first = InstallManifest(str(install), manifest_path)
+    first.scan()
+    first.save()
+    saved_mtime = os.path.getmtime(manifest_path)
+
+    listed = []
+    list_dir = InstallManifest._list_dir
+    monkeypatch.setattr(InstallManifest, '_list_dir',
+                        lambda self, rel_dir, *args: listed.append(rel_dir) or list_dir(self, rel_dir, *args))
+    manifest = InstallManifest(str(install), manifest_path)
+    assert manifest.scan() == set()
+    assert sorted(listed) == ['Base', 'Base/Assets/schema/gameplay', 'Base/modules', 'Base/modules/core', 'DLC',
+                              'DLC/extra']
+    assert not manifest.dirty
+    manifest.save()
+    assert os.path.getmtime(manifest_path) == saved_mtime                    # nothing changed, not rewritten
+    assert manifest.current['dirs'] == first.current['dirs']                # skipped trees are kept
+
+    (install / 'DLC/new/modules/more').mkdir(parents=True)
+    (install / 'DLC/new/modules/more/more.modinfo').write_text('<Item>data/more.sql</Item>')
+    (install / 'DLC/new/modules/more/data').mkdir()
+    (install / 'DLC/new/modules/more/data/more.sql').write_text('SELECT 1;')
+    assert manifest.scan() == {'DLC/new/modules/more/more.modinfo', 'DLC/new/modules/more/data/more.sql'}
+    assert manifest.dirty
@@ -0,0 +1,53 @@
+import json
+import sqlite3
+
+import statement_ir
+from lint_results import LintResults, PASSED, FAILED, ROWS_FAILED
+
+
+def _unit(unit_id, name, melee=1, source=None):
+    stmt = statement_ir.insert('Units', ['@UnitId', '@Name', '@Melee'], [unit_id, name, melee])
+    stmt['source'] = source
+    return stmt
+
+
+def test_lint_results_store_failures_by_node_and_table(tmp_path):
+    rows = statement_ir.coalesce([_unit(i, f'U{i}', source=['Units/Row', i + 1]) for i in range(3)])[0]
+    all_rows = statement_ir.coalesce([_unit(i, f'U{i}') for i in range(2)])[0]
+    results = LintResults()
+    results.add('a.sql', 0, {'sql': "INSERT INTO Types VALUES ('T')", 'node_source': 'node_1'})
+    results.add('a.sql', 1, {'sql': "UPDATE Units SET Name = 'x'", 'node_source': 'node_1'},
+                sqlite3.IntegrityError('NOT NULL constraint failed: Units.Name'))
+    results.add('b.xml', 0, {'sql': rows, 'node_source': 'node_2'}, {1: sqlite3.IntegrityError('UNIQUE')})
+    results.add('b.xml', 1, {'sql': all_rows}, {0: sqlite3.IntegrityError('A'), 1: sqlite3.IntegrityError('B')})
+    results.add('b.xml', 2, {'sql': 'PRAGMA foreign_keys'})
+
+    assert [result.status for result in results] == [PASSED, FAILED, ROWS_FAILED, FAILED, PASSED]
+    assert [result.table for result in results] == ['Types', 'Units', 'Units', 'Units', None]
+    assert results.counts() == {'statements': 5, 'failed': 3}
+    assert [result.index for result in results.by_node('node_1')] == [0, 1]
+    assert [result.index for result in results.by_table('Units')] == [1, 0, 1]
+    assert [result.file for result in results.by_file('b.xml')] == ['b.xml'] * 3
+    assert list(results.by_node('missing')) == []
+    failed_rows = results.errors[2]['failed_rows']
+    assert failed_rows == [{'row': 1, 'source': ['Units/Row', 2], 'values': [1, 'U1', 1], 'error': 'UNIQUE'}]
+    assert results.errors[2]['sql'] == "INSERT INTO Units (UnitId, Name, Melee) VALUES (1, 'U1', 1);"
+    assert results.errors[1] == {'kind': 'IntegrityError', 'message': 'NOT NULL constraint failed: Units.Name',
+                                 'sql': "UPDATE Units SET Name = 'x'"}
+
+    combined = LintResults()
+    combined.add('base.sql', 0, {'sql': "INSERT INTO Types VALUES ('B')"}, sqlite3.OperationalError('locked'))
+    combined.extend(results)
+    assert [pos for pos in sorted(combined.errors)] == [0, 2, 3, 4]
+    assert [result.error for result in combined.failures()][1:] == [result.error for result in results.failures()]
+
+    db_path = str(tmp_path / 'results.sqlite')
+    combined.to_sqlite(db_path)
+    with sqlite3.connect(db_path) as conn:
+        stored = conn.execute("SELECT file, statement, node, table_name, status, kind, failed_rows "
+                              "FROM lint_results").fetchall()
+    conn.close()
+    assert len(stored) == 6
+    assert stored[0] == ('base.sql', 0, None, 'Types', FAILED, 'OperationalError', None)
+    assert stored[1] == ('a.sql', 0, 'node_1', 'Types', PASSED, None, None)
+    assert json.loads(stored[3][6]) == failed_rows
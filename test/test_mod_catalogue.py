@@ -0,0 +1,43 @@
+from mod_catalogue import ModCatalogue
+from graph.singletons.filepaths import LocalFilePaths
+
+
+MODINFO = """<?xml version="1.0" encoding="utf-8"?>
+<Mod id="{mod_id}" version="1" xmlns="ModInfo">
+  <ActionCriteria>
+    <Criteria id="always"><AlwaysMet/></Criteria>
+  </ActionCriteria>
+  <ActionGroups>
+    <ActionGroup id="game-always" scope="game" criteria="always">
+      <Actions><UpdateDatabase><Item>data/units.sql</Item></UpdateDatabase></Actions>
+    </ActionGroup>
+  </ActionGroups>
+</Mod>
+"""
+
+
+def test_mod_catalogue_paths_and_refresh(app_data, monkeypatch):
+    install, workshop, config = (app_data / name for name in ('install', 'workshop', 'config'))
+    for root, mod_id in ((install / 'DLC' / 'extra', 'dlc-extra'), (workshop / '1' / 'mod_a', 'mod-a')):
+        (root / 'data').mkdir(parents=True)
+        (root / f'{mod_id}.modinfo').write_text(MODINFO.format(mod_id=mod_id))
+        (root / 'data' / 'units.sql').write_text('INSERT INTO Units VALUES (1);')
+    monkeypatch.setattr(LocalFilePaths, 'civ_install', str(install))
+    monkeypatch.setattr(LocalFilePaths, 'workshop', f'{workshop}/')
+    monkeypatch.setattr(LocalFilePaths, 'civ_config', str(config))             # missing folder
+    catalogue = ModCatalogue()
+    mods = catalogue.mods()
+    assert [(mod['id'], mod['dlc']) for mod in mods] == [('dlc-extra', True), ('mod-a', False)]
+    assert mods[1]['path'] == f'{workshop}/1/mod_a/mod-a.modinfo'             # '/' joined, like glob gave
+    assert mods[1]['folder'] == f'{workshop}/1/mod_a'
+    assert catalogue.dlc_mod_ids() == ['dlc-extra']
+    assert catalogue.mods_in_folder(f'{workshop}/1/mod_a/') == [mods[1]]
+
+    info, mod_id = catalogue.mod_info(mods[1]['path'])
+    units_sql = f'{workshop}/1/mod_a/data/units.sql'
+    assert mod_id == 'mod-a'
+    assert info['action_groups']['game-always']['filepaths'] == [units_sql]
+    assert info['files'][units_sql][0] == len('INSERT INTO Units VALUES (1);')
+
+    (workshop / '1' / 'mod_a' / 'mod-a.modinfo').write_text(MODINFO.format(mod_id='mod-a-renamed'))
+    assert [mod['id'] for mod in ModCatalogue().mods()] == ['dlc-extra', 'mod-a-renamed']    # from the saved json
@@ -0,0 +1,28 @@
+from model import convert_xml_to_sql
+
+UNITS_XML = """<?xml version="1.0" encoding="utf-8"?>
+<Database>
+  <Units>
+  </Units>
+  <Units/>
+  <Units>
+    <Row UnitType="UNIT_A" Name="A"/>
+
+    <Row UnitType="UNIT_B" Name="B"/>
+  </Units>
+  <Types>
+    <Row Type="UNIT_A" Kind="KIND_UNIT"/>
+  </Types>
+</Database>
+"""
+
+
+def test_xml_rows_are_blamed_on_their_element_line(tmp_path):
+    xml_file = tmp_path / 'units.xml'
+    xml_file.write_text(UNITS_XML)
+    statements, errors = convert_xml_to_sql(str(xml_file))
+    assert errors == {}
+    units, types = statements
+    assert units['rows'] == [['UNIT_A', 'A'], ['UNIT_B', 'B']]
+    assert units['sources'] == [['Units[2]/Row[0]', 7], ['Units[2]/Row[1]', 9]]           # empty tables count
+    assert types['sources'] == [['Types[0]/Row[0]', 12]]
@@ -1,6 +1,8 @@
 from collections import defaultdict
 import os
 
+import pytest
+
 from graph.singletons.filepaths import LocalFilePaths       # needed because we want logger initialised
 LocalFilePaths.initialize_paths()
 from graph.singletons.db_spec_singleton import db_spec
@@ -204,3 +206,232 @@ def test_correct_ports(qtbot):          # extremely slow test, move to perf and
             bad_connections[class_name] = {'missing': missing, 'extra': extra}
 
     assert len(bad_connections) == 0
+
+
+first_window_script = """
+import sys, json, time
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+from graph.singletons.filepaths import LocalFilePaths
+LocalFilePaths.initialize_paths()
+from graph.singletons.db_spec_singleton import db_spec
+db_spec.initialize(False)
+if '--eager' in sys.argv:                       # what start up paid before imports and mapping were deferred
+    import sqlglot, marshmallow_sqlalchemy, lxml.etree
+    import ORM
+    from schema_generator import SQLValidator
+    [ORM.mapped_class(name) for name in SQLValidator.table_names]
+from graph.node_controller import NodeEditorWindow
+window = NodeEditorWindow()
+window.show()
+app.processEvents()
+print(json.dumps({'seconds': time.perf_counter() - start, 'modules': sorted(sys.modules),
+                  'mapped': len(sys.modules['ORM'].classes) if 'ORM' in sys.modules else 0}))
+"""
+
+
+@pytest.mark.benchmark
+def test_time_to_first_window():        # benchmark, each run is appended to logs/first_window_benchmark.json
+    import sys
+    import json
+    import time
+    import subprocess
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = {}
+    for mode in ('eager', 'deferred'):
+        args = [sys.executable, '-c', first_window_script] + (['--eager'] if mode == 'eager' else [])
+        output = subprocess.run(args, cwd=repo_root, capture_output=True, text=True, check=True).stdout
+        runs[mode] = json.loads(output.strip().splitlines()[-1])
+
+    deferred_modules = set(runs['deferred']['modules'])
+    for heavy in ('sqlglot', 'marshmallow', 'marshmallow_sqlalchemy', 'lxml'):
+        assert heavy not in deferred_modules, f'{heavy} imported before the first window'
+    assert runs['deferred']['mapped'] == 0
+
+    benchmark_path = os.path.join(LocalFilePaths.app_data_path_form('logs'), 'first_window_benchmark.json')
+    history = []
+    if os.path.exists(benchmark_path):
+        with open(benchmark_path) as f:
+            history = json.load(f)
+    history.append({'time': time.time(), 'eager_seconds': runs['eager']['seconds'],
+                    'deferred_seconds': runs['deferred']['seconds']})
+    with open(benchmark_path, 'w') as f:
+        json.dump(history, f, indent=2)
+    print(f"first window: eager {runs['eager']['seconds']:.2f}s, deferred {runs['deferred']['seconds']:.2f}s")
+
+
+@pytest.mark.benchmark
+def test_trusted_dlc_replay():          # benchmark, full DLC replay of one age through both lint_database paths
+    import json
+    import time
+    from graph.utils import resource_path
+    from model import query_mod_db, organise_entries, load_files
+    from schema_generator import SchemaInspector, lint_database
+    with open(resource_path('resources/mined/PreBuiltData.json'), 'r') as f:
+        prebuilt = json.load(f)
+    _, _, _, dlc_files = organise_entries(query_mod_db(age='AGE_ANTIQUITY'))
+    sql_statements_dlc, _, _ = load_files(dlc_files, 'DLC')
+    timings, outcomes = {}, {}
+    for trusted in (False, True):
+        age_path = LocalFilePaths.app_data_path_form(f'trusted_bench_{trusted}.sqlite')
+        if os.path.exists(age_path):
+            os.remove(age_path)
+        engine = SchemaInspector.make_base_db(age_path, prebuilt)
+        start = time.perf_counter()
+        lint_info = lint_database(engine, sql_statements_dlc, keep_changes=True, database_spec=None, trusted=trusted)
+        timings[trusted] = time.perf_counter() - start
+        outcomes[trusted] = [(result.file, result.status) for result in lint_info['results']]
+        engine.dispose()
+        os.remove(age_path)
+
+    assert outcomes[True] == outcomes[False]            # same statements fail either way
+    print(f'DLC replay: per statement {timings[False]:.2f}s, trusted {timings[True]:.2f}s')
+
+
+@pytest.mark.benchmark
+def test_connection_profiles():         # benchmark, full antiquity build on each connection profile
+    import time
+    from model import query_mod_db, organise_entries, load_files
+    from schema_generator import SchemaInspector, lint_database
+    _, modded, _, dlc_files = organise_entries(query_mod_db(age='AGE_ANTIQUITY'))
+    sql_statements_dlc, _, _ = load_files(dlc_files, 'DLC')
+    sql_statements_mods, _, _ = load_files(modded, 'Mod')
+    timings, row_counts = {}, {}
+    for profile in ('default', 'build'):
+        age_path = LocalFilePaths.app_data_path_form(f'profile_bench_{profile}.sqlite')
+        start = time.perf_counter()
+        engine = SchemaInspector.make_base_db(age_path, profile=profile)
+        lint_database(engine, sql_statements_dlc, keep_changes=True, database_spec=None, trusted=True)
+        lint_database(engine, sql_statements_mods, keep_changes=True, database_spec=None)
+        timings[profile] = time.perf_counter() - start
+        with engine.connect() as conn:
+            row_counts[profile] = conn.exec_driver_sql("SELECT count(*) FROM Modifiers").scalar()
+        engine.dispose()
+        os.remove(age_path)
+
+    assert row_counts['build'] == row_counts['default']
+    print(f"age build: default {timings['default']:.2f}s, build profile {timings['build']:.2f}s")
+
+
+@pytest.mark.benchmark
+def test_config_checkpoint_rerun():     # benchmark, config test cold, then re-run after touching the last mod
+    import time
+    import sqlite3
+    from graph.hotkey_support import ConfigTestWorker
+    from model import query_mod_db
+    from config_checkpoints import config_checkpoints
+    from schema_generator import SQLValidator
+    SQLValidator.state_validation_setup('AGE_ANTIQUITY', db_spec)
+    entries = query_mod_db(age='AGE_ANTIQUITY')
+    mod_files = [i['full_path'] for i in entries if 'Mods' in i['full_path'] or 'workshop' in i['full_path']]
+    db_path = LocalFilePaths.app_data_path_form('current.sqlite')
+
+    def run_config_test():
+        reports = []
+        worker = ConfigTestWorker('AGE_ANTIQUITY', extra_sql=False)
+        worker.results_ready.connect(reports.append)
+        start = time.perf_counter()
+        worker.run()
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute("SELECT count(*) FROM Modifiers").fetchone()[0]
+        return time.perf_counter() - start, rows, [[(r.file, r.status) for r in i['results']] for i in reports]
+
+    config_checkpoints.prune('AGE_ANTIQUITY', 0)
+    cold_time, cold_rows, cold_reports = run_config_test()
+    if mod_files:
+        os.utime(mod_files[-1])                # an edit to the last mod in load order
+    warm_time, warm_rows, warm_reports = run_config_test()
+    assert warm_rows == cold_rows
+    assert warm_reports == cold_reports        # restored steps still reported
+    _, _, unchanged_reports = run_config_test()
+    assert unchanged_reports == cold_reports
+    print(f"config test: cold {cold_time:.2f}s, re-run after editing the last mod {warm_time:.2f}s")
+
+
+@pytest.mark.benchmark
+def test_parallel_load_files():         # benchmark, cold parse of every antiquity dlc file, one process vs the pool
+    import time
+    from model import query_mod_db, organise_entries, load_files, PARSE_WORKERS
+    from statement_cache import statement_cache
+    _, _, _, dlc_files = organise_entries(query_mod_db(age='AGE_ANTIQUITY'))
+    timings, loaded = {}, {}
+    for workers in (1, PARSE_WORKERS):
+        statement_cache.clear()
+        start = time.perf_counter()
+        loaded[workers], _, _ = load_files(dlc_files, 'DLC', workers)
+        timings[workers] = time.perf_counter() - start
+
+    assert list(loaded[PARSE_WORKERS]) == list(loaded[1])          # same files in the same load order
+    assert loaded[PARSE_WORKERS] == loaded[1]
+    print(f"dlc parse: 1 process {timings[1]:.2f}s, {PARSE_WORKERS} processes {timings[PARSE_WORKERS]:.2f}s")
+
+
+@pytest.mark.benchmark
+def test_scoped_fk_check():             # benchmark, graph test sql checked scoped vs the whole database
+    import time
+    from graph.transform_json_to_sql import transform_json
+    from schema_generator import lint_database
+    from age_memory import age_memory
+    sql_commands, dict_form_list, _, _ = transform_json('test/test_data/test_graph.json')
+    age_path = LocalFilePaths.app_data_path_form('gameplay-base_AGE_ANTIQUITY.sqlite')
+    timings, fk_errors = {}, {}
+    for level in ('deep', 'standard', 'quick'):
+        engine = age_memory.engine(age_path)
+        start = time.perf_counter()
+        result = lint_database(engine, {'main.sql': sql_commands}, db_spec, dict_form_list=dict_form_list,
+                               level=level)
+        timings[level] = time.perf_counter() - start
+        fk_errors[level] = sorted(result['foreign_key_errors'])
+        engine.dispose()
+
+    assert fk_errors['standard'] == fk_errors['deep']
+    assert fk_errors['quick'] == []
+    print(f"graph lint: deep {timings['deep']:.3f}s, standard {timings['standard']:.3f}s, "
+          f"quick {timings['quick']:.3f}s")
+
+
+@pytest.mark.benchmark
+def test_incremental_lint():            # benchmark, graph test re-run after editing one node vs a full lint
+    import time
+    import json
+    from itertools import groupby
+    from graph.transform_json_to_sql import transform_json
+    from schema_generator import lint_database
+    from incremental_lint import IncrementalLint
+    from age_memory import age_memory
+    sql_commands, dict_form_list, _, _ = transform_json('test/test_data/test_graph.json')
+    with open('test/test_data/test_graph.json') as f:
+        data = json.load(f)
+    node_sql = {node_id: [] for node_id in data['nodes']}
+    for node_id, statements in groupby(sql_commands, key=lambda sql_info: sql_info['node_source']):
+        node_sql[node_id].extend(statements)
+    dependents = {node_id: set() for node_id in data['nodes']}
+    for connection in data['connections']:
+        dependents[connection['out'][0]].add(connection['in'][0])
+    age_path = LocalFilePaths.app_data_path_form('gameplay-base_AGE_ANTIQUITY.sqlite')
+    lint = IncrementalLint(age_path)
+    lint.run(node_sql, dependents, db_spec, dict_form_list=dict_form_list)
+
+    edited = next(node_id for node_id, statements in node_sql.items() if statements)
+    dirty = [node_id for node_id in node_sql if node_id == edited or node_id in dependents[edited]]
+    for value in ('NULL', "'KIND_TEST'"):          # first edit lifts the node to the top of the stack
+        node_sql[edited] = [{'sql': f"INSERT INTO Types (Type, Kind) VALUES ('TEST_EDIT', {value});",
+                             'node_source': edited}]
+        start = time.perf_counter()
+        result = lint.run(node_sql, dependents, db_spec, dict_form_list=dict_form_list)
+        incremental = time.perf_counter() - start
+    assert result['relinted'] == dirty
+
+    sql_commands = [sql_info for statements in node_sql.values() for sql_info in statements]
+    engine = age_memory.engine(age_path)
+    start = time.perf_counter()
+    full = lint_database(engine, {'main.sql': sql_commands}, db_spec, dict_form_list=dict_form_list)
+    full_time = time.perf_counter() - start
+    engine.dispose()
+    lint.close()
+
+    assert sorted((r.node, r.status) for r in result['results']) == sorted((r.node, r.status) for r in full['results'])
+    assert (sorted((table, parent, fk_id) for table, _, parent, fk_id in result['foreign_key_errors']) ==
+            sorted((table, parent, fk_id) for table, _, parent, fk_id in full['foreign_key_errors']))
+    print(f"graph re-test after one edit: incremental {incremental:.3f}s, full {full_time:.3f}s")
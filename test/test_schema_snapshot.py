@@ -0,0 +1,33 @@
+import os
+
+import schema_generator
+from schema_generator import SchemaInspector, build_file_stats, _snapshot_attrs
+from graph.singletons.filepaths import LocalFilePaths
+
+
+def test_schema_snapshot_only_rehashes_moved_files(app_data, monkeypatch):
+    schema_dir = app_data / 'install' / 'Base' / 'Assets' / 'schema' / 'gameplay'
+    schema_dir.mkdir(parents=True)
+    script = schema_dir / '01_GameplaySchema.sql'
+    script.write_text('CREATE TABLE Types (Type TEXT PRIMARY KEY);')
+    monkeypatch.setattr(LocalFilePaths, 'civ_install', str(app_data / 'install'))
+    hashed = []
+    content_key = schema_generator._content_key.__wrapped__
+    monkeypatch.setattr(schema_generator, '_content_key', lambda *args: hashed.append(args) or content_key(*args))
+
+    inspector = SchemaInspector()
+    for attr in _snapshot_attrs:
+        setattr(inspector, attr, {})
+    inspector.type_map, inspector.port_color_map = {'Types': {'Type': ''}}, {'input': {}, 'output': {}}
+    inspector.save_schema_snapshot(build_file_stats())
+    hashed.clear()
+
+    assert SchemaInspector().load_schema_snapshot(build_file_stats())
+    assert hashed == []                                     # unchanged stats, nothing read
+    os.utime(script, (1, 1))
+    assert SchemaInspector().load_schema_snapshot(build_file_stats())
+    assert len(hashed) == 1                                 # touched, same contents
+    assert SchemaInspector().load_schema_snapshot(build_file_stats())
+    assert len(hashed) == 1                                 # the new stats were kept
+    script.write_text('CREATE TABLE Types (Type TEXT PRIMARY KEY, Kind TEXT);')
+    assert not SchemaInspector().load_schema_snapshot(build_file_stats())
@@ -0,0 +1,36 @@
+import json
+
+from graph.singletons.spec_store import SpecStore, LazySection
+
+
+def test_spec_store_keeps_json_order(tmp_path):
+    spec_file = tmp_path / 'tables.json'
+    spec_file.write_text(json.dumps({'Units': [1], 'Abilities': [2], 'Types': {'x': None}}))
+    value_file = tmp_path / 'levels.json'
+    value_file.write_text(json.dumps(['standard', 'deep']))
+    store = SpecStore(str(tmp_path / 'spec.sqlite'))
+    store.sync({'tables': str(spec_file), 'levels': str(value_file)})
+    tables = store.section('tables')
+    assert isinstance(tables, LazySection)
+    assert tables['Types'] == {'x': None}
+    assert 'Abilities' in tables and 'Missing' not in tables
+    assert list(tables) == ['Units', 'Abilities', 'Types']
+    assert list(tables.items()) == [('Units', [1]), ('Abilities', [2]), ('Types', {'x': None})]
+    assert store.section('levels') == ['standard', 'deep']
+    assert store.section('missing') == {}
+
+
+def test_derived_spec_values_follow_the_loaded_sections(tmp_path, monkeypatch):
+    from graph.singletons.db_spec_singleton import db_spec
+    monkeypatch.setattr(db_spec, 'spec_store', None)
+    monkeypatch.setattr(db_spec, '_sections', {})
+    monkeypatch.setattr(db_spec, '_derived', {})
+    assert db_spec.modifier_argument_list == set()              # read before initialisation, not kept
+    spec_file = tmp_path / 'ModifierArgumentTypes.json'
+    spec_file.write_text(json.dumps({'EFFECT_ADJUST_YIELD': {'Amount': 'int', 'YieldType': 'text'}}))
+    store = SpecStore(str(tmp_path / 'spec.sqlite'))
+    store.sync({'mod_type_arg_map': str(spec_file)})
+    db_spec.spec_store = store
+    assert db_spec.modifier_argument_list == {'Amount', 'YieldType'}
+    db_spec.mod_type_arg_map = {'EFFECT_GRANT_UNIT': {'UnitType': 'text'}}
+    assert db_spec.modifier_argument_list == {'UnitType'}
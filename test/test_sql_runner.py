@@ -0,0 +1,43 @@
+import sqlite3
+
+import statement_ir
+from sql_runner import execute_bisected, run_script
+
+
+UNITS_SCHEMA = "CREATE TABLE Units (UnitId INTEGER PRIMARY KEY, Name TEXT NOT NULL, Melee BOOLEAN);"
+
+
+def _unit(unit_id, name, melee=1, source=None):
+    stmt = statement_ir.insert('Units', ['@UnitId', '@Name', '@Melee'], [unit_id, name, melee])
+    stmt['source'] = source
+    return stmt
+
+
+def test_execute_bisected_finds_failing_statements_and_rows():
+    db = sqlite3.connect(':memory:', isolation_level=None)
+    db.executescript(UNITS_SCHEMA)
+    rows = statement_ir.coalesce([_unit(i, None if i in (3, 7) else f'U{i}') for i in range(10)])[0]
+    sqls = ["INSERT INTO Units VALUES (100, 'A', 0)",
+            "INSERT INTO Units VALUES (100, 'duplicate', 0)",
+            rows,
+            statement_ir.update('Units', {'Name': 'renamed'}, {'UnitId': 100}),
+            "INSERT INTO Missing VALUES (1)",
+            _unit(101, None)]
+    errors = execute_bisected(db, sqls, batch_size=4)
+    assert [sorted(e) if isinstance(e, dict) else e and type(e).__name__ for e in errors] == \
+        [None, 'IntegrityError', [3, 7], None, 'OperationalError', 'IntegrityError']
+    assert all(isinstance(e, sqlite3.IntegrityError) for e in errors[2].values())
+    assert db.execute("SELECT UnitId, Name FROM Units ORDER BY UnitId").fetchall() == \
+        [(i, f'U{i}') for i in range(10) if i not in (3, 7)] + [(100, 'renamed')]
+    assert not db.in_transaction
+
+
+def test_run_script_leaves_no_transaction_open():
+    db = sqlite3.connect(':memory:')
+    db.executescript(UNITS_SCHEMA)
+    sqls = [f"INSERT INTO Units VALUES ({i}, 'U{i}', 1) -- row {i}" for i in range(6)]
+    sqls[4] = "INSERT INTO Units VALUES (1, 'duplicate', 1)"
+    errors = execute_bisected(db, sqls, run_chunk=run_script, batch_size=3)
+    assert [e is not None for e in errors] == [False, False, False, False, True, False]
+    assert not db.in_transaction
+    assert db.execute("SELECT UnitId FROM Units ORDER BY UnitId").fetchall() == [(0,), (1,), (2,), (3,), (5,)]
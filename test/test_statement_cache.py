@@ -0,0 +1,35 @@
+import statement_cache
+from statement_cache import StatementCache, MISS
+
+
+def test_statement_cache_hit_and_miss(app_data):
+    cache = StatementCache()
+    sql_file = app_data / 'a.sql'
+    sql_file.write_text('INSERT INTO Types VALUES (1);')
+    assert cache.get(str(sql_file), 1) is MISS
+    cache.put(str(sql_file), 1, ['INSERT INTO Types VALUES (1);'])
+    assert cache.get(str(sql_file), 1) == ['INSERT INTO Types VALUES (1);']
+    assert cache.get(str(sql_file), 2) is MISS                 # converter version bumped
+    sql_file.write_text('INSERT INTO Types VALUES (12);')       # size changed on disk
+    assert cache.get(str(sql_file), 1) is MISS
+
+
+def test_statement_cache_evicts_least_recently_used(app_data, monkeypatch):
+    monkeypatch.setattr(statement_cache, 'MAX_BYTES', 1000)
+    cache = StatementCache()
+    files = []
+    for idx in range(8):
+        sql_file = app_data / f'{idx}.sql'
+        sql_file.write_text(str(idx))
+        files.append(str(sql_file))
+        cache.put(files[-1], 1, ['x' * 194])                    # 200 bytes of json each
+        assert cache.get(files[0], 1) is not MISS         # keeps the first one in use
+    conn = cache._connection()
+    entries, total = conn.execute("SELECT entries, bytes FROM cache_size").fetchone()
+    assert (entries, total) == conn.execute("SELECT count(*), sum(bytes) FROM parsed_files").fetchone()
+    assert total <= 1000
+    assert cache.get(files[0], 1) is not MISS
+    assert cache.get(files[1], 1) is MISS
+    assert cache.get(files[-1], 1) is not MISS
+    cache.clear()
+    assert conn.execute("SELECT entries, bytes FROM cache_size").fetchone() == (0, 0)
@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+import statement_ir
+
+UNITS_SCHEMA = "CREATE TABLE Units (UnitId INTEGER PRIMARY KEY, Name TEXT NOT NULL, Melee BOOLEAN);"
+
+
+def _unit(unit_id, name, melee='true', source=None):
+    stmt = statement_ir.insert('Units', ['@UnitId', '@Name', '@Melee'], [unit_id, name, melee])
+    stmt['source'] = source
+    return stmt
+
+
+@pytest.fixture
+def units_types(monkeypatch):
+    monkeypatch.setattr(statement_ir, '_numeric_columns', {})
+    statement_ir.set_column_types({'Units': {'UnitId': 0, 'Name': '', 'Melee': False}})
+
+
+def test_coalesce_groups_consecutive_inserts(monkeypatch):
+    monkeypatch.setattr(statement_ir, 'MAX_ROWS', 3)
+    statements = [_unit(i, f'U{i}', source=['Units/Row', i]) for i in range(4)]
+    statements += [statement_ir.insert('Units', ['UnitId', 'Name'], [9, 'U9']),            # other columns
+                   "UPDATE Units SET Name = 'x' WHERE UnitId = 1",
+                   _unit(5, 'U5'),
+                   statement_ir.insert('Units', ['UnitId', 'Name', 'Melee'], [6, 'U6', 0], op='INSERT OR REPLACE')]
+    coalesced = statement_ir.coalesce(statements)
+    assert [len(stmt['rows']) if statement_ir.is_statement(stmt) else stmt for stmt in coalesced] == \
+        [3, 1, 1, "UPDATE Units SET Name = 'x' WHERE UnitId = 1", 1, 1]
+    assert coalesced[0]['columns'] == ['UnitId', 'Name', 'Melee']
+    assert coalesced[0]['rows'][0] == [0, 'U0', 'true']                # kept as written until bind_types
+    assert coalesced[0]['sources'] == [['Units/Row', 0], ['Units/Row', 1], ['Units/Row', 2]]
+    assert statement_ir.split_rows(coalesced[0]) == statements[:3]
+    assert statement_ir.row_slice(coalesced[0], 1, 2)['rows'] == [[1, 'U1', 'true']]
+
+
+def test_bind_types_only_binds_numeric_columns(units_types):
+    statements = statement_ir.coalesce([_unit(1, 'true'), _unit(2, 'False', melee='FALSE')])
+    statements += [statement_ir.update('units', {'NAME': 'false', 'MELEE': 'false'}, {'Melee': 'true'}),
+                   statement_ir.delete('Units', {'Name': 'true'}),
+                   statement_ir.insert('ModTable', ['Enabled'], ['true']),          # not in the schema
+                   "UPDATE Units SET Melee = 'true'"]
+    assert statement_ir.bind_types(statements) is statements
+    assert statements[0]['rows'] == [[1, 'true', 1], [2, 'False', 0]]
+    assert statements[1]['params'] == ['false', 0, 1]
+    assert statements[2]['params'] == ['true']
+    assert statements[3]['params'] == ['true']
+    assert statements[4] == "UPDATE Units SET Melee = 'true'"
+    assert statement_ir.bind_types(None) is None                                    # empty xml
+
+
+def test_render_quotes_literals(units_types):
+    db = sqlite3.connect(':memory:')
+    db.executescript(UNITS_SCHEMA)
+    rows = statement_ir.coalesce([_unit(1, "O'Brien"), _unit(2, 'it\'s -- not; a comment', melee=None)])[0]
+    statement_ir.bind_types([rows])
+    assert statement_ir.render(rows) == ("INSERT INTO Units (UnitId, Name, Melee) VALUES (1, 'O''Brien', 1), "
+                                         "(2, 'it''s -- not; a comment', NULL);")
+    update = statement_ir.bind_types([statement_ir.update('Units', {'Name': "D'Arcy", 'Melee': 'false'},
+                                                          {'UnitId': 2})])[0]
+    assert statement_ir.render(update) == "UPDATE Units SET Name = 'D''Arcy', Melee = 0 WHERE UnitId = 2;"
+    delete = statement_ir.delete('Units', {'Name': "O'Brien"})
+    assert statement_ir.render(delete) == "DELETE FROM Units WHERE Name = 'O''Brien';"
+    assert statement_ir.render("DELETE FROM Units;") == "DELETE FROM Units;"
+    for stmt in (rows, update, delete):
+        db.execute(statement_ir.render(stmt))
+    assert db.execute("SELECT * FROM Units").fetchall() == [(2, "D'Arcy", 0)]
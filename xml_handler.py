@@ -1,6 +1,6 @@
 import xml.etree.ElementTree as ET
+from xml.parsers import expat
 from xml.dom import minidom
-from lxml import etree
 from collections import defaultdict
 import tempfile
 import logging
@@ -82,6 +82,39 @@ def read_xml(filepath):
     return cleaned_dict
 
 
+def element_lines(filepath):
+    """ source line of the table and row level elements, keyed (tag, index) and (tag, index, tag, index) with
+    index counting same tag siblings, the order etree_to_dict lists them in. Partial if the file is malformed """
+    lines, depth, counters = {}, [0], [defaultdict(int)]
+    parser = expat.ParserCreate(namespace_separator='}')
+
+    def start(name, attrs):
+        tag = '{' + name if '}' in name else name               # same form ElementTree gives
+        depth[0] += 1
+        if depth[0] in (2, 3):
+            index = counters[-1][tag]
+            counters[-1][tag] += 1
+            key = (tag, index) if depth[0] == 2 else stack[-1] + (tag, index)
+            lines[key] = parser.CurrentLineNumber
+            stack.append(key)
+        counters.append(defaultdict(int))
+
+    def end(name):
+        if depth[0] in (2, 3):
+            stack.pop()
+        depth[0] -= 1
+        counters.pop()
+
+    stack = []
+    parser.StartElementHandler, parser.EndElementHandler = start, end
+    try:
+        with open(filepath, 'rb') as f:
+            parser.ParseFile(f)
+    except expat.ExpatError as e:
+        log.debug(f'line numbers for {filepath} stop at {e}')
+    return lines
+
+
 def etree_to_dict(t):
     d = {t.tag: {} if t.attrib else None}
     children = list(t)
@@ -108,6 +141,7 @@ def etree_to_dict(t):
 
 
 def parse_gameeffects_to_dict(path):
+    from lxml import etree          # only needed when mining GameEffects, keep it off start up
     parser = etree.XMLParser(recover=True, huge_tree=True)
     tree = etree.parse(path, parser)
     root = tree.getroot()